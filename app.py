@@ -1,5 +1,6 @@
 from core.auth import get_msal_app
 from core.db import get_user_cargo
+from core.prometheus import iniciar_servidor_metricas
 import streamlit as st
 from time import sleep
 import os
@@ -109,5 +110,7 @@ class App:
             st.switch_page("pages/page1.py")
 
 if __name__ == "__main__":
+    # Listener /metrics só no processo do Streamlit (uma vez por processo), não nos jobs que importam core.db
+    iniciar_servidor_metricas()
     app = App()
     app.run()
\ No newline at end of file
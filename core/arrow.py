@@ -0,0 +1,78 @@
+"""
+Leitura colunar (Arrow) dos resultados do MySQL.
+
+O pd.read_sql pelo PyMySQL/mysqlclient monta cada valor como objeto Python antes
+de o pandas converter as colunas, o que domina o tempo das consultas no nível de
+item (modos de venda, custos de todas as lojas). Com o connectorx o resultado
+chega em lotes Arrow e vira DataFrame sem passar por objetos Python; as colunas
+de texto ficam em string[pyarrow] e DECIMAL vira float.
+
+Sem o pacote, com parâmetros (o connectorx não aceita bind de parâmetros), fora
+do MySQL ou em qualquer falha, a leitura volta para o pd.read_sql.
+
+O connectorx abre a própria conexão a partir da URL, então a leitura Arrow não
+retira conexão do pool do SQLAlchemy: FonteArrow ocupa uma das DB_LIMITE_ARROW
+vagas do processo e a espera pela vaga é registrada como espera_pool.
+"""
+from contextlib import contextmanager
+from typing import Optional
+import os
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import connectorx as cx
+    import pyarrow as pa
+except ImportError:  # leitura colunar desativada sem os pacotes
+    cx = pa = None
+
+LEITURA_ARROW = os.getenv("DB_LEITURA_ARROW", "1") == "1"
+# Leituras Arrow simultâneas por processo (cada uma abre uma conexão fora do pool)
+LIMITE_ARROW = max(int(os.getenv("DB_LIMITE_ARROW", "4")), 1)
+_vagas = threading.BoundedSemaphore(LIMITE_ARROW)
+
+def _sql(query) -> str:
+    return query.text if hasattr(query, "text") else str(query)
+
+def url_connectorx(conn) -> Optional[str]:
+    """URL no formato do connectorx a partir da conexão/engine SQLAlchemy (None fora do MySQL)"""
+    engine = getattr(conn, "engine", conn)
+    url = getattr(engine, "url", None)
+    if url is None or url.get_backend_name() != "mysql":
+        return None
+    return url.set(drivername="mysql").render_as_string(hide_password=False)
+
+def disponivel(query, conn, params: Optional[dict] = None) -> bool:
+    return LEITURA_ARROW and cx is not None and not params and url_connectorx(conn) is not None
+
+def para_pandas(tabela) -> pd.DataFrame:
+    """Converte a tabela Arrow: DECIMAL -> float64, texto -> string[pyarrow], demais tipos nativos"""
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_decimal(campo.type):
+            tabela = tabela.set_column(i, campo.name, tabela.column(i).cast(pa.float64()))
+    texto = pd.StringDtype("pyarrow")
+    tipos = {pa.string(): texto, pa.large_string(): texto}
+    return tabela.to_pandas(types_mapper=tipos.get, split_blocks=True, self_destruct=True)
+
+class FonteArrow:
+    """Engine lido pelo connectorx; conectar() reserva uma vaga em vez de uma conexão do pool"""
+
+    def __init__(self, engine):
+        self.engine = getattr(engine, "engine", engine)
+        self.url = url_connectorx(self.engine)
+
+    @contextmanager
+    def conectar(self):
+        inicio = time.perf_counter()
+        with _vagas:
+            yield self, time.perf_counter() - inicio
+
+def ler_arrow(query, fonte: FonteArrow, params: Optional[dict] = None) -> pd.DataFrame:
+    """Leitor para executar_consulta com uma FonteArrow; em falha, pd.read_sql pelo engine"""
+    try:
+        tabela = cx.read_sql(fonte.url, _sql(query).strip().rstrip(";"), return_type="arrow")
+        return para_pandas(tabela)
+    except Exception:
+        return pd.read_sql(query, fonte.engine, params=params)
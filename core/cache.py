@@ -0,0 +1,477 @@
+"""
+Cache dos dados das páginas com orçamento global de memória.
+
+Substitui o @st.cache_data: os resultados ficam em um armazenamento único do
+processo, com orçamento total em bytes (CACHE_ORCAMENTO_MB), cota por espaço
+de nomes (por padrão, o arquivo da página; CACHE_COTA_PADRAO_MB e CACHE_COTAS)
+e despejo LRU pelo tamanho de cada entrada. Os DataFrames guardados na sessão
+com guardar_na_sessao entram na conta do orçamento; quando ele estoura, quem
+cede espaço são as entradas de cache menos usadas.
+
+Como no st.cache_data, argumentos com nome iniciado por "_" não entram na
+chave, o TTL é por função e o valor devolvido é uma cópia.
+
+    CACHE_COTAS="mapa_calor_horas=384,entrega_e_rota=256"
+
+    python -m core.cache     # confere que alterar o valor devolvido não altera o cache
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import copy
+import functools
+import hashlib
+import inspect
+import pickle
+import sys
+import threading
+import time
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+_MB = 1024 ** 2
+
+def _ler_cotas(texto: str) -> dict:
+    """'pagina=MB,pagina=MB' -> {pagina: bytes}"""
+    cotas = {}
+    for item in filter(None, (p.strip() for p in texto.split(","))):
+        nome, _, valor = item.partition("=")
+        cotas[nome.strip()] = int(float(valor) * _MB)
+    return cotas
+
+ORCAMENTO_BYTES = int(float(os.getenv("CACHE_ORCAMENTO_MB", "1024")) * _MB)
+COTA_PADRAO_BYTES = int(float(os.getenv("CACHE_COTA_PADRAO_MB", "256")) * _MB)
+COTAS_BYTES = _ler_cotas(os.getenv("CACHE_COTAS", ""))
+
+@dataclass
+class CacheInfo:
+    """Contadores de uso de um cache de página"""
+    nome: str
+    namespace: str
+    chamadas: int = 0
+    execucoes: int = 0
+    remocoes: int = 0
+    despejos: int = 0
+    rejeicoes: int = 0
+    funcao: object = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def acertos(self) -> int:
+        return max(self.chamadas - self.execucoes, 0)
+
+    @property
+    def taxa_acerto(self) -> float:
+        return self.acertos / self.chamadas if self.chamadas else 0.0
+
+    def limpar(self):
+        governador.limpar(self.nome)
+        self.remocoes += 1
+
+# nome -> CacheInfo (persistem entre reruns das páginas)
+_caches = {}
+
+# =======================
+# TAMANHO E CHAVE
+# =======================
+def tamanho_bytes(valor) -> int:
+    """Memória aproximada de um valor em cache"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        from core.instrumentacao import bytes_estimados
+        return bytes_estimados(valor) if isinstance(valor, pd.DataFrame) else int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, (list, tuple, set)):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_bytes(k) + tamanho_bytes(v) for k, v in valor.items())
+    try:
+        return len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(valor)
+
+def _atualizar_hash(h, valor):
+    if valor is None or isinstance(valor, (bool, int, float, str, bytes, Decimal, date, datetime, timedelta)):
+        h.update(f"{type(valor).__name__}:{valor!r}".encode())
+    elif isinstance(valor, (list, tuple)):
+        h.update(f"{type(valor).__name__}[{len(valor)}]".encode())
+        for item in valor:
+            _atualizar_hash(h, item)
+    elif isinstance(valor, (set, frozenset)):
+        h.update(repr(sorted(map(repr, valor))).encode())
+    elif isinstance(valor, dict):
+        for k in sorted(valor, key=repr):
+            _atualizar_hash(h, k)
+            _atualizar_hash(h, valor[k])
+    elif isinstance(valor, (pd.DataFrame, pd.Series)):
+        h.update(repr(getattr(valor, "columns", valor.name)).encode())
+        h.update(pd.util.hash_pandas_object(valor, index=True).values.tobytes())
+    elif isinstance(valor, np.ndarray):
+        h.update(valor.tobytes())
+    else:
+        try:
+            h.update(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            h.update(repr(valor).encode())
+
+def chave_argumentos(assinatura: inspect.Signature, args, kwargs) -> str:
+    """Hash dos argumentos, ignorando os que começam com '_' (engine, conexão...)"""
+    ligados = assinatura.bind(*args, **kwargs)
+    ligados.apply_defaults()
+    h = hashlib.sha1()
+    for nome, valor in ligados.arguments.items():
+        if not nome.startswith("_"):
+            h.update(nome.encode())
+            _atualizar_hash(h, valor)
+    return h.hexdigest()
+
+def _copia(valor):
+    """Cópia devolvida a cada leitura, para a página não alterar o valor em cache"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy()
+    if valor is None or isinstance(valor, (bool, int, float, str, bytes, date, datetime, Decimal)):
+        return valor
+    return copy.deepcopy(valor)
+
+# =======================
+# GOVERNADOR DE MEMÓRIA
+# =======================
+@dataclass
+class Entrada:
+    valor: object
+    bytes: int
+    cache: str
+    namespace: str
+    expira: float
+
+class GovernadorMemoria:
+    """Orçamento global e cotas por namespace, com despejo LRU das entradas de cache"""
+
+    def __init__(self, orcamento: int = ORCAMENTO_BYTES, cota_padrao: int = COTA_PADRAO_BYTES,
+                 cotas: dict = None):
+        self.orcamento = orcamento
+        self.cota_padrao = cota_padrao
+        self.cotas = dict(COTAS_BYTES if cotas is None else cotas)
+        self._lock = threading.RLock()
+        self._entradas = OrderedDict()  # (cache, chave) -> Entrada, da menos para a mais usada
+        self._bytes_namespace = {}
+        self._sessoes = {}  # (sessão, chave) -> bytes dos frames guardados na sessão
+        self.total = 0
+
+    def cota(self, namespace: str) -> int:
+        return min(self.cotas.get(namespace, self.cota_padrao), self.orcamento)
+
+    # ----- Entradas -----
+
+    def obter(self, cache: str, chave: str):
+        """(True, valor) se a entrada existe e não expirou; (False, None) caso contrário"""
+        with self._lock:
+            entrada = self._entradas.get((cache, chave))
+            if entrada is None:
+                return False, None
+            if entrada.expira <= time.monotonic():
+                self._remover((cache, chave))
+                return False, None
+            self._entradas.move_to_end((cache, chave))
+            return True, entrada.valor
+
+    def guardar(self, info: CacheInfo, chave: str, valor, ttl: float = None, max_entradas: int = None) -> bool:
+        """Guarda a entrada abrindo espaço pelo LRU; False se ela sozinha não cabe na cota"""
+        tamanho = tamanho_bytes(valor)
+        if tamanho > self.cota(info.namespace):
+            info.rejeicoes += 1
+            return False
+        with self._lock:
+            self._remover((info.nome, chave))
+            self._remover_expiradas()
+            if max_entradas:
+                self._despejar(lambda e: e.cache == info.nome,
+                               lambda: sum(e.cache == info.nome for e in self._entradas.values()) >= max_entradas)
+            self._despejar(lambda e: e.namespace == info.namespace,
+                           lambda: self._bytes_namespace.get(info.namespace, 0) + tamanho > self.cota(info.namespace))
+            self._despejar(lambda e: True, lambda: self.total + self.bytes_sessoes() + tamanho > self.orcamento)
+            expira = time.monotonic() + ttl if ttl else float("inf")
+            self._entradas[(info.nome, chave)] = Entrada(valor, tamanho, info.nome, info.namespace, expira)
+            self._bytes_namespace[info.namespace] = self._bytes_namespace.get(info.namespace, 0) + tamanho
+            self.total += tamanho
+        return True
+
+    def _remover(self, chave_total) -> bool:
+        entrada = self._entradas.pop(chave_total, None)
+        if entrada is None:
+            return False
+        self._bytes_namespace[entrada.namespace] -= entrada.bytes
+        self.total -= entrada.bytes
+        return True
+
+    def _remover_expiradas(self):
+        agora = time.monotonic()
+        for chave_total in [k for k, e in self._entradas.items() if e.expira <= agora]:
+            self._remover(chave_total)
+
+    def _despejar(self, elegivel, excedido):
+        """Remove as entradas elegíveis menos usadas enquanto o limite estiver excedido"""
+        while excedido():
+            vitima = next((k for k, e in self._entradas.items() if elegivel(e)), None)
+            if vitima is None:
+                return
+            info = _caches.get(vitima[0])
+            if info is not None:
+                info.despejos += 1
+            self._remover(vitima)
+
+    def limpar(self, cache: str = None):
+        """Remove as entradas de um cache (ou de todos)"""
+        with self._lock:
+            for chave_total in [k for k in self._entradas if cache is None or k[0] == cache]:
+                self._remover(chave_total)
+
+    # ----- Frames da sessão -----
+
+    def registrar_sessao(self, sessao: str, chave: str, valor):
+        with self._lock:
+            self._sessoes[(sessao, chave)] = tamanho_bytes(valor)
+            self._podar_sessoes()
+            self._despejar(lambda e: True, lambda: self.total + self.bytes_sessoes() > self.orcamento)
+
+    def _podar_sessoes(self):
+        """Esquece os frames de sessões que já foram encerradas"""
+        try:
+            from streamlit.runtime import get_instance
+            ativa = get_instance().is_active_session
+        except Exception:
+            return
+        for sessao in {s for s, _ in self._sessoes}:
+            if not ativa(sessao):
+                for chave in [k for k in self._sessoes if k[0] == sessao]:
+                    del self._sessoes[chave]
+
+    def bytes_sessoes(self) -> int:
+        return sum(self._sessoes.values())
+
+    # ----- Introspecção -----
+
+    def bytes_por_cache(self) -> dict:
+        with self._lock:
+            memoria = {}
+            for entrada in self._entradas.values():
+                memoria[entrada.cache] = memoria.get(entrada.cache, 0) + entrada.bytes
+            return memoria
+
+    def entradas_por_cache(self) -> dict:
+        with self._lock:
+            contagem = {}
+            for entrada in self._entradas.values():
+                contagem[entrada.cache] = contagem.get(entrada.cache, 0) + 1
+            return contagem
+
+    def resumo(self) -> dict:
+        """Orçamento, uso pelos caches e pelos frames de sessão (bytes)"""
+        with self._lock:
+            return {"orcamento": self.orcamento, "caches": self.total, "sessoes": self.bytes_sessoes(),
+                    "entradas": len(self._entradas), "sessoes_ativas": len({s for s, _ in self._sessoes})}
+
+    def uso_namespaces(self) -> pd.DataFrame:
+        with self._lock:
+            nomes = sorted(set(self._bytes_namespace) | {i.namespace for i in _caches.values()})
+            linhas = [{
+                "namespace": nome,
+                "entradas": sum(e.namespace == nome for e in self._entradas.values()),
+                "memoria_mb": round(self._bytes_namespace.get(nome, 0) / _MB, 2),
+                "cota_mb": round(self.cota(nome) / _MB, 1),
+            } for nome in nomes]
+        df = pd.DataFrame(linhas, columns=["namespace", "entradas", "memoria_mb", "cota_mb"])
+        df["uso_cota"] = (df["memoria_mb"] / df["cota_mb"] * 100).round(1)
+        return df
+
+governador = GovernadorMemoria()
+
+# =======================
+# DECORADOR
+# =======================
+def _segundos(ttl):
+    if ttl is None:
+        return None
+    return ttl.total_seconds() if isinstance(ttl, timedelta) else float(ttl)
+
+def cache_data(func=None, *, ttl=None, max_entries: int = None, namespace: str = None, show_spinner=False):
+    """Substitui @st.cache_data, guardando os resultados sob o orçamento do governador de memória"""
+    def decorar(f):
+        arquivo = os.path.splitext(os.path.basename(f.__code__.co_filename))[0]
+        nome = f"{arquivo}.{f.__qualname__}"
+        info = _caches.get(nome)
+        if info is None:
+            info = _caches.setdefault(nome, CacheInfo(nome, namespace or arquivo))
+        assinatura = inspect.signature(f)
+        segundos = _segundos(ttl)
+        calculando = {}
+        lock_calculo = threading.Lock()
+
+        def executar(chave, args, kw):
+            with info._lock:
+                info.execucoes += 1
+            if show_spinner:
+                texto = show_spinner if isinstance(show_spinner, str) else f"Executando {f.__name__}()..."
+                with st.spinner(texto):
+                    valor = f(*args, **kw)
+            else:
+                valor = f(*args, **kw)
+            governador.guardar(info, chave, valor, segundos, max_entries)
+            return valor
+
+        @functools.wraps(f)
+        def chamar(*args, **kw):
+            with info._lock:
+                info.chamadas += 1
+            chave = chave_argumentos(assinatura, args, kw)
+            achou, valor = governador.obter(nome, chave)
+            if achou:
+                return _copia(valor)
+            # Uma única execução por chave: chamadas simultâneas esperam o resultado
+            with lock_calculo:
+                lock = calculando.setdefault(chave, threading.Lock())
+            with lock:
+                achou, valor = governador.obter(nome, chave)
+                if not achou:
+                    valor = executar(chave, args, kw)
+            with lock_calculo:
+                calculando.pop(chave, None)
+            return _copia(valor)
+
+        chamar.clear = info.limpar
+        info.funcao = chamar
+        return chamar
+
+    return decorar(func) if func is not None else decorar
+
+def cache_por_loja(func=None, *, ttl=None, coluna: str = "LOJA", namespace: str = None):
+    """
+    Cache por loja para f(_engine, lojas, ...) que consulta várias lojas de uma vez (LOJA IN (...)).
+
+    O resultado é repartido pela coluna da loja e cada loja vira uma entrada própria do
+    cache (chave: loja + demais argumentos). Uma chamada consulta, numa única execução de f,
+    só as lojas que ainda não estão no cache; lojas sem linhas também ficam em cache.
+    """
+    def decorar(f):
+        arquivo = os.path.splitext(os.path.basename(f.__code__.co_filename))[0]
+        nome = f"{arquivo}.{f.__qualname__}"
+        info = _caches.get(nome)
+        if info is None:
+            info = _caches.setdefault(nome, CacheInfo(nome, namespace or arquivo))
+        assinatura = inspect.signature(f)
+        segundos = _segundos(ttl)
+
+        @functools.wraps(f)
+        def chamar(_engine, lojas, *args, **kw):
+            lojas = list(dict.fromkeys(int(loja) for loja in lojas))
+            if not lojas:
+                return f(_engine, (), *args, **kw)
+            with info._lock:
+                info.chamadas += 1
+            chaves = {loja: chave_argumentos(assinatura, (_engine, loja, *args), kw) for loja in lojas}
+            partes, faltantes = {}, []
+            for loja, chave in chaves.items():
+                achou, valor = governador.obter(nome, chave)
+                if achou:
+                    partes[loja] = valor
+                else:
+                    faltantes.append(loja)
+            if faltantes:
+                with info._lock:
+                    info.execucoes += 1
+                df = f(_engine, tuple(faltantes), *args, **kw)
+                posicoes = df.groupby(coluna, sort=False, observed=True).indices if not df.empty else {}
+                for loja in faltantes:
+                    parte = df.iloc[posicoes[loja] if loja in posicoes else []].reset_index(drop=True)
+                    governador.guardar(info, chaves[loja], parte, segundos)
+                    partes[loja] = parte
+            # Fatias vazias ficam de fora para não alterar os tipos das colunas na concatenação
+            com_linhas = [partes[loja] for loja in lojas if len(partes[loja])] or [partes[lojas[0]]]
+            # pd.concat de um frame só devolve memória compartilhada com a entrada do cache
+            if len(com_linhas) == 1:
+                return _copia(com_linhas[0])
+            return pd.concat(com_linhas, ignore_index=True)
+
+        chamar.clear = info.limpar
+        info.funcao = chamar
+        return chamar
+
+    return decorar(func) if func is not None else decorar
+
+def guardar_na_sessao(chave: str, valor):
+    """Guarda um DataFrame em st.session_state contabilizando-o no orçamento de memória"""
+    st.session_state[chave] = valor
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        sessao = get_script_run_ctx().session_id
+    except Exception:
+        return
+    governador.registrar_sessao(sessao, chave, valor)
+
+# =======================
+# INTROSPECÇÃO
+# =======================
+def memoria_por_cache() -> dict:
+    """Bytes ocupados por cache"""
+    return governador.bytes_por_cache()
+
+def estatisticas_caches() -> pd.DataFrame:
+    """Chamadas, acertos, taxa de acerto, memória e despejos de cada cache registrado"""
+    memoria = memoria_por_cache()
+    entradas = governador.entradas_por_cache()
+    linhas = [{
+        "cache": info.nome,
+        "namespace": info.namespace,
+        "chamadas": info.chamadas,
+        "acertos": info.acertos,
+        "faltas": info.execucoes,
+        "taxa_acerto": round(info.taxa_acerto * 100, 1),
+        "entradas": entradas.get(info.nome, 0),
+        "memoria_mb": round(memoria.get(info.nome, 0) / _MB, 2),
+        "despejos": info.despejos,
+        "rejeicoes": info.rejeicoes,
+    } for info in _caches.values()]
+    return pd.DataFrame(linhas, columns=["cache", "namespace", "chamadas", "acertos", "faltas", "taxa_acerto",
+                                         "entradas", "memoria_mb", "despejos", "rejeicoes"])
+
+def limpar_cache(nome: str):
+    """Invalida um cache registrado"""
+    if nome in _caches:
+        _caches[nome].limpar()
+
+def limpar_todos():
+    """Invalida todos os caches do governador e o st.cache_data"""
+    for info in _caches.values():
+        info.limpar()
+    st.cache_data.clear()
+
+def caches_registrados() -> list:
+    return sorted(_caches)
+
+def verificar():
+    """Confere que edições no DataFrame devolvido (.loc, fillna inplace) não chegam ao cache"""
+    @cache_data(ttl=60)
+    def _dados(_engine, lojas):
+        return pd.DataFrame({"LOJA": list(lojas), "V": [np.nan] * len(lojas)})
+
+    @cache_por_loja(ttl=60)
+    def _por_loja(_engine, lojas):
+        return pd.DataFrame({"LOJA": list(lojas), "V": [np.nan] * len(lojas)})
+
+    for nome, funcao, lojas in (("cache_data", _dados, (1,)), ("cache_por_loja[1 loja]", _por_loja, [1]),
+                                ("cache_por_loja[2 lojas]", _por_loja, [1, 2])):
+        df = funcao(None, lojas)
+        df.loc[0, "V"] = 99
+        funcao(None, lojas).fillna({"V": 0}, inplace=True)
+        df = funcao(None, lojas)
+        assert df["V"].isna().all(), f"{nome}: alteração no valor devolvido chegou ao cache"
+        funcao.clear()
+    print("cache: ok")
+
+
+if __name__ == "__main__":
+    verificar()
@@ -0,0 +1,215 @@
+"""
+Captura de alterações das tabelas de movimento do ERP (romaneios, expedições,
+abastecimentos, extrato Veloe...).
+
+Cada consumidor (réplica analítica, agregados pré-calculados) guarda por
+tabela a sua marca d'água: o maior CADASTRO/data já processado. A leitura
+seguinte começa na marca menos a janela de revisão da tabela, para pegar
+atualizações tardias de linhas já lidas (TERMINO_SEPARACAO preenchido depois
+da separação, ROTA_HORARIO_REALIZADO ao fim da rota). Dentro da janela cada
+linha tem um hash do conteúdo, e só as novas ou alteradas são entregues.
+
+As marcas e os hashes ficam em um SQLite local, então uma reinicialização
+continua de onde parou.
+
+    python -m core.captura situacao
+    python -m core.captura reiniciar replica romaneios_dbf
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+import argparse
+import sqlite3
+import threading
+import os
+
+import pandas as pd
+
+_DIR_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CAMINHO_CAPTURA = os.getenv("CAPTURA_DB", os.path.join(_DIR_PROJETO, "dados", "captura.sqlite"))
+
+@dataclass(frozen=True)
+class FonteCaptura:
+    """Tabela capturada: chave, expressão da marca d'água e janela de revisão"""
+    nome: str
+    chave: tuple
+    marca: str
+    origem: Optional[str] = None
+    revisao: timedelta = timedelta(0)
+
+    @property
+    def sql_origem(self) -> str:
+        return self.origem or f"{self.nome} t"
+
+_ESQUEMA = (
+    """CREATE TABLE IF NOT EXISTS marcas (
+        consumidor TEXT NOT NULL,
+        tabela TEXT NOT NULL,
+        marca TEXT NOT NULL,
+        atualizado_em TEXT NOT NULL,
+        PRIMARY KEY (consumidor, tabela)
+    )""",
+    """CREATE TABLE IF NOT EXISTS hashes (
+        consumidor TEXT NOT NULL,
+        tabela TEXT NOT NULL,
+        chave TEXT NOT NULL,
+        hash INTEGER NOT NULL,
+        marca TEXT NOT NULL,
+        PRIMARY KEY (consumidor, tabela, chave)
+    )""",
+)
+
+class MarcaDagua:
+    """Marcas d'água e hashes das linhas em revisão, por consumidor e tabela (SQLite)"""
+
+    def __init__(self, caminho: str = CAMINHO_CAPTURA):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _conexao(self):
+        if self._conn is None:
+            Path(self.caminho).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.caminho, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for comando in _ESQUEMA:
+                self._conn.execute(comando)
+        return self._conn
+
+    def marca(self, consumidor: str, tabela: str) -> Optional[datetime]:
+        with self._lock:
+            linha = self._conexao().execute(
+                "SELECT marca FROM marcas WHERE consumidor = ? AND tabela = ?", (consumidor, tabela)).fetchone()
+        return datetime.fromisoformat(linha[0]) if linha else None
+
+    def gravar_marca(self, consumidor: str, tabela: str, marca: datetime):
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("INSERT OR REPLACE INTO marcas VALUES (?, ?, ?, ?)",
+                         (consumidor, tabela, marca.isoformat(sep=" "),
+                          datetime.now().isoformat(timespec="seconds")))
+            conn.commit()
+
+    def hashes(self, consumidor: str, tabela: str, chaves: list) -> dict:
+        """{chave: hash} já vistos para as chaves informadas"""
+        vistos = {}
+        with self._lock:
+            conn = self._conexao()
+            for i in range(0, len(chaves), 900):  # limite de parâmetros do SQLite
+                lote = chaves[i:i + 900]
+                vistos.update(conn.execute(
+                    f"SELECT chave, hash FROM hashes WHERE consumidor = ? AND tabela = ? "
+                    f"AND chave IN ({', '.join('?' * len(lote))})", [consumidor, tabela, *lote]).fetchall())
+        return vistos
+
+    def gravar_hashes(self, consumidor: str, tabela: str, linhas: list):
+        """Grava [(chave, hash, marca)] das linhas que continuam dentro da janela de revisão"""
+        with self._lock:
+            conn = self._conexao()
+            conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                             [(consumidor, tabela, c, h, m) for c, h, m in linhas])
+            conn.commit()
+
+    def podar(self, consumidor: str, tabela: str, antes_de: datetime):
+        """Descarta os hashes das linhas que já saíram da janela de revisão"""
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("DELETE FROM hashes WHERE consumidor = ? AND tabela = ? AND marca < ?",
+                         (consumidor, tabela, antes_de.isoformat(sep=" ")))
+            conn.commit()
+
+    def reiniciar(self, consumidor: str, tabela: Optional[str] = None):
+        """Apaga marca e hashes: a próxima captura relê a tabela desde o início"""
+        filtro, params = "consumidor = ?", [consumidor]
+        if tabela:
+            filtro, params = filtro + " AND tabela = ?", params + [tabela]
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(f"DELETE FROM marcas WHERE {filtro}", params)
+            conn.execute(f"DELETE FROM hashes WHERE {filtro}", params)
+            conn.commit()
+
+    def ler(self) -> pd.DataFrame:
+        if not os.path.exists(self.caminho):
+            return pd.DataFrame(columns=["consumidor", "tabela", "marca", "atualizado_em"])
+        with sqlite3.connect(self.caminho) as conn:
+            return pd.read_sql_query("SELECT * FROM marcas ORDER BY consumidor, tabela", conn)
+
+marcas_dagua = MarcaDagua()
+
+# =======================
+# CAPTURA
+# =======================
+def _proximo_mes(momento: datetime) -> datetime:
+    return datetime(momento.year + momento.month // 12, momento.month % 12 + 1, 1)
+
+def _chaves(df: pd.DataFrame, chave: tuple) -> list:
+    return df[list(chave)].astype(str).agg("|".join, axis=1).tolist()
+
+def _filtrar_alteradas(df: pd.DataFrame, fonte: FonteCaptura, consumidor: str, desde_revisao: datetime,
+                       loja: MarcaDagua) -> pd.DataFrame:
+    """Mantém as linhas novas ou cujo conteúdo mudou desde a última captura"""
+    chaves = _chaves(df, fonte.chave)
+    hashes = pd.util.hash_pandas_object(df.drop(columns="_MARCA"), index=False).astype("int64").tolist()
+    vistos = loja.hashes(consumidor, fonte.nome, chaves)
+    alteradas = [vistos.get(c) != h for c, h in zip(chaves, hashes)]
+
+    marcas = pd.to_datetime(df["_MARCA"])
+    em_revisao = [(c, h, m.isoformat(sep=" ")) for c, h, m, a in zip(chaves, hashes, marcas, alteradas)
+                  if a and m >= desde_revisao]
+    loja.gravar_hashes(consumidor, fonte.nome, em_revisao)
+    return df[alteradas]
+
+def capturar(ler, fonte: FonteCaptura, consumidor: str, inicio: datetime, loja: MarcaDagua = marcas_dagua):
+    """
+    Gera (mes, DataFrame) com as linhas novas ou alteradas da fonte, em janelas mensais
+    desde a marca d'água do consumidor. `ler(sql, params)` executa a consulta no MySQL.
+
+    A marca avança só depois que o consumidor processa cada lote; se o processo cair no meio,
+    a próxima captura repete o último lote (entrega pelo menos uma vez, idempotente por chave).
+    Tabelas sem janela de revisão não guardam hashes: as linhas com a mesma marca da última
+    captura são entregues de novo.
+    """
+    marca = loja.marca(consumidor, fonte.nome) or inicio
+    desde = marca - fonte.revisao
+    sql = (f"SELECT t.*, {fonte.marca} AS _MARCA FROM {fonte.sql_origem} "
+           f"WHERE {fonte.marca} >= :inicio AND {fonte.marca} < :fim")
+
+    janela, agora = desde, datetime.now()
+    while janela <= agora:
+        fim = _proximo_mes(janela)
+        df = ler(sql, {"inicio": janela, "fim": fim})
+        if not df.empty:
+            marca = max(marca, pd.to_datetime(df["_MARCA"]).max().to_pydatetime())
+            if fonte.revisao:
+                df = _filtrar_alteradas(df, fonte, consumidor, marca - fonte.revisao, loja)
+            if not df.empty:
+                yield janela, df.drop(columns="_MARCA").reset_index(drop=True)
+        loja.gravar_marca(consumidor, fonte.nome, marca)
+        janela = fim
+
+    if fonte.revisao:
+        loja.podar(consumidor, fonte.nome, marca - fonte.revisao)
+
+# =======================
+# CLI
+# =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Marcas d'água da captura de alterações")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("situacao", help="Marca d'água de cada consumidor e tabela")
+    p_rein = sub.add_parser("reiniciar", help="Apaga as marcas (a próxima captura relê tudo)")
+    p_rein.add_argument("consumidor")
+    p_rein.add_argument("tabela", nargs="?")
+
+    args = parser.parse_args(argv)
+    if args.comando == "situacao":
+        print(marcas_dagua.ler().to_string(index=False))
+    else:
+        marcas_dagua.reiniciar(args.consumidor, args.tabela)
+        print(f"Marcas de {args.consumidor} {args.tabela or '(todas as tabelas)'} apagadas")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compactação dos tipos dos DataFrames lidos do banco.
+
+O driver devolve textos repetitivos (loja, modo de venda, curva, descrição do
+centro de custo, placa, status da rota) como objetos str, DECIMAL como objetos
+Decimal e datas às vezes como texto. O registro abaixo diz, por tabela de
+origem, o tipo compacto de cada coluna conhecida; as colunas do resultado são
+casadas pelo nome com as tabelas lidas pela consulta (e com os apelidos usados
+pelas páginas).
+
+    categoria  texto -> category (só quando há muita repetição)
+    inteiro    inteiro sem nulos -> menor tipo inteiro que comporta os valores
+    valor      dinheiro (DECIMAL) -> float64 (float32 perde centavos em totais)
+    medida     quantidades, litros, km, minutos -> float32
+    data       -> datetime64
+
+Quem agrupa por colunas de categoria deve usar groupby(..., observed=True),
+senão o pandas gera as combinações sem linhas.
+"""
+import re
+
+import pandas as pd
+
+# Tabela de origem -> {coluna: tipo}
+COLUNAS_POR_TABELA = {
+    "romaneios_dbf": {"ROMANEIO": "inteiro", "LOJA": "inteiro", "CADASTRO": "data", "TERMINO_SEPARACAO": "data",
+                      "OPERACAO_CODIGO": "inteiro", "SITUACAO": "categoria", "ENTREGA": "categoria"},
+    "romaneios_itens_dbf": {"PRODUTO_CODIGO": "inteiro", "QUANTIDADE": "medida", "VALOR_UNIDADE": "valor"},
+    "compras_pedidos_itens": {"PRODUTO_CODIGO": "inteiro", "QUANTIDADE": "medida", "VALOR_REVENDA": "valor"},
+    "produtos_dbf": {"CURVA_PRODUTO": "categoria"},
+    "produto_estoque": {"CURVA": "categoria"},
+    "expedicao": {"LOJA": "inteiro", "CADASTRO": "data", "HORA_SAIDA": "data"},
+    "expedicao_itens": {"ROTA_STATUS": "categoria", "VENDA_TIPO": "categoria", "EXPEDICAO_TIPO": "categoria",
+                        "ROTA_HORARIO_PREVISTO": "data", "ROTA_HORARIO_REALIZADO": "data", "ROTA_METROS": "medida"},
+    "compras_dbf": {"LOJA": "inteiro", "CADASTRO": "data", "EMISSAO": "data", "VALOR_TOTAL_NOTA": "valor"},
+    "comp_rate_ativ": {"VALR_RATE": "valor", "DSCR": "categoria"},
+    "cadastros_veiculos": {"PLACA": "categoria", "TIPO": "categoria"},
+    "cadastros_veiculos_ultilizacao": {"PLACA": "categoria"},
+    "cadastros_veiculos_abastecimentos": {"LOJA": "inteiro", "CADASTRO": "data", "VALOR_TOTAL": "valor", "KM": "medida",
+                                          "COMBUSTIVEL_1_LITROS": "medida", "COMBUSTIVEL_2_LITROS": "medida"},
+    "contas_pagar": {"LOJA": "inteiro", "PAGO_EM": "data", "VALOR": "valor"},
+    "despesas": {"LOJA": "inteiro", "DATA": "data", "VALOR": "valor", "DESCRICAO": "categoria"},
+    "veloe_extrato": {"placa": "categoria", "data_utilizacao": "data", "valor_cobrado": "valor"},
+    "lojas": {"nome": "categoria"},
+}
+
+# Apelidos das consultas das páginas, válidos para qualquer tabela
+COLUNAS_DERIVADAS = {
+    "LOJA": "inteiro",
+    "MODO": "categoria",
+    "LOJA_CURVA": "categoria",
+    "DESCRICAO": "categoria",
+    "PLACA": "categoria",
+    "Entregador": "categoria",
+    "VALOR": "valor",
+    "VALOR_UNITARIO_CUSTO": "valor",
+    "VALOR_TOTAL_NOTA": "valor",
+    "PERC": "medida",
+}
+
+# Só vira category se os valores distintos forem no máximo esta fração das linhas
+FRACAO_CATEGORIA = 0.5
+
+_PADRAO_TABELAS = re.compile(r"\b(?:FROM|JOIN)\s+(?:\w+\.)?`?(\w+)`?", re.IGNORECASE)
+
+def colunas_da_consulta(query) -> dict:
+    """Tipos das colunas conhecidas para as tabelas lidas pela consulta"""
+    sql = query.text if hasattr(query, "text") else str(query)
+    tipos = dict(COLUNAS_DERIVADAS)
+    for tabela in _PADRAO_TABELAS.findall(sql):
+        tipos.update(COLUNAS_POR_TABELA.get(tabela, {}))
+    return tipos
+
+def _sem_perdas(original: pd.Series, convertida: pd.Series) -> bool:
+    """A conversão não transformou valores em nulos (ex.: texto que não era número/data)"""
+    return convertida.isna().sum() == original.isna().sum()
+
+def _converter(serie: pd.Series, tipo: str) -> pd.Series:
+    if tipo == "categoria":
+        if serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype):
+            if serie.nunique(dropna=True) <= len(serie) * FRACAO_CATEGORIA:
+                return serie.astype("category")
+        return serie
+    if tipo == "data":
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        datas = pd.to_datetime(serie, errors="coerce")
+        return datas if _sem_perdas(serie, datas) else serie
+    numerica = pd.to_numeric(serie, errors="coerce") if serie.dtype == object else serie
+    if not pd.api.types.is_numeric_dtype(numerica) or pd.api.types.is_bool_dtype(numerica):
+        return serie
+    if not _sem_perdas(serie, numerica):
+        return serie
+    if tipo == "inteiro":
+        if numerica.isna().any() or (numerica % 1 != 0).any():
+            return numerica
+        return pd.to_numeric(numerica, downcast="integer")
+    if tipo == "medida":
+        return numerica.astype("float32")
+    return numerica.astype("float64")
+
+def compactar_tipos(df: pd.DataFrame, query=None) -> pd.DataFrame:
+    """Aplica o registro de tipos às colunas do DataFrame (in place) e o retorna"""
+    if df.empty:
+        return df
+    tipos = colunas_da_consulta(query) if query is not None else dict(COLUNAS_DERIVADAS)
+    for coluna in df.columns[~df.columns.duplicated(keep=False)]:
+        tipo = tipos.get(coluna) if isinstance(coluna, str) else None
+        if tipo is not None:
+            try:
+                df[coluna] = _converter(df[coluna], tipo)
+            except (TypeError, ValueError):
+                continue
+    return df
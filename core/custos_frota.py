@@ -0,0 +1,136 @@
+"""
+Custos de frota (rateio das compras por ativo/veículo) lidos uma vez por período.
+
+O mesmo join comp_rate_ativ ⋈ compras_dbf ⋈ cadastros_ativos ⋈ cadastros_veiculos
+⋈ cadastros_veiculos_ultilizacao era executado, com colunas um pouco diferentes,
+duas vezes em custo_entrega_entregadores, duas em custos e uma em custo_entrega.
+Aqui ele é lido uma vez por período com todas as colunas (em cache, sob o
+orçamento de core.cache) e cada página deriva o recorte que usa.
+
+A loja de custos_frota é a de utilização do veículo (cvu.LOJA); COMP_LOJA é a
+loja da compra.
+
+custos_frota_compras lê à parte só comp_rate_ativ ⋈ compras_dbf, sem DISTINCT:
+comp_rate_ativ não tem chave de linha e o DISTINCT do join completo juntaria
+linhas de rateio idênticas (mesma compra, loja, valor e data), reduzindo o
+custo de FROTA somado por custo_entrega.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+from core.cache import cache_data
+from core.db import DatabaseManager
+
+SQL_CUSTOS_FROTA = """
+SELECT DISTINCT
+    cvu.LOJA AS LOJA,
+    c.COMP_CODI AS COMPRA,
+    c.COMP_LOJA,
+    c.CADA_ATIV_ID AS CADASTRO_VEICULO,
+    cv.PLACA,
+    c.VALR_RATE AS VALOR_UNITARIO_CUSTO,
+    (c.VALR_RATE / a.VALOR_TOTAL_NOTA) AS PERC,
+    c.DSCR AS DESCRICAO,
+    a.CADASTRO,
+    a.VALOR_TOTAL_NOTA
+FROM comp_rate_ativ c
+LEFT JOIN compras_dbf a ON c.COMP_CODI = a.COMPRA AND c.COMP_LOJA = a.LOJA
+LEFT JOIN cadastros_ativos ca ON c.CADA_ATIV_ID = ca.CADA_ATIV_ID
+LEFT JOIN cadastros_veiculos cv ON ca.CADA_VEIC_ID = cv.CADA_VEIC_ID
+LEFT JOIN cadastros_veiculos_ultilizacao cvu ON ca.CADA_VEIC_ID = cvu.CADA_VEIC_ID
+WHERE a.CADASTRO BETWEEN :data_inicio AND :data_fim
+ORDER BY a.CADASTRO, c.COMP_LOJA
+"""
+
+# Uma linha por linha de comp_rate_ativ de FROTA (custo_entrega.consulta_custos_totais)
+SQL_CUSTOS_FROTA_COMPRAS = """
+SELECT
+    c.COMP_LOJA AS LOJA,
+    c.COMP_CODI AS COMPRA,
+    c.CADA_ATIV_ID AS CADASTRO_VEICULO,
+    c.VALR_RATE AS VALOR_UNITARIO_CUSTO,
+    (c.VALR_RATE / a.VALOR_TOTAL_NOTA) AS PERC,
+    c.DSCR AS DESCRICAO,
+    a.CADASTRO,
+    a.VALOR_TOTAL_NOTA
+FROM comp_rate_ativ c
+LEFT JOIN compras_dbf a ON c.COMP_CODI = a.COMPRA AND c.COMP_LOJA = a.LOJA
+WHERE a.CADASTRO BETWEEN :data_inicio AND :data_fim AND c.DSCR LIKE :frota
+ORDER BY a.CADASTRO, c.COMP_LOJA
+"""
+
+# Colunas de cada recorte (o DISTINCT das consultas originais vira drop_duplicates)
+COLUNAS_RATEIO = ['LOJA', 'COMPRA', 'CADASTRO_VEICULO', 'PLACA', 'VALOR_UNITARIO_CUSTO', 'PERC', 'DESCRICAO',
+                  'CADASTRO', 'VALOR_TOTAL_NOTA']
+COLUNAS_DETALHE = ['LOJA', 'COMPRA', 'COMP_LOJA', 'CADASTRO_VEICULO', 'PLACA', 'VALOR_UNITARIO_CUSTO', 'DESCRICAO',
+                   'CADASTRO', 'VALOR_TOTAL_NOTA']
+COLUNAS_VEICULO = ['LOJA', 'COMPRA', 'CADASTRO_VEICULO', 'PLACA', 'VALOR_UNITARIO_CUSTO', 'DESCRICAO', 'CADASTRO',
+                   'VALOR_TOTAL_NOTA']
+
+def _data(valor) -> str:
+    return pd.Timestamp(valor).strftime("%Y-%m-%d %H:%M:%S")
+
+@cache_data(ttl=600)
+def _carregar(_engine, data_inicio: str, data_fim: str) -> pd.DataFrame:
+    params = {'data_inicio': data_inicio, 'data_fim': data_fim}
+    return DatabaseManager.read_sql(text(SQL_CUSTOS_FROTA), _engine, params=params, nome="custos_frota",
+                                    replica=True, compactar=True)
+
+def custos_frota(engine, data_inicio, data_fim) -> pd.DataFrame:
+    """Join completo de custos de frota do período (datas sem hora valem 00:00:00, como no BETWEEN)"""
+    return _carregar(engine, _data(data_inicio), _data(data_fim))
+
+@cache_data(ttl=600)
+def _carregar_compras(_engine, data_inicio: str, data_fim: str) -> pd.DataFrame:
+    params = {'data_inicio': data_inicio, 'data_fim': data_fim, 'frota': '%FROTA%'}
+    return DatabaseManager.read_sql(text(SQL_CUSTOS_FROTA_COMPRAS), _engine, params=params,
+                                    nome="custos_frota_compras", replica=True, compactar=True)
+
+def custos_frota_compras(engine, data_inicio, data_fim) -> pd.DataFrame:
+    """Linhas de rateio de FROTA do período pela loja da compra, sem deduplicar"""
+    return _carregar_compras(engine, _data(data_inicio), _data(data_fim))
+
+def _filtrar(df, lojas=None, descricoes=None, coluna_loja='LOJA') -> pd.DataFrame:
+    if lojas:
+        df = df[df[coluna_loja].isin(lojas)]
+    if descricoes:
+        df = df[df['DESCRICAO'].isin(descricoes)]
+    return df
+
+# =======================
+# RECORTES
+# =======================
+def rateio(df: pd.DataFrame) -> pd.DataFrame:
+    """Linhas de rateio com o percentual da nota (QUERY 2 de custo_entrega_entregadores)"""
+    return df[COLUNAS_RATEIO].drop_duplicates().reset_index(drop=True)
+
+def detalhe(df: pd.DataFrame) -> pd.DataFrame:
+    """Detalhe dos centros de custo com a loja da compra (QUERY 4 de custo_entrega_entregadores)"""
+    return df[COLUNAS_DETALHE].drop_duplicates().reset_index(drop=True)
+
+def rateio_frota_mensal(df: pd.DataFrame) -> pd.DataFrame:
+    """Custo de FROTA por loja, mês e descrição (VALOR_CUSTO_LOJA, PERIODO)"""
+    df_frota = df[df['DESCRICAO'].astype(str).str.contains('FROTA', case=False, na=False)]
+    df_rate = df_frota.groupby([
+        'LOJA',
+        pd.Grouper(key='CADASTRO', freq='ME'),
+        'DESCRICAO'
+    ], observed=True)['VALOR_UNITARIO_CUSTO'].sum().round(2).reset_index()
+    df_rate = df_rate.rename(columns={'VALOR_UNITARIO_CUSTO': 'VALOR_CUSTO_LOJA'})
+    df_rate['PERIODO'] = df_rate['CADASTRO'].dt.to_period('M')
+    return df_rate
+
+def custos_por_veiculo(df, lojas=None, descricoes=None) -> pd.DataFrame:
+    """Custos por loja de utilização e veículo, ordenados pela loja (custos.consulta_custos_totais)"""
+    recorte = _filtrar(df, lojas, descricoes)[COLUNAS_VEICULO].drop_duplicates()
+    return recorte.sort_values('LOJA', kind='stable').reset_index(drop=True)
+
+def custos_todas_lojas(df, descricoes=None) -> pd.DataFrame:
+    """Valores distintos por loja de utilização (custos.consulta_custos_todas_lojas)"""
+    recorte = _filtrar(df, descricoes=descricoes)[['LOJA', 'VALOR_UNITARIO_CUSTO']].drop_duplicates()
+    return recorte.sort_values('LOJA', kind='stable').reset_index(drop=True)
+
+def custos_frota_por_compra(df, lojas=None, descricoes=None) -> pd.DataFrame:
+    """Custos de FROTA pela loja da compra (recebe custos_frota_compras; linhas repetidas são mantidas)"""
+    recorte = _filtrar(df, lojas, descricoes)
+    return recorte.sort_values(['CADASTRO', 'LOJA'], kind='stable').reset_index(drop=True)
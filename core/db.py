@@ -1,13 +1,170 @@
 import streamlit as st
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import pandas as pd
 from typing import Optional
+from contextlib import contextmanager
+from datetime import date, datetime
+import itertools
+import time
+import threading
+import os
+import re
+
+from core.arrow import FonteArrow, disponivel as arrow_disponivel, ler_arrow
+from core.instrumentacao import executar_consulta
+from core.replica import consultar as consultar_replica
+
+class AdmissionController:
+    """Controla a admissão de consultas pesadas (limite global e por usuário)"""
+
+    # Consultas com período maior que este número de dias são consideradas pesadas
+    DIAS_CONSULTA_PESADA = int(os.getenv("DB_DIAS_CONSULTA_PESADA", "180"))
+    # Estimativa de linhas (EXPLAIN) a partir da qual a consulta é pesada
+    LINHAS_CONSULTA_PESADA = int(os.getenv("DB_LINHAS_CONSULTA_PESADA", "2000000"))
+    # Usa EXPLAIN quando não for possível estimar pelo período (custa uma ida ao banco)
+    USAR_EXPLAIN = os.getenv("DB_ADMISSAO_EXPLAIN", "0") == "1"
+
+    _PADRAO_DATA = re.compile(r"'(\d{4}-\d{2}-\d{2})")
+
+    def __init__(self, limite_global: int, limite_usuario: int):
+        self.limite_global = limite_global
+        self.limite_usuario = limite_usuario
+        self._cond = threading.Condition()
+        self._fila = []
+        self._ativas_global = 0
+        self._ativas_usuario = {}
+        self._sequencia = itertools.count()
+
+    # ----- Classificação -----
+
+    @classmethod
+    def periodo_da_consulta(cls, query: str, params: Optional[dict] = None) -> Optional[int]:
+        """Retorna o período (em dias) coberto pelas datas da consulta ou dos parâmetros"""
+        datas = cls._PADRAO_DATA.findall(str(query))
+        for valor in (params or {}).values():
+            if isinstance(valor, date):
+                datas.append(valor.strftime("%Y-%m-%d"))
+            elif isinstance(valor, str):
+                datas.extend(re.findall(r"^(\d{4}-\d{2}-\d{2})", valor))
+        if len(datas) < 2:
+            return None
+        datas = sorted(datetime.strptime(d, "%Y-%m-%d") for d in datas)
+        return (datas[-1] - datas[0]).days + 1
+
+    @classmethod
+    def linhas_estimadas(cls, query, engine, params: Optional[dict] = None) -> Optional[int]:
+        """Soma das linhas estimadas pelo EXPLAIN do MySQL"""
+        sql = (query.text if hasattr(query, "text") else str(query)).strip().rstrip(";")
+        explain = text(f"EXPLAIN {sql}") if hasattr(query, "text") else f"EXPLAIN {sql}"
+        try:
+            with engine.connect() as conn:
+                plano = pd.read_sql(explain, conn, params=params)
+            if "rows" not in plano.columns:
+                return None
+            return int(pd.to_numeric(plano["rows"], errors="coerce").fillna(0).sum())
+        except Exception:
+            return None
+
+    @classmethod
+    def classificar(cls, query, params: Optional[dict] = None, engine=None) -> str:
+        """Classifica a consulta em 'pesada' ou 'leve' pelo custo estimado"""
+        dias = cls.periodo_da_consulta(query.text if hasattr(query, "text") else query, params)
+        if dias is not None:
+            return "pesada" if dias > cls.DIAS_CONSULTA_PESADA else "leve"
+        if cls.USAR_EXPLAIN and engine is not None:
+            linhas = cls.linhas_estimadas(query, engine, params)
+            if linhas is not None and linhas > cls.LINHAS_CONSULTA_PESADA:
+                return "pesada"
+        return "leve"
+
+    # ----- Fila de admissão -----
+
+    def _pode_entrar(self, ticket) -> bool:
+        """Verifica limites e respeita a ordem de chegada da fila"""
+        if self._ativas_global >= self.limite_global:
+            return False
+        if self._ativas_usuario.get(ticket[1], 0) >= self.limite_usuario:
+            return False
+        for outro in self._fila:
+            if outro is ticket:
+                return True
+            # Um ticket anterior que também poderia entrar tem prioridade
+            if self._ativas_usuario.get(outro[1], 0) < self.limite_usuario:
+                return False
+        return False
+
+    def posicao(self, ticket) -> int:
+        """Posição (1-based) do ticket na fila"""
+        with self._cond:
+            return self._fila.index(ticket) + 1 if ticket in self._fila else 0
+
+    def estatisticas(self) -> dict:
+        """Situação atual do controlador"""
+        with self._cond:
+            return {
+                "ativas": self._ativas_global,
+                "na_fila": len(self._fila),
+                "limite_global": self.limite_global,
+                "limite_usuario": self.limite_usuario,
+                "ativas_por_usuario": dict(self._ativas_usuario),
+            }
+
+    @contextmanager
+    def admitir(self, usuario: str, ao_aguardar=None):
+        """Aguarda vaga para uma consulta pesada; ao_aguardar(posicao, total) é chamado enquanto espera"""
+        ticket = (next(self._sequencia), usuario)
+        with self._cond:
+            self._fila.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    if self._pode_entrar(ticket):
+                        self._fila.remove(ticket)
+                        self._ativas_global += 1
+                        self._ativas_usuario[usuario] = self._ativas_usuario.get(usuario, 0) + 1
+                        break
+                    posicao, total = self._fila.index(ticket) + 1, len(self._fila)
+                if ao_aguardar:
+                    ao_aguardar(posicao, total)
+                with self._cond:
+                    self._cond.wait(timeout=1.0)
+        except BaseException:
+            # Rerun/interrupção do Streamlit enquanto aguardava na fila
+            with self._cond:
+                if ticket in self._fila:
+                    self._fila.remove(ticket)
+                self._cond.notify_all()
+            raise
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._ativas_global -= 1
+                self._ativas_usuario[usuario] -= 1
+                if self._ativas_usuario[usuario] <= 0:
+                    del self._ativas_usuario[usuario]
+                self._cond.notify_all()
+
+# Controlador único por processo
+admissao = AdmissionController(
+    limite_global=int(os.getenv("DB_LIMITE_PESADAS_GLOBAL", "3")),
+    limite_usuario=int(os.getenv("DB_LIMITE_PESADAS_USUARIO", "1")),
+)
+
+def usuario_atual() -> str:
+    """Identifica o usuário da sessão para o controle por usuário"""
+    try:
+        user_info = st.session_state.get("user_info") or {}
+        return user_info.get("email") or user_info.get("name") or "anonimo"
+    except Exception:
+        return "anonimo"
 
 class DatabaseManager:
     """Gerenciador de conexões com banco de dados"""
-    
+
     _engine = None
-    
+
     @classmethod
     def get_engine(cls):
         """Retorna engine de conexão (singleton)"""
@@ -17,12 +174,52 @@ class DatabaseManager:
                   f"{config['host']}:{config['port']}/{config['database']}"
             cls._engine = create_engine(url, pool_pre_ping=True)
         return cls._engine
-    
+
+    @classmethod
+    def read_sql(cls, query, con=None, params: Optional[dict] = None, nome: Optional[str] = None,
+                 replica: bool = False, arrow: bool = False, compactar: bool = False) -> pd.DataFrame:
+        """
+        Executa pd.read_sql com instrumentação e controle de admissão de consultas pesadas.
+        Com replica=True a consulta (analítica) é atendida pela réplica DuckDB quando possível;
+        com arrow=True o resultado é lido em formato colunar (core.arrow) quando possível;
+        com compactar=True os tipos das colunas conhecidas são reduzidos (core.compactacao).
+        """
+        if replica:
+            df = consultar_replica(query, params, nome, compactar=compactar)
+            if df is not None:
+                return df
+
+        con = con if con is not None else cls.get_engine()
+        classe = admissao.classificar(query, params, con)
+        leitor = None
+        if arrow and arrow_disponivel(query, con, params):
+            # Lida pelo connectorx fora do pool, sob o limite de leituras Arrow
+            con, leitor = FonteArrow(con), ler_arrow
+
+        if classe != "pesada":
+            return executar_consulta(query, con, params, nome=nome, leitor=leitor, compactar=compactar)
+
+        aviso = st.empty()
+
+        def mostrar_posicao(posicao, total):
+            aviso.info(f"⏳ Muitas consultas pesadas em andamento. "
+                       f"Sua consulta está na posição {posicao} de {total} da fila...")
+
+        inicio = time.perf_counter()
+        try:
+            with admissao.admitir(usuario_atual(), ao_aguardar=mostrar_posicao):
+                aviso.empty()
+                return executar_consulta(query, con, params, nome=nome, classe="pesada",
+                                         espera_fila=time.perf_counter() - inicio, leitor=leitor,
+                                         compactar=compactar)
+        finally:
+            aviso.empty()
+
     @classmethod
-    def execute_query(cls, query: str) -> pd.DataFrame:
+    def execute_query(cls, query: str, params: Optional[dict] = None) -> pd.DataFrame:
         """Executa query e retorna DataFrame"""
         try:
-            return pd.read_sql_query(query, cls.get_engine())
+            return cls.read_sql(query, params=params)
         except Exception as e:
             st.error(f"Erro na consulta: {e}")
             return pd.DataFrame()
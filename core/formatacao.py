@@ -0,0 +1,147 @@
+"""
+Formatação pt-BR de colunas inteiras (tabelas e rótulos de gráficos).
+
+As páginas formatavam cada célula com uma função Python (f"{x:,.2f}" seguido de
+replace). Aqui a coluna é formatada de uma vez: a parte inteira é quebrada em
+grupos de milhar com aritmética NumPy e os pedaços de texto são concatenados
+com np.char, sem chamada Python por valor.
+
+    moeda_br(df['custo_total'])      # R$ 1.234,56
+    numero_br(df['expedicoes'])      # 12.345
+    percentual_br(df['cobertura'])   # 45,30%
+    duracao_hms(df['minutos'])       # 01:30:00
+    duracao_curta(df['minutos'])     # 1d 2h 5m
+
+Quando a tabela não precisa do separador pt-BR (ou precisa ordenar pelos
+valores), prefira passar os números crus ao st.dataframe com os column_config
+de colunas_numericas.
+
+    python -m core.formatacao     # confere os formatadores contra o f-string e com entrada vazia
+"""
+import numpy as np
+import pandas as pd
+
+def _indice(valores):
+    return valores.index if isinstance(valores, (pd.Series, pd.Index)) else None
+
+def _agrupar_milhares(inteiros: np.ndarray) -> np.ndarray:
+    """Inteiros não negativos -> texto com ponto como separador de milhar"""
+    texto = inteiros.astype(str)
+    maior = int(inteiros.max()) if inteiros.size else 0
+    grupos = max(len(str(maior)) - 1, 0) // 3
+    if grupos == 0:
+        return texto
+    # Do grupo mais alto para o mais baixo: o primeiro grupo presente vai sem zeros à esquerda
+    resultado = np.full(inteiros.shape, "", dtype=f"<U{len(str(maior)) + grupos}")
+    for nivel in range(grupos, -1, -1):
+        base = 1000 ** nivel
+        grupo = (inteiros // base) % 1000
+        antes = inteiros >= base * 1000
+        presente = (inteiros >= base) | (nivel == 0)
+        resultado = np.where(antes, np.char.add(np.char.add(resultado, "."), np.char.zfill(grupo.astype(str), 3)),
+                             np.where(presente, np.char.add(resultado, grupo.astype(str)), resultado))
+    return resultado
+
+def _formatar(valores, decimais: int):
+    """(índice, texto, válidos) dos valores formatados em pt-BR"""
+    indice = _indice(valores)
+    numeros = pd.to_numeric(pd.Series(np.asarray(valores)), errors="coerce").to_numpy(dtype="float64")
+    validos = np.isfinite(numeros)
+    if not numeros.size:
+        # np.char.zfill falha em array vazio; a série sai vazia, object, no mesmo índice
+        return indice, np.array([], dtype=str), validos
+    escala = 10 ** decimais
+    absolutos = np.where(validos, np.abs(numeros), 0)
+    escalados = absolutos * escala
+    arredondados = np.round(escalados)
+    # Perto de meia unidade o produto em float pode cair do lado errado (np.round ainda
+    # desempata para o par); esses poucos valores são arredondados pelo próprio '%.Nf',
+    # como o f"{v:,.Nf}" que esta formatação substituiu
+    duvida = np.abs(escalados - np.floor(escalados) - 0.5) <= escalados * 1e-12 + 1e-9
+    if duvida.any():
+        arredondados[duvida] = [int(f"{v:.{decimais}f}".replace(".", "")) for v in absolutos[duvida]]
+    arredondados = arredondados.astype("int64")
+    inteiros, fracao = np.divmod(arredondados, escala)
+    texto = _agrupar_milhares(inteiros)
+    if decimais:
+        texto = np.char.add(np.char.add(texto, ","), np.char.zfill(fracao.astype(str), decimais))
+    negativo = validos & (numeros < 0) & (arredondados > 0)
+    return indice, np.where(negativo, np.char.add("-", texto), texto), validos
+
+def _serie(texto, validos, nulo, indice) -> pd.Series:
+    return pd.Series(np.where(validos, texto, nulo).astype(object), index=indice)
+
+def numero_br(valores, decimais: int = 0, nulo: str = "") -> pd.Series:
+    """Números com ponto de milhar e vírgula decimal (nulos viram `nulo`)"""
+    indice, texto, validos = _formatar(valores, decimais)
+    return _serie(texto, validos, nulo, indice)
+
+def moeda_br(valores, decimais: int = 2, nulo: str = "") -> pd.Series:
+    """Valores em reais: R$ 1.234,56"""
+    indice, texto, validos = _formatar(valores, decimais)
+    return _serie(np.char.add("R$ ", texto), validos, nulo, indice)
+
+def percentual_br(valores, decimais: int = 2, fracao: bool = False, nulo: str = "") -> pd.Series:
+    """Percentuais com vírgula decimal: 45,30% (fracao=True para valores entre 0 e 1)"""
+    numeros = pd.to_numeric(pd.Series(np.asarray(valores), index=_indice(valores)), errors="coerce")
+    indice, texto, validos = _formatar(numeros * 100 if fracao else numeros, decimais)
+    return _serie(np.char.add(texto, "%"), validos, nulo, indice)
+
+def _partes_duracao(minutos):
+    indice = _indice(minutos)
+    numeros = pd.to_numeric(pd.Series(np.asarray(minutos)), errors="coerce").to_numpy(dtype="float64")
+    validos = np.isfinite(numeros)
+    return indice, numeros, validos
+
+def duracao_hms(minutos, nulo: str = "00:00:00") -> pd.Series:
+    """Minutos -> HH:MM:SS (segundos truncados; nulos e zero viram `nulo`)"""
+    indice, numeros, validos = _partes_duracao(minutos)
+    if not numeros.size:
+        return _serie(np.array([], dtype=str), validos, nulo, indice)
+    segundos = np.where(validos, numeros * 60, 0).astype("int64")
+    horas, resto = np.divmod(segundos, 3600)
+    mins, segs = np.divmod(resto, 60)
+    texto = np.char.add(np.char.add(np.char.add(np.char.add(
+        np.char.zfill(horas.astype(str), 2), ":"), np.char.zfill(mins.astype(str), 2)), ":"),
+        np.char.zfill(segs.astype(str), 2))
+    return _serie(texto, validos & (numeros != 0), nulo, indice)
+
+def duracao_curta(minutos, nulo: str = "0m") -> pd.Series:
+    """Minutos -> '1d 2h 5m', omitindo as partes zeradas (nulos e zero viram `nulo`)"""
+    indice, numeros, validos = _partes_duracao(minutos)
+    inteiros = np.where(validos, numeros, 0).astype("int64")
+    dias, resto = np.divmod(inteiros, 1440)
+    horas, mins = np.divmod(resto, 60)
+    texto = np.full(inteiros.shape, "", dtype=object)
+    for valor, sufixo, mostrar in ((dias, "d", dias > 0), (horas, "h", horas > 0),
+                                   (mins, "m", (mins > 0) | ((dias == 0) & (horas == 0)))):
+        parte = np.char.add(valor.astype(str), sufixo).astype(object)
+        texto = np.where(mostrar, np.where(texto == "", parte, texto + " " + parte), texto)
+    return _serie(texto, validos & (numeros != 0), nulo, indice)
+
+def colunas_numericas(moeda=(), inteiros=(), percentuais=(), decimais=(), rotulos: dict = None) -> dict:
+    """column_config do st.dataframe para exibir números crus (ordenáveis) com formato fixo"""
+    import streamlit as st
+    rotulos = rotulos or {}
+    formatos = [(moeda, "R$ %.2f"), (inteiros, "%d"), (percentuais, "%.2f%%"), (decimais, "%.2f")]
+    return {coluna: st.column_config.NumberColumn(rotulos.get(coluna, coluna), format=formato)
+            for colunas, formato in formatos for coluna in colunas}
+
+def verificar():
+    """Confere os formatadores com o f"{:,.Nf}" que substituíram, inclusive com entrada vazia"""
+    vazio = pd.Series([], index=pd.Index([], name="LOJA"), dtype="float64")
+    for nome, formatado in (("moeda_br", moeda_br(vazio)), ("numero_br", numero_br(vazio, 2)),
+                            ("percentual_br", percentual_br(vazio)), ("duracao_hms", duracao_hms(vazio)),
+                            ("duracao_curta", duracao_curta(vazio))):
+        assert formatado.empty and formatado.dtype == object and formatado.index.name == "LOJA", nome
+    numeros = np.random.default_rng(0).uniform(-1e6, 1e6, 100_000).round(3)
+    for decimais in (0, 2):
+        esperado = [f"{v:,.{decimais}f}".replace(",", "_").replace(".", ",").replace("_", ".") for v in numeros]
+        esperado = [t[1:] if t.strip("-0,") == "" else t for t in esperado]
+        divergentes = (numero_br(numeros, decimais).to_numpy() != np.array(esperado, dtype=object)).sum()
+        assert not divergentes, f"numero_br(decimais={decimais}): {divergentes} valores diferentes do f-string"
+    print("formatacao: ok")
+
+
+if __name__ == "__main__":
+    verificar()
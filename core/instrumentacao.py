@@ -0,0 +1,266 @@
+"""
+Instrumentação das consultas ao banco.
+
+Toda consulta feita por DatabaseManager.read_sql é medida (página, nome da
+consulta, hash dos parâmetros, tempo total, espera pelo pool, linhas e bytes)
+e gravada em um log SQLite local. Consultas acima do limite de lentidão têm o
+plano de execução (EXPLAIN FORMAT=JSON) capturado automaticamente.
+
+Ranking das piores consultas:
+    python -m core.instrumentacao ranking --top 20 --dias 7
+    python -m core.instrumentacao explain <id>
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+import sys
+import os
+
+import pandas as pd
+from sqlalchemy.engine import Engine
+
+from core.compactacao import compactar_tipos
+from core.metricas import metricas, registrar_espera_pool
+
+_DIR_CORE = os.path.dirname(os.path.abspath(__file__))
+_DIR_PROJETO = os.path.dirname(_DIR_CORE)
+
+CAMINHO_LOG = os.getenv("DB_LOG_CONSULTAS", os.path.join(_DIR_PROJETO, "logs", "consultas.sqlite"))
+LIMITE_LENTA_SEGUNDOS = float(os.getenv("DB_CONSULTA_LENTA_SEGUNDOS", "2.0"))
+
+# Funções auxiliares que não identificam a consulta (apenas repassam a query)
+_FUNCOES_GENERICAS = {"executar_query", "read_sql", "execute_query", "<module>", "wrapper"}
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS consultas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    quando TEXT NOT NULL,
+    pagina TEXT,
+    nome TEXT,
+    params_hash TEXT,
+    duracao REAL,
+    espera_pool REAL,
+    espera_fila REAL,
+    linhas INTEGER,
+    bytes INTEGER,
+    bytes_economizados INTEGER,
+    classe TEXT,
+    erro TEXT,
+    explain TEXT
+)
+"""
+
+class QueryLog:
+    """Log local (SQLite) das consultas executadas"""
+
+    def __init__(self, caminho: str = CAMINHO_LOG):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _conexao(self):
+        if self._conn is None:
+            Path(self.caminho).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.caminho, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_ESQUEMA)
+            self._migrar(self._conn)
+        return self._conn
+
+    @staticmethod
+    def _migrar(conn):
+        """Adiciona as colunas criadas depois da primeira versão do log"""
+        colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(consultas)")}
+        if "bytes_economizados" not in colunas:
+            conn.execute("ALTER TABLE consultas ADD COLUMN bytes_economizados INTEGER")
+
+    def gravar(self, registro: dict):
+        """Grava um registro de consulta (falhas no log nunca afetam a página)"""
+        colunas = list(registro.keys())
+        sql = f"INSERT INTO consultas ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+        try:
+            with self._lock:
+                conn = self._conexao()
+                conn.execute(sql, [registro[c] for c in colunas])
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def ler(self, dias: Optional[int] = None) -> pd.DataFrame:
+        """Lê o log como DataFrame, opcionalmente apenas os últimos dias"""
+        if not os.path.exists(self.caminho):
+            return pd.DataFrame()
+        with sqlite3.connect(self.caminho) as conn:
+            self._migrar(conn)
+            if dias is None:
+                return pd.read_sql_query("SELECT * FROM consultas", conn)
+            desde = (datetime.now() - timedelta(days=dias)).isoformat(timespec="seconds")
+            return pd.read_sql_query("SELECT * FROM consultas WHERE quando >= ?", conn, params=(desde,))
+
+log_consultas = QueryLog()
+
+def origem_da_chamada() -> tuple:
+    """Identifica (pagina, nome da consulta) a partir da pilha de chamadas"""
+    pagina, nome = None, None
+    frame = sys._getframe(1)
+    while frame is not None:
+        arquivo = os.path.abspath(frame.f_code.co_filename)
+        if os.path.dirname(arquivo) != _DIR_CORE:
+            if nome is None and frame.f_code.co_name not in _FUNCOES_GENERICAS:
+                nome = frame.f_code.co_name
+            if os.path.basename(os.path.dirname(arquivo)) == "pages":
+                pagina = os.path.splitext(os.path.basename(arquivo))[0]
+                break
+        frame = frame.f_back
+    return pagina or "app", nome or "consulta"
+
+def hash_parametros(query, params: Optional[dict] = None) -> str:
+    """Hash curto da query + parâmetros para agrupar execuções iguais"""
+    sql = query.text if hasattr(query, "text") else str(query)
+    base = sql + "|" + repr(sorted((params or {}).items()))
+    return hashlib.sha1(base.encode("utf-8")).hexdigest()[:16]
+
+def bytes_estimados(df: pd.DataFrame) -> int:
+    """Memória do DataFrame; frames grandes são estimados por amostra"""
+    if len(df) <= 100_000:
+        return int(df.memory_usage(deep=True).sum())
+    amostra = df.sample(10_000, random_state=0)
+    return int(amostra.memory_usage(deep=True).sum() * len(df) / len(amostra))
+
+def capturar_explain(query, conn, params: Optional[dict] = None) -> Optional[str]:
+    """Executa EXPLAIN FORMAT=JSON para a consulta (apenas MySQL/SELECT)"""
+    if hasattr(conn, "conectar"):  # FonteArrow (core.arrow) não é conexão SQLAlchemy: EXPLAIN pelo engine
+        conn = conn.engine
+    if getattr(getattr(conn, "dialect", None), "name", None) != "mysql":
+        return None
+    sql = (query.text if hasattr(query, "text") else str(query)).strip().rstrip(";")
+    if not sql.upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        from sqlalchemy import text
+        explain = text(f"EXPLAIN FORMAT=JSON {sql}") if hasattr(query, "text") else f"EXPLAIN FORMAT=JSON {sql}"
+        plano = pd.read_sql(explain, conn, params=params)
+        return str(plano.iloc[0, 0]) if not plano.empty else None
+    except Exception:
+        return None
+
+def _read_sql(query, conn, params: Optional[dict] = None) -> pd.DataFrame:
+    return pd.read_sql(query, conn, params=params)
+
+@contextmanager
+def _conexao_medida(con):
+    """Abre conexão a partir do engine medindo a espera pelo pool (ou pela vaga da fonte)"""
+    if hasattr(con, "conectar"):
+        with con.conectar() as (conn, espera):
+            yield conn, espera
+    elif isinstance(con, Engine):
+        metricas.registrar_engine(con)
+        inicio = time.perf_counter()
+        with con.connect() as conn:
+            espera = time.perf_counter() - inicio
+            registrar_espera_pool(con, espera)
+            yield conn, espera
+    else:
+        yield con, 0.0
+
+def executar_consulta(query, con, params: Optional[dict] = None, nome: Optional[str] = None,
+                      classe: str = "leve", espera_fila: float = 0.0, leitor=None,
+                      compactar: bool = False) -> pd.DataFrame:
+    """
+    Executa pd.read_sql registrando tempo, volume e plano das consultas lentas.
+    `leitor(query, conn, params)` substitui o pd.read_sql (ex.: consultas na réplica DuckDB);
+    com compactar=True os tipos são reduzidos pelo registro de core.compactacao.
+    """
+    pagina, nome_origem = origem_da_chamada()
+    registro = {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "pagina": pagina,
+        "nome": nome or nome_origem,
+        "params_hash": hash_parametros(query, params),
+        "classe": classe,
+        "espera_fila": round(espera_fila, 4),
+    }
+    inicio = time.perf_counter()
+    try:
+        with _conexao_medida(con) as (conn, espera_pool):
+            registro["espera_pool"] = round(espera_pool, 4)
+            df = (leitor or _read_sql)(query, conn, params)
+            registro["duracao"] = round(time.perf_counter() - inicio, 4)
+            if registro["duracao"] >= LIMITE_LENTA_SEGUNDOS:
+                registro["explain"] = capturar_explain(query, conn, params)
+        registro["linhas"] = len(df)
+        registro["bytes"] = bytes_estimados(df)
+        if compactar:
+            df = compactar_tipos(df, query)
+            bytes_compactado = bytes_estimados(df)
+            registro["bytes_economizados"] = registro["bytes"] - bytes_compactado
+            registro["bytes"] = bytes_compactado
+        return df
+    except Exception as e:
+        registro["duracao"] = round(time.perf_counter() - inicio, 4)
+        registro["erro"] = str(e)[:500]
+        raise
+    finally:
+        log_consultas.gravar(registro)
+        metricas.registrar_consulta(registro)
+
+# =======================
+# CLI
+# =======================
+def ranking(df: pd.DataFrame, ordem: str = "total", top: int = 20) -> pd.DataFrame:
+    """Agrupa o log por página/consulta e ordena pelas piores"""
+    if df.empty:
+        return df
+    agrupado = df.groupby(["pagina", "nome"]).agg(
+        execucoes=("duracao", "size"),
+        total=("duracao", "sum"),
+        p50=("duracao", "median"),
+        p95=("duracao", lambda s: s.quantile(0.95)),
+        maximo=("duracao", "max"),
+        espera_pool=("espera_pool", "mean"),
+        espera_fila=("espera_fila", "mean"),
+        linhas=("linhas", "mean"),
+        mb=("bytes", lambda s: s.mean() / 1024 ** 2),
+        economia_mb=("bytes_economizados", lambda s: s.mean() / 1024 ** 2),
+        erros=("erro", "count"),
+        com_explain=("explain", "count"),
+    ).reset_index()
+    return agrupado.sort_values(ordem, ascending=False).head(top).round(3)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Log de consultas do dashboard")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_rank = sub.add_parser("ranking", help="Piores consultas por página/nome")
+    p_rank.add_argument("--top", type=int, default=20)
+    p_rank.add_argument("--dias", type=int, default=None, help="Considerar apenas os últimos N dias")
+    p_rank.add_argument("--ordem", choices=["total", "p50", "p95", "maximo", "execucoes", "linhas", "mb", "economia_mb"],
+                        default="total")
+
+    p_exp = sub.add_parser("explain", help="Mostra o EXPLAIN capturado de uma execução")
+    p_exp.add_argument("id", type=int)
+
+    args = parser.parse_args(argv)
+    df = log_consultas.ler(getattr(args, "dias", None))
+    if df.empty:
+        print(f"Nenhuma consulta registrada em {log_consultas.caminho}")
+        return
+
+    if args.comando == "ranking":
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(ranking(df, args.ordem, args.top).to_string(index=False))
+    else:
+        linha = df[df["id"] == args.id]
+        if linha.empty or pd.isna(linha["explain"].iloc[0]):
+            print(f"Execução {args.id} sem EXPLAIN capturado")
+        else:
+            print(linha["explain"].iloc[0])
+
+if __name__ == "__main__":
+    main()
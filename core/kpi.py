@@ -0,0 +1,38 @@
+"""
+Indicadores derivados (razões, totais e participações) calculados por coluna.
+
+Substitui os df.apply(..., axis=1) das páginas: as divisões usam máscaras do
+NumPy para o denominador zero/nulo, de modo que o custo cresce com o número de
+linhas sem chamada Python por linha.
+"""
+import numpy as np
+import pandas as pd
+
+def razao(numerador, denominador, se_zero=0.0, decimais: int = None) -> pd.Series:
+    """numerador / denominador onde o denominador > 0; nas demais linhas, `se_zero` (valor ou coluna)"""
+    num = pd.to_numeric(numerador, errors="coerce")
+    den = pd.to_numeric(denominador, errors="coerce")
+    indice = num.index if isinstance(num, pd.Series) else None
+    num = np.asarray(num, dtype="float64")
+    den = np.asarray(den, dtype="float64")
+    valido = den > 0
+    resultado = np.divide(num, den, out=np.zeros_like(num), where=valido)
+    if decimais is not None:
+        resultado = np.round(resultado, decimais)
+    alternativo = np.broadcast_to(np.asarray(se_zero, dtype="float64"), resultado.shape)
+    return pd.Series(np.where(valido, resultado, alternativo), index=indice)
+
+def participacao(df: pd.DataFrame, coluna: str, por=None) -> pd.Series:
+    """Fração de cada linha no total da coluna (ou no total do grupo `por`)"""
+    valores = df[coluna].astype("float64")
+    total = valores.groupby([df[c] for c in np.atleast_1d(por)], observed=True).transform("sum") if por else valores.sum()
+    return razao(valores, total)
+
+def totais(df: pd.DataFrame, colunas: list) -> dict:
+    """Soma de cada coluna como float (0.0 para frame vazio)"""
+    return {coluna: float(df[coluna].sum()) if len(df) else 0.0 for coluna in colunas}
+
+def razao_total(df: pd.DataFrame, numerador: str, denominador: str) -> float:
+    """Razão entre as somas das colunas (0.0 se o denominador somar zero)"""
+    soma = totais(df, [numerador, denominador])
+    return soma[numerador] / soma[denominador] if soma[denominador] > 0 else 0.0
@@ -0,0 +1,214 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import threading
+import time
+import sys
+import weakref
+
+import pandas as pd
+from sqlalchemy import event
+
+from core.prometheus import Contador, Histograma, Coletada
+from core.profiler import perfilar_pagina
+
+PAGINAS_EXECUCOES = Contador("dashboard_page_runs_total", "Execucoes de script por pagina", ["pagina"])
+PAGINAS_DURACAO = Histograma("dashboard_page_duration_seconds", "Duracao do script por pagina", ["pagina"])
+CONSULTAS_DURACAO = Histograma("dashboard_query_duration_seconds", "Latencia das consultas ao banco",
+                               ["pagina", "nome", "classe"])
+CONSULTAS_LINHAS = Contador("dashboard_query_rows_total", "Linhas retornadas pelas consultas", ["pagina", "nome"])
+CONSULTAS_ECONOMIA = Contador("dashboard_query_bytes_saved_total", "Bytes economizados pela compactacao de tipos",
+                              ["pagina", "nome"])
+CONSULTAS_ERROS = Contador("dashboard_query_errors_total", "Consultas com erro", ["pagina", "nome"])
+CONSULTAS_FILA = Histograma("dashboard_query_queue_wait_seconds", "Espera na fila de consultas pesadas", ["pagina"])
+API_CHAMADAS = Contador("dashboard_api_requests_total", "Chamadas a APIs externas", ["api", "endpoint", "status"])
+API_DURACAO = Histograma("dashboard_api_request_duration_seconds", "Latencia das APIs externas", ["api", "endpoint"])
+POOL_CHECKOUTS = Contador("dashboard_pool_checkouts_total", "Conexoes retiradas do pool", ["engine"])
+REPLICA_FALLBACKS = Contador("dashboard_replica_fallbacks_total",
+                             "Consultas que a replica nao atendeu e seguiram pelo MySQL", ["pagina", "nome", "erro"])
+POOL_ESPERA = Histograma("dashboard_pool_wait_seconds", "Espera para obter conexao do pool", ["engine"])
+
+class Metricas:
+    """Registro em memória (por processo) dos tempos de páginas e consultas"""
+
+    def __init__(self, janela: int = 2000):
+        self._lock = threading.Lock()
+        self._paginas = defaultdict(lambda: deque(maxlen=janela))
+        self._consultas = defaultdict(lambda: deque(maxlen=janela))
+        self._engines = weakref.WeakValueDictionary()
+        self._fallbacks_replica = defaultdict(int)
+        self._totais = {"consultas": 0, "linhas": 0, "erros": 0, "bytes_economizados": 0,
+                        "duracao": 0.0, "espera_pool": 0.0, "espera_fila": 0.0}
+
+    def registrar_pagina(self, pagina: str, duracao: float):
+        """Registra o tempo de uma execução de página"""
+        with self._lock:
+            self._paginas[pagina].append(duracao)
+        PAGINAS_EXECUCOES.inc(pagina=pagina)
+        PAGINAS_DURACAO.observar(duracao, pagina=pagina)
+
+    def registrar_consulta(self, registro: dict):
+        """Registra uma consulta medida pela instrumentação"""
+        if registro.get("duracao") is None:
+            return
+        pagina, nome = registro.get("pagina"), registro.get("nome")
+        with self._lock:
+            self._consultas[(pagina, nome)].append(registro["duracao"])
+            self._totais["consultas"] += 1
+            self._totais["linhas"] += registro.get("linhas") or 0
+            self._totais["erros"] += 1 if registro.get("erro") else 0
+            self._totais["bytes_economizados"] += registro.get("bytes_economizados") or 0
+            self._totais["duracao"] += registro["duracao"]
+            self._totais["espera_pool"] += registro.get("espera_pool") or 0
+            self._totais["espera_fila"] += registro.get("espera_fila") or 0
+        CONSULTAS_DURACAO.observar(registro["duracao"], pagina=pagina, nome=nome, classe=registro.get("classe"))
+        CONSULTAS_LINHAS.inc(registro.get("linhas") or 0, pagina=pagina, nome=nome)
+        if registro.get("bytes_economizados"):
+            CONSULTAS_ECONOMIA.inc(registro["bytes_economizados"], pagina=pagina, nome=nome)
+        if registro.get("erro"):
+            CONSULTAS_ERROS.inc(pagina=pagina, nome=nome)
+        if registro.get("classe") == "pesada":
+            CONSULTAS_FILA.observar(registro.get("espera_fila") or 0, pagina=pagina)
+
+    def registrar_fallback_replica(self, pagina: str, nome: str, erro: str):
+        """Conta uma consulta que falhou na réplica e seguiu pelo MySQL"""
+        with self._lock:
+            self._fallbacks_replica[(pagina, nome, erro)] += 1
+        REPLICA_FALLBACKS.inc(pagina=pagina, nome=nome, erro=erro)
+
+    def fallbacks_replica(self) -> pd.DataFrame:
+        """Falhas da réplica por página, consulta e classe da exceção desde o início do processo"""
+        with self._lock:
+            linhas = [(*chave, n) for chave, n in self._fallbacks_replica.items()]
+        df = pd.DataFrame(linhas, columns=["pagina", "nome", "erro", "falhas"])
+        return df.sort_values("falhas", ascending=False)
+
+    def totais_consultas(self) -> dict:
+        """Consultas, linhas, erros, bytes economizados e tempos (s) acumulados desde o início do processo"""
+        with self._lock:
+            return dict(self._totais)
+
+    def registrar_engine(self, engine):
+        """Guarda referência fraca ao engine para exibir o uso do pool"""
+        if id(engine) in self._engines:
+            return
+        self._engines[id(engine)] = engine
+        rotulo = rotulo_engine(engine)
+        event.listen(engine, "checkout", lambda *args: POOL_CHECKOUTS.inc(engine=rotulo))
+
+    @staticmethod
+    def _resumo(series: dict, chaves: list) -> pd.DataFrame:
+        linhas = []
+        for chave, valores in series.items():
+            s = pd.Series(list(valores), dtype="float64")
+            chave = chave if isinstance(chave, tuple) else (chave,)
+            linhas.append((*chave, len(s), s.median(), s.quantile(0.95), s.max()))
+        return pd.DataFrame(linhas, columns=chaves + ["execucoes", "p50", "p95", "maximo"])
+
+    def resumo_paginas(self) -> pd.DataFrame:
+        """p50/p95 do tempo de execução por página"""
+        with self._lock:
+            dados = {k: list(v) for k, v in self._paginas.items()}
+        return self._resumo(dados, ["pagina"]).sort_values("p95", ascending=False)
+
+    def resumo_consultas(self) -> pd.DataFrame:
+        """p50/p95 do tempo das consultas por página/nome"""
+        with self._lock:
+            dados = {k: list(v) for k, v in self._consultas.items()}
+        return self._resumo(dados, ["pagina", "nome"]).sort_values("p95", ascending=False)
+
+    def uso_pools(self) -> pd.DataFrame:
+        """Situação dos pools de conexão dos engines em uso"""
+        linhas = []
+        for engine in list(self._engines.values()):
+            pool = engine.pool
+            linhas.append({
+                "engine": engine.url.render_as_string(hide_password=True),
+                "pool": type(pool).__name__,
+                "tamanho": pool.size() if hasattr(pool, "size") else None,
+                "em_uso": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "status": pool.status(),
+            })
+        return pd.DataFrame(linhas)
+
+metricas = Metricas()
+
+def rotulo_engine(engine) -> str:
+    """Identificação curta (sem credenciais) do engine para rótulos"""
+    url = engine.url
+    return f"{url.host or ''}:{url.port or ''}/{url.database or ''}"
+
+def memoria_processo() -> int:
+    """Memória residente (RSS) do processo em bytes"""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+@contextmanager
+def medir_pagina(pagina: str):
+    """Mede (e, se ativo, perfila) a execução do script de uma página"""
+    arquivo_pagina = sys._getframe(2).f_code.co_filename
+    inicio = time.perf_counter()
+    try:
+        with perfilar_pagina(pagina, arquivo_pagina):
+            yield
+    finally:
+        metricas.registrar_pagina(pagina, time.perf_counter() - inicio)
+
+def requisicao_medida(api: str, endpoint: str, metodo: str, url: str, **kwargs):
+    """Executa requests.<metodo> registrando contagem e latência da chamada externa"""
+    import requests
+    inicio = time.perf_counter()
+    status = "erro"
+    try:
+        resposta = requests.request(metodo.upper(), url, **kwargs)
+        status = str(resposta.status_code)
+        return resposta
+    finally:
+        API_CHAMADAS.inc(api=api, endpoint=endpoint, status=status)
+        API_DURACAO.observar(time.perf_counter() - inicio, api=api, endpoint=endpoint)
+
+def registrar_espera_pool(engine, espera: float):
+    """Registra o tempo de espera para obter uma conexão do pool"""
+    POOL_ESPERA.observar(espera, engine=rotulo_engine(engine))
+
+def _coletar_pools() -> dict:
+    valores = {}
+    for engine in list(metricas._engines.values()):
+        if hasattr(engine.pool, "checkedout"):
+            valores[(rotulo_engine(engine),)] = engine.pool.checkedout()
+    return valores
+
+def _coletar_caches(campo: str):
+    def coletar() -> dict:
+        from core.cache import _caches
+        return {(nome,): getattr(info, campo) for nome, info in list(_caches.items())}
+    return coletar
+
+def _coletar_namespaces() -> dict:
+    from core.cache import governador
+    return {(nome,): b for nome, b in list(governador._bytes_namespace.items())}
+
+def _coletar_orcamento() -> dict:
+    from core.cache import governador
+    resumo = governador.resumo()
+    return {("caches",): resumo["caches"], ("sessoes",): resumo["sessoes"], ("orcamento",): resumo["orcamento"]}
+
+Coletada("dashboard_pool_checked_out", "Conexoes em uso no pool", "gauge", ["engine"], _coletar_pools)
+Coletada("dashboard_cache_hits_total", "Acertos de cache", "counter", ["cache"], _coletar_caches("acertos"))
+Coletada("dashboard_cache_misses_total", "Faltas de cache", "counter", ["cache"], _coletar_caches("execucoes"))
+Coletada("dashboard_cache_evictions_total", "Invalidacoes de cache", "counter", ["cache"], _coletar_caches("remocoes"))
+Coletada("dashboard_cache_lru_evictions_total", "Entradas despejadas pelo orcamento de memoria", "counter", ["cache"],
+         _coletar_caches("despejos"))
+Coletada("dashboard_cache_namespace_bytes", "Memoria dos caches por namespace", "gauge", ["namespace"],
+         _coletar_namespaces)
+Coletada("dashboard_cache_memory_bytes", "Orcamento de memoria e uso por caches e sessoes", "gauge", ["tipo"],
+         _coletar_orcamento)
+Coletada("dashboard_process_resident_memory_bytes", "Memoria residente do processo", "gauge", [],
+         lambda: {(): memoria_processo()})
@@ -0,0 +1,277 @@
+"""
+Modo de venda de cada romaneio (CASADA, FUTURA ou PRONTA_ENTREGA) e cubo de curvas ABC, em Parquet mensais.
+
+    python -m core.modo_venda atualizar
+    python -m core.modo_venda situacao
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+import argparse
+import glob
+import os
+
+import pandas as pd
+from sqlalchemy import text
+
+from core.captura import marcas_dagua
+from core.db import DatabaseManager
+from core.multiloja import condicao_lojas
+from core.replica import duckdb, gravar_parquet, normalizar
+
+_DIR_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DIR_MODO_VENDA = os.getenv("MODO_VENDA_DIR", os.path.join(_DIR_PROJETO, "dados", "modo_venda"))
+REVISAO = timedelta(days=float(os.getenv("MODO_VENDA_REVISAO_DIAS", "3")))
+# Atraso máximo da última atualização para as páginas lerem as tabelas
+ATRASO_MAXIMO = timedelta(minutes=float(os.getenv("MODO_VENDA_ATRASO_MAXIMO_MIN", "90")))
+# Nome no registro de marcas d'água da captura de alterações
+CONSUMIDOR = "modo_venda"
+
+MODOS = ['PRONTA_ENTREGA', 'CASADA', 'FUTURA']
+
+# Itens próprios só das operações de venda (1, 2, 3 e 45 = futura); itens de pedido de compra
+# vinculado (venda casada) de qualquer operação. Um item de pedido torna o romaneio CASADA.
+_ITENS_PROPRIOS = """
+    SELECT RI.ROMANEIO, RI.LOJA, P.CURVA_PRODUTO, E.CURVA AS LOJA_CURVA,
+           RI.QUANTIDADE * RI.VALOR_UNIDADE AS VALOR
+    FROM romaneios_dbf R
+    JOIN romaneios_itens_dbf RI ON RI.ROMANEIO = R.ROMANEIO AND RI.LOJA = R.LOJA
+    JOIN produtos_dbf P ON RI.PRODUTO_CODIGO = P.CODIGO
+    JOIN produto_estoque E ON P.CODIGO = E.PRODUTO_CODIGO AND E.LOJA = R.LOJA
+    WHERE R.OPERACAO_CODIGO IN (1, 2, 3, 45)
+      AND R.SITUACAO = 'FECHADO'
+      AND R.CADASTRO >= :inicio AND R.CADASTRO < :fim
+      AND {lojas}"""
+
+_ITENS_CASADA = """
+    SELECT CP.ROMANEIO_CODIGO AS ROMANEIO, CP.ROMANEIO_LOJA AS LOJA, P.CURVA_PRODUTO, E.CURVA AS LOJA_CURVA,
+           VI.QUANTIDADE * VI.VALOR_REVENDA AS VALOR
+    FROM romaneios_dbf R
+    JOIN compras_pedidos CP ON CP.ROMANEIO_CODIGO = R.ROMANEIO AND CP.ROMANEIO_LOJA = R.LOJA
+    JOIN compras_pedidos_itens VI ON CP.COMPRA_PEDIDO = VI.COMPRA_PEDIDO AND CP.LOJA = VI.LOJA
+    JOIN produtos_dbf P ON VI.PRODUTO_CODIGO = P.CODIGO
+    JOIN produto_estoque E ON P.CODIGO = E.PRODUTO_CODIGO AND E.LOJA = R.LOJA
+    WHERE R.SITUACAO = 'FECHADO'
+      AND R.CADASTRO >= :inicio AND R.CADASTRO < :fim
+      AND {lojas}"""
+
+_MODO = """CASE WHEN C.ROMANEIO IS NOT NULL THEN 'CASADA'
+            WHEN R.OPERACAO_CODIGO = 45 THEN 'FUTURA'
+            ELSE 'PRONTA_ENTREGA' END"""
+
+SQL_MODO_VENDA = f"""
+SELECT R.ROMANEIO, R.LOJA, R.CADASTRO,
+       {_MODO} AS MODO,
+       COALESCE(I.ITENS, 0) + COALESCE(C.ITENS, 0) AS ITENS,
+       COALESCE(I.VALOR, 0) + COALESCE(C.VALOR, 0) AS VALOR
+FROM romaneios_dbf R
+LEFT JOIN (
+    SELECT ROMANEIO, LOJA, COUNT(*) AS ITENS, SUM(VALOR) AS VALOR
+    FROM ({_ITENS_PROPRIOS}) X
+    GROUP BY ROMANEIO, LOJA
+) I ON I.ROMANEIO = R.ROMANEIO AND I.LOJA = R.LOJA
+LEFT JOIN (
+    SELECT ROMANEIO, LOJA, COUNT(*) AS ITENS, SUM(VALOR) AS VALOR
+    FROM ({_ITENS_CASADA}) X
+    GROUP BY ROMANEIO, LOJA
+) C ON C.ROMANEIO = R.ROMANEIO AND C.LOJA = R.LOJA
+WHERE R.SITUACAO = 'FECHADO'
+  AND R.CADASTRO >= :inicio AND R.CADASTRO < :fim
+  AND {{lojas}}
+  AND (I.ITENS IS NOT NULL OR C.ITENS IS NOT NULL)
+"""
+
+# Curva vazia ou nula vira SEM_CURVA já no banco, para agrupar ' A' com 'A'
+SQL_CURVAS = f"""
+SELECT R.LOJA, DATE(R.CADASTRO) AS DIA,
+       {_MODO} AS MODO,
+       COALESCE(NULLIF(TRIM(X.CURVA_PRODUTO), ''), 'SEM_CURVA') AS CURVA_PRODUTO,
+       COALESCE(NULLIF(TRIM(X.LOJA_CURVA), ''), 'SEM_CURVA') AS LOJA_CURVA,
+       COUNT(*) AS ITENS,
+       SUM(X.VALOR) AS VALOR
+FROM ({_ITENS_PROPRIOS}
+    UNION ALL{_ITENS_CASADA}
+) X
+JOIN romaneios_dbf R ON R.ROMANEIO = X.ROMANEIO AND R.LOJA = X.LOJA
+LEFT JOIN (
+    SELECT DISTINCT ROMANEIO, LOJA
+    FROM ({_ITENS_CASADA}) Y
+) C ON C.ROMANEIO = R.ROMANEIO AND C.LOJA = R.LOJA
+GROUP BY R.LOJA, DATE(R.CADASTRO), {_MODO},
+         COALESCE(NULLIF(TRIM(X.CURVA_PRODUTO), ''), 'SEM_CURVA'),
+         COALESCE(NULLIF(TRIM(X.LOJA_CURVA), ''), 'SEM_CURVA')
+"""
+
+@dataclass(frozen=True)
+class Tabela:
+    """Tabela pré-calculada: consulta de origem, colunas, coluna de data e chave da substituição"""
+    nome: str
+    sql: str
+    colunas: tuple
+    data: str
+    # Linhas já gravadas com a mesma chave de uma linha recalculada são substituídas
+    chave: tuple
+
+ROMANEIOS = Tabela("romaneios", SQL_MODO_VENDA, ('ROMANEIO', 'LOJA', 'CADASTRO', 'MODO', 'ITENS', 'VALOR'),
+                   "CADASTRO", ('ROMANEIO', 'LOJA'))
+# O cubo é substituído por dia inteiro: uma célula que deixou de existir (romaneio que mudou de
+# modo) não fica para trás
+CURVAS = Tabela("curvas", SQL_CURVAS, ('LOJA', 'DIA', 'MODO', 'CURVA_PRODUTO', 'LOJA_CURVA', 'ITENS', 'VALOR'),
+                "DIA", ('DIA',))
+TABELAS = {t.nome: t for t in (ROMANEIOS, CURVAS)}
+
+_INTEIROS = ('ROMANEIO', 'LOJA', 'ITENS')
+
+def _tipos(df: pd.DataFrame, tabela: Tabela) -> pd.DataFrame:
+    df = normalizar(df.reindex(columns=list(tabela.colunas)))
+    for coluna in tabela.colunas:
+        if coluna in _INTEIROS:
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0).astype('int64')
+        elif coluna == tabela.data:
+            df[coluna] = pd.to_datetime(df[coluna])
+        elif coluna == 'VALOR':
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').fillna(0.0).astype('float64')
+        else:
+            df[coluna] = df[coluna].astype(str)
+    return df
+
+def classificar(engine, inicio, fim, lojas=None, replica: bool = False, tabela: Tabela = ROMANEIOS) -> pd.DataFrame:
+    """Linhas da tabela para os romaneios com inicio <= CADASTRO < fim, calculadas no banco"""
+    sql = tabela.sql.format(lojas=condicao_lojas('R.LOJA', lojas or []))
+    params = {'inicio': pd.Timestamp(inicio).to_pydatetime(), 'fim': pd.Timestamp(fim).to_pydatetime()}
+    df = DatabaseManager.read_sql(text(sql), engine, params=params, nome=f"modo_venda_{tabela.nome}",
+                                  replica=replica)
+    return _tipos(df, tabela)
+
+# =======================
+# TABELAS PRÉ-CALCULADAS (Parquet)
+# =======================
+def _pasta(tabela: Tabela, diretorio: str = DIR_MODO_VENDA) -> str:
+    return os.path.join(diretorio, tabela.nome)
+
+def _arquivos(tabela: Tabela, diretorio: str = DIR_MODO_VENDA) -> list:
+    return sorted(glob.glob(os.path.join(_pasta(tabela, diretorio), "*.parquet")))
+
+def _atualizado_em(tabela: Tabela) -> Optional[datetime]:
+    marcas = marcas_dagua.ler()
+    linha = marcas[(marcas['consumidor'] == CONSUMIDOR) & (marcas['tabela'] == tabela.nome)]
+    return datetime.fromisoformat(linha['atualizado_em'].iloc[0]) if len(linha) else None
+
+def disponivel(tabela: Tabela, inicio, diretorio: str = DIR_MODO_VENDA) -> bool:
+    """A tabela foi atualizada dentro do atraso máximo e começa antes de `inicio`"""
+    arquivos = _arquivos(tabela, diretorio)
+    if duckdb is None or not arquivos:
+        return False
+    atualizado = _atualizado_em(tabela)
+    if atualizado is None or datetime.now() - atualizado > ATRASO_MAXIMO:
+        return False
+    primeiro_mes = pd.Timestamp(os.path.basename(arquivos[0])[:7] + "-01")
+    return pd.Timestamp(inicio) >= primeiro_mes
+
+def _ler_tabela(tabela: Tabela, inicio, fim, lojas=None, diretorio: str = DIR_MODO_VENDA) -> pd.DataFrame:
+    sql = (f"SELECT {', '.join(tabela.colunas)} "
+           f"FROM read_parquet('{_pasta(tabela, diretorio)}/*.parquet', union_by_name = true) "
+           f"WHERE {tabela.data} >= $inicio AND {tabela.data} < $fim AND {condicao_lojas('LOJA', lojas or [])}")
+    con = duckdb.connect()
+    try:
+        df = con.execute(sql, {'inicio': pd.Timestamp(inicio).to_pydatetime(),
+                               'fim': pd.Timestamp(fim).to_pydatetime()}).df()
+    finally:
+        con.close()
+    return _tipos(df, tabela)
+
+def _ler(tabela: Tabela, engine, inicio, fim, lojas=None) -> pd.DataFrame:
+    inicio = pd.Timestamp(inicio).normalize()
+    fim = pd.Timestamp(fim).normalize() + pd.Timedelta(days=1)
+    if disponivel(tabela, inicio):
+        try:
+            return _ler_tabela(tabela, inicio, fim, lojas)
+        except Exception:
+            # Arquivo em atualização ou corrompido: segue pelo banco
+            pass
+    return classificar(engine, inicio, fim, lojas, replica=True, tabela=tabela)
+
+def romaneios(engine, inicio, fim, lojas=None) -> pd.DataFrame:
+    """Romaneios dos dias inicio..fim (inclusive) com o modo de venda final, um por linha"""
+    return _ler(ROMANEIOS, engine, inicio, fim, lojas)
+
+def curvas(engine, inicio, fim, lojas=None) -> pd.DataFrame:
+    """Cubo (LOJA, DIA, MODO, CURVA_PRODUTO, LOJA_CURVA) -> ITENS, VALOR dos dias inicio..fim"""
+    return _ler(CURVAS, engine, inicio, fim, lojas)
+
+def atualizar_tabela(engine, tabela: Tabela, inicio: Optional[datetime] = None,
+                     diretorio: str = DIR_MODO_VENDA) -> int:
+    """Recalcula a tabela desde a marca d'água (menos a revisão); retorna quantas linhas gravou"""
+    if not _arquivos(tabela, diretorio):
+        # Tabela apagada ou nova: a marca antiga não vale mais
+        marcas_dagua.reiniciar(CONSUMIDOR, tabela.nome)
+    marca = marcas_dagua.marca(CONSUMIDOR, tabela.nome)
+    # Dias inteiros: o cubo substitui o dia todo
+    janela = pd.Timestamp(marca - REVISAO if marca else (inicio or datetime(date.today().year - 3, 1, 1)))
+    janela = janela.normalize().to_pydatetime()
+    marca = marca or janela
+    total, agora = 0, datetime.now()
+    while janela <= agora:
+        fim = (pd.Timestamp(janela).to_period('M') + 1).start_time.to_pydatetime()
+        df = classificar(engine, janela, fim, tabela=tabela)
+        if not df.empty:
+            gravar_parquet(df, os.path.join(_pasta(tabela, diretorio), f"{janela:%Y-%m}.parquet"), tabela.chave)
+            marca = max(marca, df[tabela.data].max().to_pydatetime())
+            total += len(df)
+        marcas_dagua.gravar_marca(CONSUMIDOR, tabela.nome, marca)
+        janela = fim
+    return total
+
+def atualizar(engine, tabelas: Optional[list] = None, inicio: Optional[datetime] = None,
+              diretorio: str = DIR_MODO_VENDA) -> dict:
+    """Atualiza as tabelas (todas por padrão); retorna {tabela: linhas gravadas}"""
+    if duckdb is None:
+        raise RuntimeError("Pacote duckdb não instalado")
+    return {nome: atualizar_tabela(engine, TABELAS[nome], inicio, diretorio) for nome in (tabelas or TABELAS)}
+
+def situacao(diretorio: str = DIR_MODO_VENDA) -> pd.DataFrame:
+    """Marca d'água, última atualização, meses e tamanho em disco de cada tabela"""
+    linhas = []
+    for tabela in TABELAS.values():
+        arquivos = _arquivos(tabela, diretorio)
+        linhas.append({
+            "tabela": tabela.nome,
+            "marca": marcas_dagua.marca(CONSUMIDOR, tabela.nome),
+            "atualizado_em": _atualizado_em(tabela),
+            "meses": len(arquivos),
+            "mb": round(sum(os.path.getsize(a) for a in arquivos) / 1024 ** 2, 1),
+        })
+    return pd.DataFrame(linhas)
+
+# =======================
+# CLI
+# =======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modo de venda por romaneio e cubo de curvas (pré-calculados)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_atual = sub.add_parser("atualizar", help="Recalcula as tabelas desde a última marca")
+    p_atual.add_argument("--url", help="MySQL de origem (padrão: [connections.mysql] do secrets.toml)")
+    p_atual.add_argument("--tabelas", nargs="*", choices=list(TABELAS), help="Padrão: todas")
+    p_atual.add_argument("--inicio", type=date.fromisoformat,
+                         help="Data inicial da primeira carga (padrão: 1º de janeiro de três anos atrás)")
+
+    sub.add_parser("situacao", help="Marcas d'água e tamanho das tabelas")
+
+    args = parser.parse_args(argv)
+    if args.comando == "situacao":
+        print(situacao().to_string(index=False))
+        return
+
+    if args.url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.url, pool_pre_ping=True)
+    else:
+        engine = DatabaseManager.get_engine()
+    inicio = datetime.combine(args.inicio, datetime.min.time()) if args.inicio else None
+    for nome, linhas in atualizar(engine, args.tabelas, inicio).items():
+        print(f"{nome:<10} {linhas:>10} linhas")
+
+if __name__ == "__main__":
+    main()
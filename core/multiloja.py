@@ -0,0 +1,30 @@
+"""Seleção de várias lojas nas páginas por loja: multiselect, condição LOJA IN (...) e rótulos."""
+import streamlit as st
+
+def condicao_lojas(coluna: str, lojas) -> str:
+    """Condição SQL 'coluna IN (1, 2, ...)' para as lojas (sem lojas: sempre verdadeira)"""
+    codigos = sorted({int(loja) for loja in lojas})
+    if not codigos:
+        return "1 = 1"
+    return f"{coluna} IN ({', '.join(map(str, codigos))})"
+
+def selecionar_lojas(loja_dict: dict, key: str, rotulo: str = "Selecione as lojas") -> list:
+    """Multiselect de lojas na sidebar; devolve os códigos escolhidos (nenhum = todas)"""
+    codigos = list(loja_dict)
+    escolhidas = st.sidebar.multiselect(
+        rotulo,
+        options=codigos,
+        default=codigos[:1],
+        format_func=lambda x: loja_dict.get(x, x),
+        key=key,
+        help="Deixe vazio para comparar todas as lojas",
+    )
+    return escolhidas or codigos
+
+def descrever_lojas(lojas: list, loja_dict: dict) -> str:
+    """Texto curto para títulos: nome da loja, 'Todas as lojas' ou 'N lojas'"""
+    if len(lojas) == 1:
+        return str(loja_dict.get(lojas[0], lojas[0]))
+    if len(lojas) == len(loja_dict):
+        return "Todas as lojas"
+    return f"{len(lojas)} lojas"
@@ -0,0 +1,181 @@
+"""
+Profiler por amostragem das execuções de página.
+
+Ativado para todas as páginas com DASHBOARD_PROFILE=1 ou, por sessão, pelo
+botão da página de Desempenho. Cada execução gera em logs/perfis/ um arquivo
+speedscope (.speedscope.json, abrir em https://www.speedscope.app) e um
+arquivo de pilhas colapsadas (.folded, para flamegraph.pl), além do tempo
+por fase: consulta, transformação, figura, renderização e código da página.
+"""
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import json
+import threading
+import time
+import sys
+import os
+
+import streamlit as st
+
+_DIR_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DIR_PERFIS = os.getenv("DASHBOARD_PROFILE_DIR", os.path.join(_DIR_PROJETO, "logs", "perfis"))
+INTERVALO_SEGUNDOS = float(os.getenv("DASHBOARD_PROFILE_INTERVALO", "0.005"))
+
+# Fases definidas por qualquer frame da pilha (em ordem de prioridade)
+FASES_PILHA = [
+    ("consulta", ("sqlalchemy", "pymysql", "MySQLdb", os.path.join("pandas", "io", "sql"))),
+    ("figura", ("plotly", "matplotlib", "seaborn")),
+]
+# Fases definidas pela biblioteca do frame mais interno
+FASES_TOPO = [
+    ("renderizacao", ("streamlit",)),
+    ("transformacao", ("pandas", "numpy")),
+]
+
+# Últimos perfis gerados no processo (exibidos na página de Desempenho)
+perfis_recentes = deque(maxlen=50)
+
+def perfilamento_ativo() -> bool:
+    """Profiler ligado por variável de ambiente ou pela sessão atual"""
+    if os.getenv("DASHBOARD_PROFILE", "0") == "1":
+        return True
+    try:
+        return bool(st.session_state.get("perfilar_paginas", False))
+    except Exception:
+        return False
+
+def _pertence(arquivo: str, marcadores) -> bool:
+    return any(os.sep + m + os.sep in arquivo or arquivo.endswith(os.sep + m + ".py") for m in marcadores)
+
+def classificar_pilha(pilha: list) -> str:
+    """Fase de uma amostra a partir dos arquivos da pilha"""
+    for fase, marcadores in FASES_PILHA:
+        if any(_pertence(arquivo, marcadores) for _, arquivo, _ in pilha):
+            return fase
+    for _, arquivo, _ in reversed(pilha):
+        for fase, marcadores in FASES_TOPO:
+            if _pertence(arquivo, marcadores):
+                return fase
+    return "pagina"
+
+class ProfilerAmostragem:
+    """Amostra periodicamente a pilha da thread da página"""
+
+    def __init__(self, pagina: str, intervalo: float = INTERVALO_SEGUNDOS):
+        self.pagina = pagina
+        self.intervalo = intervalo
+        self._thread_alvo = threading.get_ident()
+        self._parar = threading.Event()
+        self._amostras = []
+        self._arquivo_raiz = None
+        self.inicio = self.fim = None
+
+    def _pilha_atual(self):
+        frame = sys._current_frames().get(self._thread_alvo)
+        pilha = []
+        while frame is not None:
+            codigo = frame.f_code
+            pilha.append((codigo.co_name, os.path.abspath(codigo.co_filename), frame.f_lineno))
+            frame = frame.f_back
+        pilha.reverse()
+        # Descarta os frames do runtime do Streamlit abaixo do script da página
+        for i, (_, arquivo, _) in enumerate(pilha):
+            if arquivo == self._arquivo_raiz:
+                return pilha[i:]
+        return pilha
+
+    def _amostrar(self):
+        anterior = time.perf_counter()
+        while not self._parar.wait(self.intervalo):
+            agora = time.perf_counter()
+            pilha = self._pilha_atual()
+            if pilha:
+                self._amostras.append((pilha, agora - anterior))
+            anterior = agora
+
+    def iniciar(self, arquivo_raiz: str):
+        self._arquivo_raiz = os.path.abspath(arquivo_raiz)
+        self.inicio = time.perf_counter()
+        self._thread = threading.Thread(target=self._amostrar, name=f"profiler-{self.pagina}", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+        self.fim = time.perf_counter()
+
+    def tempo_por_fase(self) -> dict:
+        fases = {}
+        for pilha, peso in self._amostras:
+            fase = classificar_pilha(pilha)
+            fases[fase] = fases.get(fase, 0.0) + peso
+        return dict(sorted(fases.items(), key=lambda item: item[1], reverse=True))
+
+    def salvar(self, diretorio: str = DIR_PERFIS) -> Path:
+        """Grava os arquivos speedscope e .folded da execução"""
+        Path(diretorio).mkdir(parents=True, exist_ok=True)
+        base = Path(diretorio) / f"{self.pagina}_{datetime.now():%Y%m%d_%H%M%S_%f}"
+
+        indices, frames, amostras, pesos, colapsadas = {}, [], [], [], {}
+        for pilha, peso in self._amostras:
+            ids = []
+            for nome, arquivo, linha in pilha:
+                chave = (nome, arquivo)
+                if chave not in indices:
+                    indices[chave] = len(frames)
+                    frames.append({"name": nome, "file": arquivo, "line": linha})
+                ids.append(indices[chave])
+            amostras.append(ids)
+            pesos.append(round(peso, 6))
+            linha_colapsada = ";".join(f"{nome} ({os.path.basename(arquivo)})" for nome, arquivo, _ in pilha)
+            colapsadas[linha_colapsada] = colapsadas.get(linha_colapsada, 0) + int(peso * 1_000_000)
+
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.pagina,
+            "exporter": "dashboards-profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.pagina,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(pesos), 6),
+                "samples": amostras,
+                "weights": pesos,
+            }],
+        }
+        caminho = base.with_suffix(".speedscope.json")
+        caminho.write_text(json.dumps(speedscope), encoding="utf-8")
+        base.with_suffix(".folded").write_text(
+            "\n".join(f"{pilha} {micros}" for pilha, micros in colapsadas.items()), encoding="utf-8"
+        )
+        return caminho
+
+@contextmanager
+def perfilar_pagina(pagina: str, arquivo_raiz: str):
+    """Perfila a execução da página quando o profiler está ativo"""
+    if not perfilamento_ativo():
+        yield
+        return
+
+    profiler = ProfilerAmostragem(pagina)
+    profiler.iniciar(arquivo_raiz)
+    try:
+        yield
+    finally:
+        profiler.parar()
+        try:
+            caminho = profiler.salvar()
+        except OSError:
+            caminho = None
+        perfis_recentes.appendleft({
+            "quando": datetime.now().isoformat(timespec="seconds"),
+            "pagina": pagina,
+            "duracao": round(profiler.fim - profiler.inicio, 3),
+            "arquivo": str(caminho) if caminho else None,
+            **{f"fase_{fase}": round(segundos, 3) for fase, segundos in profiler.tempo_por_fase().items()},
+        })
@@ -0,0 +1,168 @@
+"""
+Métricas do processo Streamlit no formato texto do Prometheus.
+
+O servidor HTTP é iniciado pelo app.py, uma única vez por processo (thread em
+background), na porta METRICS_PORT (padrão 9100; 0 desativa) e responde em /metrics.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import threading
+import os
+
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _formatar_rotulos(nomes, valores, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nome: str, ajuda: str, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores = {}
+        registro.registrar(self)
+
+    def _chave(self, rotulos: dict) -> tuple:
+        return tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+
+    def cabecalho(self) -> list:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+class Contador(_Metrica):
+    """Contador monotônico com rótulos"""
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self) -> list:
+        with self._lock:
+            itens = list(self._valores.items())
+        return self.cabecalho() + [
+            f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(v)}" for chave, v in itens
+        ]
+
+class Histograma(_Metrica):
+    """Histograma com buckets cumulativos, _sum e _count"""
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos=(), buckets=BUCKETS_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observar(self, valor: float, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            contagens, soma = self._valores.get(chave, ([0] * len(self.buckets), 0.0))
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    contagens[i] += 1
+            self._valores[chave] = (contagens, soma + valor)
+
+    def exportar(self) -> list:
+        with self._lock:
+            itens = [(chave, list(c), s) for chave, (c, s) in self._valores.items()]
+        linhas = self.cabecalho()
+        for chave, contagens, soma in itens:
+            for limite, contagem in zip(self.buckets, contagens):
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, le)} {contagem}")
+            linhas.append(f"{self.nome}_sum{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{_formatar_rotulos(self.rotulos, chave)} {contagens[-1]}")
+        return linhas
+
+class Coletada(_Metrica):
+    """Métrica calculada no momento da coleta: coletar() -> {(rotulos...): valor}"""
+
+    def __init__(self, nome: str, ajuda: str, tipo: str, rotulos, coletar):
+        super().__init__(nome, ajuda, rotulos)
+        self.tipo = tipo
+        self.coletar = coletar
+
+    def exportar(self) -> list:
+        try:
+            valores = self.coletar()
+        except Exception:
+            return []
+        return self.cabecalho() + [
+            f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(v)}"
+            for chave, v in valores.items()
+        ]
+
+class RegistroPrometheus:
+    """Conjunto de métricas exportadas pelo processo"""
+
+    def __init__(self):
+        self._metricas = {}
+
+    def registrar(self, metrica):
+        self._metricas[metrica.nome] = metrica
+
+    def exportar(self) -> str:
+        linhas = []
+        for metrica in list(self._metricas.values()):
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+registro = RegistroPrometheus()
+
+# =======================
+# SERVIDOR HTTP
+# =======================
+class _HandlerMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        corpo = registro.exportar().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+log = logging.getLogger(__name__)
+
+_servidor = None
+_servidor_lock = threading.Lock()
+_portas_avisadas = set()
+
+def iniciar_servidor_metricas(porta: int = None):
+    """Inicia (uma vez por processo) o listener HTTP das métricas"""
+    global _servidor
+    porta = int(os.getenv("METRICS_PORT", "9100")) if porta is None else porta
+    if porta <= 0:
+        return None
+    with _servidor_lock:
+        if _servidor is None:
+            try:
+                _servidor = ThreadingHTTPServer(("0.0.0.0", porta), _HandlerMetricas)
+            except OSError as e:
+                # Porta em uso (outro processo ou reload de módulo): segue sem exportar e tenta de novo
+                # na próxima execução do app.py; o aviso sai uma vez por porta
+                if porta not in _portas_avisadas:
+                    _portas_avisadas.add(porta)
+                    log.warning("Métricas Prometheus desativadas: porta %s indisponível (%s)", porta, e)
+                return None
+            _servidor.daemon_threads = True
+            threading.Thread(target=_servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return _servidor
@@ -0,0 +1,189 @@
+"""
+Dados de referência (dimensões pequenas) carregados uma vez por processo.
+
+Lojas, centros de custo, entregadores e placas eram
+consultados de novo a cada execução das páginas, e vários filtros de loja
+faziam SELECT DISTINCT LOJA sobre tabelas de movimento (romaneios, expedição,
+abastecimentos, despesas). Aqui cada dimensão é lida uma vez por banco e
+servida como DataFrame indexado pela chave (e dicionários derivados).
+
+A cada REFDATA_VERIFICAR_MIN minutos uma consulta barata de versão (contagem e
+maior código) é comparada com a da carga; se mudou, a dimensão é relida. Sem
+consulta de versão, a dimensão é relida após REFDATA_IDADE_MAXIMA_H horas.
+
+    python -m core.refdata --url mysql+pymysql://... lojas
+"""
+from dataclasses import dataclass
+from typing import Optional
+import argparse
+import os
+import threading
+import time
+
+import pandas as pd
+
+from core.db import DatabaseManager
+
+VERIFICAR_S = float(os.getenv("REFDATA_VERIFICAR_MIN", "10")) * 60
+IDADE_MAXIMA_S = float(os.getenv("REFDATA_IDADE_MAXIMA_H", "24")) * 3600
+
+@dataclass(frozen=True)
+class Dimensao:
+    nome: str
+    sql: str
+    indice: str
+    # Consulta de uma linha que muda quando a tabela muda (None: relê só pela idade)
+    versao: Optional[str] = None
+
+DIMENSOES = {d.nome: d for d in [
+    Dimensao("lojas", "SELECT codigo, nome FROM autogeral.lojas ORDER BY codigo", "codigo",
+             "SELECT COUNT(*) AS n, MAX(codigo) AS maior FROM autogeral.lojas"),
+    Dimensao("centros_custo", "SELECT CODIGO, DESCRICAO FROM centros_custo ORDER BY DESCRICAO", "CODIGO",
+             "SELECT COUNT(*) AS n, MAX(CODIGO) AS maior FROM centros_custo"),
+    Dimensao("entregadores",
+             "SELECT CODIGO, DESCRICAO, LOJA_PRINCIPAL, ENTREGADOR_TIPO, ATIVO, COBL_CODE, COBL_ID "
+             "FROM entregador ORDER BY CODIGO", "CODIGO",
+             "SELECT COUNT(*) AS n, MAX(CODIGO) AS maior, SUM(ATIVO) AS ativos FROM entregador"),
+    Dimensao("veiculos", "SELECT CADA_VEIC_ID, PLACA, TIPO, CADASTRO_CODIGO, LOJA FROM cadastros_veiculos "
+                         "ORDER BY CADASTRO_CODIGO", "CADA_VEIC_ID",
+             "SELECT COUNT(*) AS n, MAX(CADA_VEIC_ID) AS maior FROM cadastros_veiculos"),
+    Dimensao("veiculos_lojas", "SELECT CADA_VEIC_ID, LOJA, PLACA FROM cadastros_veiculos_ultilizacao", "CADA_VEIC_ID",
+             "SELECT COUNT(*) AS n, MAX(CADA_VEIC_ID) AS maior, SUM(LOJA) AS lojas "
+             "FROM cadastros_veiculos_ultilizacao"),
+]}
+
+@dataclass
+class Carga:
+    tabela: pd.DataFrame
+    versao: Optional[tuple]
+    carregada_em: float
+    verificada_em: float
+    derivados: dict
+
+# (banco, dimensão) -> Carga
+_cargas = {}
+_locks = {}
+_lock = threading.Lock()
+
+def _banco(engine) -> str:
+    url = getattr(getattr(engine, "engine", engine), "url", None)
+    return url.render_as_string(hide_password=True) if url is not None else str(engine)
+
+def _ler_versao(dimensao: Dimensao, engine) -> Optional[tuple]:
+    if dimensao.versao is None:
+        return None
+    df = DatabaseManager.read_sql(dimensao.versao, engine, nome=f"refdata_{dimensao.nome}_versao")
+    return tuple(df.iloc[0].tolist()) if not df.empty else ()
+
+def _carregar(dimensao: Dimensao, engine) -> Carga:
+    versao = _ler_versao(dimensao, engine)
+    df = DatabaseManager.read_sql(dimensao.sql, engine, nome=f"refdata_{dimensao.nome}")
+    agora = time.monotonic()
+    return Carga(df.set_index(dimensao.indice, drop=False).rename_axis(None), versao, agora, agora, {})
+
+def _atual(nome: str, engine) -> Carga:
+    """Carga vigente da dimensão, relendo se a versão mudou ou se passou da idade máxima"""
+    dimensao = DIMENSOES[nome]
+    chave = (_banco(engine), nome)
+    with _lock:
+        lock = _locks.setdefault(chave, threading.Lock())
+    with lock:
+        carga = _cargas.get(chave)
+        agora = time.monotonic()
+        if carga is None or agora - carga.carregada_em > IDADE_MAXIMA_S:
+            carga = _cargas[chave] = _carregar(dimensao, engine)
+        elif dimensao.versao is not None and agora - carga.verificada_em > VERIFICAR_S:
+            try:
+                versao = _ler_versao(dimensao, engine)
+            except Exception:
+                # Banco indisponível: continua servindo a carga anterior
+                return carga
+            if versao != carga.versao:
+                carga = _cargas[chave] = _carregar(dimensao, engine)
+            carga.verificada_em = agora
+        return carga
+
+def _derivado(nome: str, engine, rotulo: str, calcular):
+    """Valor calculado da dimensão (lista, dicionário), refeito só quando ela é relida"""
+    carga = _atual(nome, engine)
+    if rotulo not in carga.derivados:
+        carga.derivados[rotulo] = calcular(carga.tabela)
+    return carga.derivados[rotulo]
+
+def tabela(nome: str, engine) -> pd.DataFrame:
+    """Cópia da dimensão, indexada pela chave"""
+    return _atual(nome, engine).tabela.copy()
+
+def invalidar(nome: Optional[str] = None):
+    """Descarta as cargas (de uma dimensão ou de todas) para relê-las no próximo acesso"""
+    with _lock:
+        for chave in [c for c in _cargas if nome is None or c[1] == nome]:
+            del _cargas[chave]
+
+def situacao() -> pd.DataFrame:
+    agora = time.monotonic()
+    linhas = [{
+        "dimensao": nome,
+        "banco": banco,
+        "linhas": len(carga.tabela),
+        "idade_min": round((agora - carga.carregada_em) / 60, 1),
+        "verificada_ha_min": round((agora - carga.verificada_em) / 60, 1),
+    } for (banco, nome), carga in list(_cargas.items())]
+    return pd.DataFrame(linhas, columns=["dimensao", "banco", "linhas", "idade_min", "verificada_ha_min"])
+
+# =======================
+# ACESSO PELAS PÁGINAS
+# =======================
+def lojas(engine) -> pd.DataFrame:
+    """Lojas (codigo, nome) indexadas pelo código"""
+    return tabela("lojas", engine)
+
+def nomes_lojas(engine) -> dict:
+    """{codigo: nome} das lojas"""
+    return dict(_derivado("lojas", engine, "nomes", lambda df: dict(zip(df["codigo"], df["nome"]))))
+
+def codigos_lojas(engine) -> list:
+    """Códigos das lojas, em ordem, para os filtros"""
+    return list(_derivado("lojas", engine, "codigos", lambda df: df["codigo"].tolist()))
+
+def centros_custo(engine) -> list:
+    """Descrições dos centros de custo, em ordem alfabética"""
+    return list(_derivado("centros_custo", engine, "descricoes",
+                          lambda df: df["DESCRICAO"].dropna().drop_duplicates().tolist()))
+
+def lojas_com_veiculos(engine) -> list:
+    """Lojas com veículo em utilização"""
+    return list(_derivado("veiculos_lojas", engine, "lojas",
+                          lambda df: sorted(df["LOJA"].dropna().astype(int).unique().tolist())))
+
+def placas(engine, tipos: tuple = ("MOTO", "CARRO")) -> pd.DataFrame:
+    """Placas únicas dos veículos dos tipos informados (coluna PLACA)"""
+    df = _derivado("veiculos", engine, f"placas_{'_'.join(tipos)}",
+                   lambda df: df.loc[df["TIPO"].isin(tipos), ["PLACA"]].drop_duplicates().reset_index(drop=True))
+    return df.copy()
+
+def entregadores(engine, apenas_ativos: bool = True, com_cobli: bool = False) -> pd.DataFrame:
+    """Entregadores indexados pelo código; com_cobli mantém só os vinculados à Cobli"""
+    df = tabela("entregadores", engine)
+    if apenas_ativos:
+        df = df[df["ATIVO"] == 1]
+    if com_cobli:
+        df = df[df["COBL_ID"].notna() & (df["COBL_ID"] != "")]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dados de referência carregados pelas páginas")
+    parser.add_argument("--url", required=True, help="Banco de origem (mysql+pymysql://...)")
+    parser.add_argument("dimensoes", nargs="*", default=list(DIMENSOES), help="Padrão: todas")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    engine = create_engine(args.url)
+    for nome in args.dimensoes:
+        df = tabela(nome, engine)
+        print(f"{nome:<18} {len(df):>6} linhas  versão {_cargas[(_banco(engine), nome)].versao}")
+
+
+if __name__ == "__main__":
+    main()
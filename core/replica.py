@@ -0,0 +1,410 @@
+"""
+Réplica analítica local (Parquet + DuckDB) das tabelas usadas pelos painéis.
+
+A sincronização copia do MySQL apenas o que mudou desde a última execução: as
+tabelas de movimento são lidas em janelas mensais a partir da marca d'água
+(maior CADASTRO/data já copiado) e gravadas em um Parquet por mês; as tabelas
+de cadastro, pequenas, são copiadas inteiras. Os itens (romaneios_itens_dbf,
+compras_pedidos, comp_rate_ativ...) seguem a data do documento pai.
+
+As consultas analíticas marcadas com `replica=True` em DatabaseManager.read_sql
+são traduzidas do dialeto MySQL e executadas no DuckDB quando a réplica está
+ativa e atualizada; em qualquer outro caso (tabela não replicada, réplica
+atrasada, função sem tradução) a consulta vai para o MySQL normalmente.
+
+    python -m core.replica sincronizar
+    python -m core.replica sincronizar --tabelas romaneios_dbf romaneios_itens_dbf
+    python -m core.replica situacao
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from core.captura import FonteCaptura, capturar, marcas_dagua
+
+try:
+    import duckdb
+except ImportError:  # réplica desativada sem o pacote
+    duckdb = None
+
+log = logging.getLogger(__name__)
+
+_DIR_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPLICA_ATIVA = os.getenv("REPLICA_ATIVA", "0") == "1"
+DIR_REPLICA = os.getenv("REPLICA_DIR", os.path.join(_DIR_PROJETO, "dados", "replica"))
+# Atraso máximo (minutos) da última sincronização para a réplica atender consultas
+ATRASO_MAXIMO_MIN = float(os.getenv("REPLICA_ATRASO_MAXIMO_MIN", "90"))
+# Nome da réplica no registro de marcas d'água da captura de alterações
+CONSUMIDOR = "replica"
+
+_R = "JOIN romaneios_dbf r ON r.ROMANEIO = {} AND r.LOJA = {}"
+
+# Movimento: capturado pela data de cadastro (própria ou do documento pai). A janela de
+# revisão relê os últimos dias para pegar campos preenchidos depois do cadastro.
+INCREMENTAIS = {f.nome: f for f in (
+    FonteCaptura("romaneios_dbf", ("ROMANEIO", "LOJA"), "t.CADASTRO", revisao=timedelta(days=2)),
+    FonteCaptura("romaneios_itens_dbf", ("ROMANEIO", "LOJA"), "r.CADASTRO",
+                 "romaneios_itens_dbf t " + _R.format("t.ROMANEIO", "t.LOJA")),
+    FonteCaptura("compras_pedidos", ("ROMANEIO_CODIGO", "ROMANEIO_LOJA"), "r.CADASTRO",
+                 "compras_pedidos t " + _R.format("t.ROMANEIO_CODIGO", "t.ROMANEIO_LOJA")),
+    FonteCaptura("compras_pedidos_itens", ("COMPRA_PEDIDO", "LOJA"), "r.CADASTRO",
+                 "compras_pedidos_itens t JOIN compras_pedidos cp ON cp.COMPRA_PEDIDO = t.COMPRA_PEDIDO "
+                 "AND cp.LOJA = t.LOJA " + _R.format("cp.ROMANEIO_CODIGO", "cp.ROMANEIO_LOJA")),
+    FonteCaptura("expedicao", ("EXPEDICAO", "LOJA"), "t.CADASTRO", revisao=timedelta(days=3)),
+    FonteCaptura("expedicao_itens", ("EXPEDICAO_CODIGO", "EXPEDICAO_LOJA", "ITEM"), "t.CADASTRO",
+                 revisao=timedelta(days=3)),
+    FonteCaptura("compras_dbf", ("COMPRA", "LOJA"), "t.CADASTRO"),
+    FonteCaptura("comp_rate_ativ", ("COMP_CODI", "COMP_LOJA"), "a.CADASTRO",
+                 "comp_rate_ativ t JOIN compras_dbf a ON a.COMPRA = t.COMP_CODI AND a.LOJA = t.COMP_LOJA"),
+    FonteCaptura("cadastros_veiculos_abastecimentos", ("CODIGO", "LOJA"), "t.CADASTRO",
+                 revisao=timedelta(days=7)),
+    FonteCaptura("despesas", ("CODIGO", "LOJA"), "t.DATA"),
+    FonteCaptura("veloe_extrato", ("placa", "data_utilizacao"), "t.data_utilizacao", revisao=timedelta(days=3)),
+)}
+
+# Cadastros: cópia completa a cada sincronização (tabela -> origem no MySQL)
+COMPLETAS = {"lojas": "autogeral.lojas"} | {t: t for t in (
+    "centros_custo", "movimentos_operacoes", "cadastros", "entregador", "cadastros_veiculos",
+    "cadastros_ativos", "cadastros_veiculos_ultilizacao", "produtos_dbf", "produto_estoque",
+    "produto_veiculo", "produto_montadora",
+)}
+
+TABELAS = [*INCREMENTAIS, *COMPLETAS]
+
+# =======================
+# SITUAÇÃO DA SINCRONIZAÇÃO
+# =======================
+_lock_sincronizacao = threading.Lock()
+
+def _caminho_sincronizacao(diretorio: str = DIR_REPLICA) -> str:
+    return os.path.join(diretorio, "_sincronizacao.json")
+
+def ler_sincronizacao(diretorio: str = DIR_REPLICA) -> dict:
+    """{tabela: {sincronizado_em, linhas}} da última sincronização"""
+    try:
+        with open(_caminho_sincronizacao(diretorio), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _gravar_sincronizacao(diretorio: str, tabela: str, linhas: int):
+    """Registra a sincronização da tabela (escrita atômica: leitores nunca veem o arquivo pela metade)"""
+    with _lock_sincronizacao:
+        situacao = ler_sincronizacao(diretorio)
+        situacao[tabela] = {"sincronizado_em": datetime.now().isoformat(timespec="seconds"), "linhas": linhas}
+        temporario = _caminho_sincronizacao(diretorio) + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(situacao, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(temporario, _caminho_sincronizacao(diretorio))
+
+# =======================
+# SINCRONIZAÇÃO (MySQL -> Parquet)
+# =======================
+def normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte colunas DECIMAL (objetos Decimal do driver) em float"""
+    for coluna in df.columns[df.dtypes == object]:
+        amostra = df[coluna].dropna()
+        if not amostra.empty and isinstance(amostra.iloc[0], Decimal):
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce")
+    return df
+
+def gravar_parquet(df: pd.DataFrame, destino: str, chave: tuple = ()):
+    """Grava o lote no Parquet; com chave, substitui as linhas já existentes (upsert)"""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = destino + ".tmp"
+    con = duckdb.connect()
+    try:
+        con.register("lote", df)
+        consulta = "SELECT * FROM lote"
+        if chave and os.path.exists(destino):
+            colunas = ", ".join(f'"{c}"' for c in chave)
+            consulta = (f"SELECT a.* FROM read_parquet('{destino}') a ANTI JOIN lote USING ({colunas}) "
+                        f"UNION ALL BY NAME SELECT * FROM lote")
+        con.execute(f"COPY ({consulta}) TO '{temporario}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    finally:
+        con.close()
+    os.replace(temporario, destino)
+
+def _leitor_mysql(engine, tabela: str):
+    from sqlalchemy import text
+    from core.db import DatabaseManager
+    return lambda sql, params=None: DatabaseManager.read_sql(text(sql), engine, params, nome=f"replica:{tabela}")
+
+def sincronizar_tabela(engine, tabela: str, inicio: datetime, diretorio: str = DIR_REPLICA) -> int:
+    """Copia as linhas novas ou alteradas da tabela para a réplica e retorna quantas foram gravadas"""
+    pasta = os.path.join(diretorio, tabela)
+    ler = _leitor_mysql(engine, tabela)
+
+    if tabela in COMPLETAS:
+        df = normalizar(ler(f"SELECT t.* FROM {COMPLETAS[tabela]} t"))
+        gravar_parquet(df, os.path.join(pasta, "completa.parquet"))
+        _gravar_sincronizacao(diretorio, tabela, len(df))
+        return len(df)
+
+    if not os.path.isdir(pasta):
+        # Réplica apagada ou nova: as marcas antigas não valem mais
+        marcas_dagua.reiniciar(CONSUMIDOR, tabela)
+    fonte, total = INCREMENTAIS[tabela], 0
+    for mes, alteradas in capturar(ler, fonte, CONSUMIDOR, inicio):
+        gravar_parquet(normalizar(alteradas), os.path.join(pasta, f"{mes:%Y-%m}.parquet"), fonte.chave)
+        total += len(alteradas)
+    _gravar_sincronizacao(diretorio, tabela, total)
+    return total
+
+def sincronizar(engine, tabelas: Optional[list] = None, inicio: Optional[datetime] = None,
+                diretorio: str = DIR_REPLICA) -> dict:
+    """Sincroniza as tabelas (todas por padrão); retorna {tabela: linhas gravadas}"""
+    if duckdb is None:
+        raise RuntimeError("Pacote duckdb não instalado")
+    inicio = inicio or datetime(date.today().year - 3, 1, 1)
+    return {nome: sincronizar_tabela(engine, nome, inicio, diretorio) for nome in (tabelas or TABELAS)}
+
+# =======================
+# TRADUÇÃO MySQL -> DuckDB
+# =======================
+_MACROS = (
+    "CREATE OR REPLACE MACRO my_ts(d) AS CAST(d AS TIMESTAMP)",
+    "CREATE OR REPLACE MACRO my_dayofweek(d) AS dayofweek(my_ts(d)) + 1",
+    "CREATE OR REPLACE MACRO my_dayname(d) AS dayname(my_ts(d))",
+    "CREATE OR REPLACE MACRO my_year(d) AS year(my_ts(d))",
+    "CREATE OR REPLACE MACRO my_month(d) AS month(my_ts(d))",
+    "CREATE OR REPLACE MACRO my_day(d) AS day(my_ts(d))",
+    "CREATE OR REPLACE MACRO my_hour(d) AS hour(my_ts(d))",
+    "CREATE OR REPLACE MACRO my_date(d) AS CAST(my_ts(d) AS DATE)",
+    "CREATE OR REPLACE MACRO my_if(c, a, b) AS CASE WHEN c THEN a ELSE b END",
+    "CREATE OR REPLACE MACRO my_timediff(a, b) AS my_ts(a) - my_ts(b)",
+    "CREATE OR REPLACE MACRO my_time_to_sec(t) AS epoch(t)",
+    "CREATE OR REPLACE MACRO my_sec_to_time(s) AS to_seconds(CAST(s AS DOUBLE))",
+    "CREATE OR REPLACE MACRO my_timestampdiff(u, a, b) AS date_sub(lower(u), my_ts(a), my_ts(b))",
+    "CREATE OR REPLACE MACRO my_date_format(d, f) AS strftime(my_ts(d), f)",
+    # WEEK(d, 1) do MySQL: semana ISO, mas com 0 e 53 nas viradas de ano
+    """CREATE OR REPLACE MACRO my_week(d, m) AS CASE
+        WHEN m = 3 THEN week(my_ts(d))
+        WHEN m = 1 THEN CASE WHEN month(my_ts(d)) = 1 AND week(my_ts(d)) > 50 THEN 0
+                             WHEN month(my_ts(d)) = 12 AND week(my_ts(d)) = 1 THEN 53
+                             ELSE week(my_ts(d)) END
+        ELSE CAST(strftime(my_ts(d), '%U') AS INTEGER) END""",
+)
+
+_FUNCOES = ("DAYOFWEEK", "DAYNAME", "YEAR", "MONTH", "DAY", "HOUR", "DATE", "IF",
+            "TIMEDIFF", "TIME_TO_SEC", "SEC_TO_TIME")
+_PADRAO_FUNCOES = re.compile(rf"\b({'|'.join(_FUNCOES)})\s*\(", re.IGNORECASE)
+_PADRAO_LITERAIS = re.compile(r"('(?:[^']|'')*')")
+
+# Especificadores do DATE_FORMAT sem equivalente direto no strftime
+_FORMATOS = {"i": "%M", "s": "%S", "M": "%B", "W": "%A", "c": "%-m", "e": "%-d", "k": "%-H",
+             "l": "%-I", "h": "%I", "T": "%H:%M:%S", "r": "%I:%M:%S %p", "v": "%V", "x": "%G"}
+
+def _fora_de_literal(sql: str, posicao: int) -> bool:
+    return sql.count("'", 0, posicao) % 2 == 0
+
+def _argumentos(sql: str, abre: int) -> tuple:
+    """Argumentos da chamada cujo '(' está em sql[abre]; retorna (args, posição após o ')')"""
+    nivel, atual, args, aspas = 0, [], [], False
+    for i in range(abre, len(sql)):
+        c = sql[i]
+        if aspas:
+            aspas = c != "'"
+        elif c == "'":
+            aspas = True
+        elif c == "(":
+            nivel += 1
+            if nivel == 1:
+                continue
+        elif c == ")":
+            nivel -= 1
+            if nivel == 0:
+                args.append("".join(atual).strip())
+                return args, i + 1
+        elif c == "," and nivel == 1:
+            args.append("".join(atual).strip())
+            atual = []
+            continue
+        atual.append(c)
+    raise ValueError("Parênteses desbalanceados na consulta")
+
+def _reescrever_chamadas(sql: str, funcao: str, montar) -> str:
+    """Substitui cada chamada funcao(...) por montar(args), inclusive chamadas aninhadas"""
+    padrao = re.compile(rf"\b{funcao}\s*\(", re.IGNORECASE)
+    partes, posicao = [], 0
+    while True:
+        m = padrao.search(sql, posicao)
+        if m is None:
+            break
+        if not _fora_de_literal(sql, m.start()):
+            partes.append(sql[posicao:m.end()])
+            posicao = m.end()
+            continue
+        args, fim = _argumentos(sql, m.end() - 1)
+        partes.append(sql[posicao:m.start()])
+        partes.append(montar([_reescrever_chamadas(a, funcao, montar) for a in args]))
+        posicao = fim
+    partes.append(sql[posicao:])
+    return "".join(partes)
+
+def _formato_strftime(literal: str) -> str:
+    """Converte o literal de formato do DATE_FORMAT para o strftime do DuckDB"""
+    if not (literal.startswith("'") and literal.endswith("'")):
+        return literal
+    formato = re.sub(r"%(.)", lambda m: _FORMATOS.get(m.group(1), m.group(0)), literal[1:-1])
+    return f"'{formato}'"
+
+def _intervalo(args: list, sinal: str) -> str:
+    return f"({args[0]} {sinal} {args[1]})"
+
+def traduzir_mysql(sql: str, params: Optional[dict] = None) -> tuple:
+    """Traduz a consulta (e o estilo dos parâmetros) do MySQL para o DuckDB"""
+    if re.search(r"%\(\w+\)s", sql):
+        sql = sql.replace("%%", "%")  # escape do pyformat do driver
+    sql = _reescrever_chamadas(sql, "DATE_FORMAT", lambda a: f"my_date_format({a[0]}, {_formato_strftime(a[1])})")
+    sql = _reescrever_chamadas(sql, "FIELD", lambda a: f"coalesce(list_position([{', '.join(a[1:])}], {a[0]}), 0)")
+    sql = _reescrever_chamadas(sql, "WEEK", lambda a: f"my_week({a[0]}, {a[1] if len(a) > 1 else 0})")
+    sql = _reescrever_chamadas(sql, "DATE_SUB", lambda a: _intervalo(a, "-"))
+    sql = _reescrever_chamadas(sql, "DATE_ADD", lambda a: _intervalo(a, "+"))
+
+    partes = _PADRAO_LITERAIS.split(sql)
+    for i in range(0, len(partes), 2):  # índices pares: fora de literais
+        trecho = re.sub(r"\bautogeral\.", "", partes[i])
+        trecho = trecho.replace("`", '"')
+        trecho = re.sub(r"\bTIMESTAMPDIFF\s*\(\s*(\w+)\s*,", r"my_timestampdiff('\1',", trecho, flags=re.IGNORECASE)
+        trecho = _PADRAO_FUNCOES.sub(lambda m: f"my_{m.group(1).lower()}(", trecho)
+        trecho = re.sub(r"\bCURDATE\s*\(\s*\)", "today()", trecho, flags=re.IGNORECASE)
+        trecho = re.sub(r"\bLIKE\b", "ILIKE", trecho, flags=re.IGNORECASE)
+        trecho = re.sub(r"%\((\w+)\)s", r"$\1", trecho)
+        trecho = re.sub(r"(?<![:\w]):(\w+)", r"$\1", trecho)
+        partes[i] = trecho
+    return "".join(partes), dict(params or {})
+
+_PADRAO_TABELAS = re.compile(r"\b(?:FROM|JOIN)\s+([\w.`]+)", re.IGNORECASE)
+_PADRAO_CTES = re.compile(r"\b(\w+)\s+AS\s*\(", re.IGNORECASE)
+
+def tabelas_da_consulta(sql: str) -> set:
+    """Tabelas lidas pela consulta (sem o prefixo do banco e sem os nomes de CTE)"""
+    ctes = {c.lower() for c in _PADRAO_CTES.findall(sql)}
+    tabelas = {t.replace("`", "").split(".")[-1] for t in _PADRAO_TABELAS.findall(sql)}
+    return {t for t in tabelas if t.lower() not in ctes}
+
+# =======================
+# LEITURA (DuckDB)
+# =======================
+_local = threading.local()
+
+def _conexao():
+    """Conexão DuckDB da thread, com as views recriadas quando a réplica é sincronizada"""
+    versao = os.path.getmtime(_caminho_sincronizacao())
+    con = getattr(_local, "con", None)
+    if con is None:
+        con = _local.con = duckdb.connect()
+        for macro in _MACROS:
+            con.execute(macro)
+        _local.versao = None
+    if _local.versao != versao:
+        for nome in TABELAS:
+            pasta = os.path.join(DIR_REPLICA, nome)
+            if os.path.isdir(pasta) and any(a.endswith(".parquet") for a in os.listdir(pasta)):
+                con.execute(f"CREATE OR REPLACE VIEW {nome} AS SELECT * FROM "
+                            f"read_parquet('{pasta}/*.parquet', union_by_name = true)")
+        _local.versao = versao
+    return con
+
+def disponivel(tabelas: set) -> bool:
+    """Todas as tabelas estão replicadas e sincronizadas dentro do atraso máximo"""
+    if not REPLICA_ATIVA or duckdb is None or not tabelas:
+        return False
+    situacao = ler_sincronizacao()
+    limite = datetime.now() - timedelta(minutes=ATRASO_MAXIMO_MIN)
+    for tabela in tabelas:
+        sincronizado = situacao.get(tabela, {}).get("sincronizado_em")
+        if tabela not in TABELAS or not sincronizado or datetime.fromisoformat(sincronizado) < limite:
+            return False
+    return True
+
+def _ler_duckdb(query, con, params: Optional[dict] = None) -> pd.DataFrame:
+    return con.execute(query, params or None).df()
+
+def consultar(query, params: Optional[dict] = None, nome: Optional[str] = None,
+              compactar: bool = False) -> Optional[pd.DataFrame]:
+    """Executa a consulta na réplica; None quando ela não pode atender (o chamador usa o MySQL)"""
+    from core.instrumentacao import executar_consulta
+
+    sql = query.text if hasattr(query, "text") else str(query)
+    if not disponivel(tabelas_da_consulta(sql)):
+        return None
+    try:
+        sql_duckdb, params_duckdb = traduzir_mysql(sql, params)
+        return executar_consulta(sql_duckdb, _conexao(), params_duckdb, nome=nome,
+                                 classe="replica", leitor=_ler_duckdb, compactar=compactar)
+    except Exception as e:
+        # Falha na réplica (tradução incompleta, arquivo em sincronização...): segue pelo MySQL,
+        # registrando a falha no log e nas métricas (página desempenho e /metrics)
+        from core.instrumentacao import origem_da_chamada
+        from core.metricas import metricas
+
+        pagina, nome_origem = origem_da_chamada()
+        erro = type(e).__name__
+        log.warning("Réplica não atendeu %s/%s (%s: %s); seguindo pelo MySQL",
+                    pagina, nome or nome_origem, erro, str(e)[:200])
+        metricas.registrar_fallback_replica(pagina, nome or nome_origem, erro)
+        return None
+
+# =======================
+# CLI
+# =======================
+def situacao(diretorio: str = DIR_REPLICA) -> pd.DataFrame:
+    """Marca d'água, última sincronização e tamanho em disco de cada tabela"""
+    sincronizacao = ler_sincronizacao(diretorio)
+    linhas = []
+    for nome in TABELAS:
+        pasta = os.path.join(diretorio, nome)
+        arquivos = [os.path.join(pasta, a) for a in os.listdir(pasta)] if os.path.isdir(pasta) else []
+        linhas.append({
+            "tabela": nome,
+            "tipo": "incremental" if nome in INCREMENTAIS else "completa",
+            "marca": marcas_dagua.marca(CONSUMIDOR, nome) if nome in INCREMENTAIS else None,
+            "sincronizado_em": sincronizacao.get(nome, {}).get("sincronizado_em"),
+            "arquivos": len(arquivos),
+            "mb": round(sum(os.path.getsize(a) for a in arquivos) / 1024 ** 2, 1),
+        })
+    return pd.DataFrame(linhas)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Réplica analítica local (Parquet + DuckDB)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_sinc = sub.add_parser("sincronizar", help="Copia do MySQL as linhas novas desde a última marca")
+    p_sinc.add_argument("--url", help="MySQL de origem (padrão: [connections.mysql] do secrets.toml)")
+    p_sinc.add_argument("--tabelas", nargs="*", choices=TABELAS, help="Padrão: todas")
+    p_sinc.add_argument("--inicio", type=date.fromisoformat,
+                        help="Data inicial da primeira carga (padrão: 1º de janeiro de três anos atrás)")
+
+    sub.add_parser("situacao", help="Marcas d'água e tamanho da réplica")
+
+    args = parser.parse_args(argv)
+    if args.comando == "situacao":
+        print(situacao().to_string(index=False))
+        return
+
+    if args.url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.url, pool_pre_ping=True)
+    else:
+        from core.db import DatabaseManager
+        engine = DatabaseManager.get_engine()
+    inicio = datetime.combine(args.inicio, datetime.min.time()) if args.inicio else None
+    for nome in args.tabelas or TABELAS:
+        comeco = time.perf_counter()
+        linhas = sincronizar(engine, [nome], inicio)[nome]
+        print(f"{nome:<36} {linhas:>12} linhas  {time.perf_counter() - comeco:>8.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Transformações de dados das páginas, sem acesso ao banco nem ao Streamlit.
+
+As páginas importam estas funções; ficam aqui para poderem ser chamadas fora de
+uma sessão do Streamlit (benchmarks em perf/bench_transformacoes.py).
+"""
+import calendar
+import re
+
+import numpy as np
+import pandas as pd
+
+from core.kpi import razao
+
+
+# =======================
+# Abastecimento por veículo (abastecimento_veic)
+# =======================
+def process_data_year_mode(df, anos_interesse):
+    """Processa os dados para o modo 'Ano' ou 'Selecione data'."""
+    df = df.copy()
+    df['CADASTRO'] = pd.to_datetime(df['CADASTRO'])
+    df['CADASTRO'] = df['CADASTRO'].dt.to_period('M')
+    df.drop_duplicates(keep='first', inplace=True)
+    drop_cols = ['CRIADO_POR', 'ALTERADO', 'ALTERADO_POR']
+    df.drop(columns=[c for c in drop_cols if c in df.columns], inplace=True, errors='ignore')
+
+    df_final = df.groupby(['CADASTRO'], as_index=False).agg({
+         'VALOR_TOTAL': 'sum',
+         'COMBUSTIVEL_1_LITROS': 'sum',
+         'COMBUSTIVEL_2_LITROS': 'sum'
+    })
+    df_final['COMBUSTIVEL_1_LITROS'] = df_final['COMBUSTIVEL_1_LITROS'].fillna(0).infer_objects()
+    df_final['COMBUSTIVEL_2_LITROS'] = df_final['COMBUSTIVEL_2_LITROS'].fillna(0).infer_objects()
+    df_final['TOTAL_COMBUSTIVEL'] = df_final['COMBUSTIVEL_1_LITROS'] + df_final['COMBUSTIVEL_2_LITROS']
+    df_final['CADASTRO'] = df_final['CADASTRO'].dt.to_timestamp()
+    df_final['ANO'] = df_final['CADASTRO'].dt.year
+    df_final['MES'] = df_final['CADASTRO'].dt.month
+    df_final = df_final[df_final['ANO'].isin(anos_interesse)]
+    return df_final
+
+
+def generate_yearly_value_table(df, anos_interesse):
+    """Gera tabela pivot para o Valor Total com Total Ano, YTD e variação percentual."""
+    return comparativo_anual(df, 'MES', 'VALOR_TOTAL', rotulos=NOMES_MESES, ytd_ate=df['MES'].max())
+
+
+# =======================
+# Comparativo ano a ano (tabelas anuais e semanais)
+# =======================
+NOMES_MESES = {i: calendar.month_name[i] for i in range(1, 13)}
+
+def comparativo_anual(df, periodo, medida, ano='ANO', rotulos=None, anos=None, periodos=None,
+                      total='Total Ano', ytd_ate=None, se_zero=np.nan, diferencas=False) -> pd.DataFrame:
+    """
+    Tabela ano x período da soma de `medida` com o total, o YTD (períodos <= ytd_ate)
+    e, para cada par de anos consecutivos, a linha 'Var% AxB' (e 'Dif AxB' com
+    diferencas=True). O frame longo vira uma matriz anos x períodos com um bincount;
+    totais, diferenças e crescimentos são operações sobre a matriz inteira.
+
+    anos/periodos fixam as linhas e colunas (os ausentes valem zero); sem eles,
+    entram os presentes em df. A variação sobre um valor anterior zero vale `se_zero`.
+    """
+    anos = pd.Index(sorted(anos) if anos is not None else df[ano].dropna().unique()).sort_values()
+    periodos = pd.Index(list(periodos) if periodos is not None else df[periodo].dropna().unique()).sort_values()
+    linha = anos.get_indexer(df[ano])
+    coluna = periodos.get_indexer(df[periodo])
+    valores = pd.to_numeric(df[medida], errors='coerce').to_numpy(dtype='float64')
+    ok = (linha >= 0) & (coluna >= 0) & ~np.isnan(valores)
+    matriz = np.bincount(linha[ok] * len(periodos) + coluna[ok], weights=valores[ok],
+                         minlength=len(anos) * len(periodos)).reshape(len(anos), len(periodos))
+
+    rotulos = rotulos or {}
+    nomes = [rotulos.get(p, p) for p in periodos] + [total]
+    blocos = [matriz, matriz.sum(axis=1, keepdims=True)]
+    if ytd_ate is not None:
+        nomes.append('YTD')
+        blocos.append(matriz[:, periodos.to_numpy() <= ytd_ate].sum(axis=1, keepdims=True))
+    tabela = np.hstack(blocos)
+
+    anterior = tabela[:-1]
+    delta = tabela[1:] - anterior
+    crescimento = np.divide(delta, anterior, out=np.full(anterior.shape, np.nan), where=anterior != 0) * 100
+    crescimento[anterior == 0] = se_zero
+    pares = [f"{a}x{b}" for a, b in zip(anos[1:], anos[:-1])]
+    partes = [tabela, crescimento] + ([delta] if diferencas else [])
+    indice = ([str(a) for a in anos] + [f"Var% {p}" for p in pares]
+              + ([f"Dif {p}" for p in pares] if diferencas else []))
+    resultado = pd.DataFrame(np.vstack(partes), index=pd.Index(indice, name=ano),
+                             columns=pd.Index([str(n) for n in nomes], name=periodo))
+    return resultado.round(2)
+
+
+# =======================
+# Entregas em até 40 minutos (entrega_em_40)
+# =======================
+LOJA_DICT = {
+    1: 'CD',
+    2: 'SALTO',
+    3: 'SOROCABA',
+    4: 'CAETANO',
+    5: 'INDAIATUBA',
+    6: 'PORTO FELIZ',
+    7: 'ÉDEN',
+    8: 'JACARE',
+    9: 'TATUI',
+    10: 'BOITUVA',
+    11: 'PIEDADE',
+    12: 'OTAVIANO',
+    13: 'CERQUILHO'
+}
+
+
+def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
+
+    # Agrega os dados agrupando por MES e LOJA. Calcula:
+    #   - TOTAL_ENTREGAS: total de entregas (count de MINUTOS_ENTREGA)
+    #   - Entrega_40: quantidade de entregas com MINUTOS_ENTREGA <= 40
+    #   - PORCENTAGEM_ENTREGA_40: (Entrega_40/TOTAL_ENTREGAS)*100
+    #   - PORCENTAGEM_TOTAL_ENTREGAS: percentual de TOTAL_ENTREGAS da loja em relação ao total do mês
+
+    filtro = df[df["ROTA_STATUS"] == "ENTREGUE"].copy()
+    agrupado = filtro.groupby(["MES", "LOJA"]).agg(
+        TOTAL_ENTREGAS=("MINUTOS_ENTREGA", "count"),
+        Entrega_40=("MINUTOS_ENTREGA", lambda x: (x <= 40).sum())
+    ).reset_index()
+    
+    agrupado["PORCENTAGEM_ENTREGA_40"] = (agrupado["Entrega_40"] / agrupado["TOTAL_ENTREGAS"]) * 100
+    
+    # Calcula o total de entregas por mês e, em seguida, o percentual de cada loja
+    agrupado["TOTAL_DELIVERIES_MES"] = agrupado.groupby("MES")["TOTAL_ENTREGAS"].transform("sum")
+    agrupado["PORCENTAGEM_TOTAL_ENTREGAS"] = (agrupado["TOTAL_ENTREGAS"] / agrupado["TOTAL_DELIVERIES_MES"]) * 100
+
+    agrupado["LOJA"] = agrupado["LOJA"].astype(int)
+    agrupado["LOJA_NOME"] = agrupado["LOJA"].map(LOJA_DICT)
+
+    # Ordenando lojas por numero de loja e nao em ordem alfabetica
+    loja_cats = pd.CategoricalDtype(categories=[LOJA_DICT[i] for i in range(1, 14)], ordered=True)
+    agrupado["LOJA_NOME"] = agrupado["LOJA_NOME"].astype(loja_cats)
+    agrupado = agrupado.sort_values(by="LOJA_NOME")
+    return agrupado
+
+
+# =======================
+# Tipos de entrega por loja e mês (tipos_entrega)
+# =======================
+TIPOS_ENTREGA = ['ENTREGA_40', 'CLIENTES', 'ROTA', 'VENDA_CASADA']
+
+
+def combinar_tipos_entrega(df_40, df_clientes, df_rota, df_venda_casada) -> pd.DataFrame:
+    """Uma linha por (LOJA, MES_ANO) com as contagens de cada tipo e TOTAL = CLIENTES + ROTA + VENDA_CASADA"""
+    # Concatena as quatro consultas pela chave e soma: tipos ausentes no par ficam 0
+    partes = [df[['LOJA', 'MES_ANO']].assign(**{tipo: pd.to_numeric(df[tipo], errors='coerce')})
+              for df, tipo in zip([df_40, df_clientes, df_rota, df_venda_casada], TIPOS_ENTREGA)]
+    fato = pd.concat(partes, ignore_index=True).groupby(['LOJA', 'MES_ANO'], sort=True)[TIPOS_ENTREGA].sum()
+    fato = fato.fillna(0).astype('int64')
+    fato['TOTAL'] = fato['CLIENTES'] + fato['ROTA'] + fato['VENDA_CASADA']
+    return fato.reset_index()
+
+
+# =======================
+# Custos por entrega (custo_entrega_entregadores)
+# =======================
+def consolidar_custos_entrega(df_custo_entregadores, df_rate, df_ROMANEIO, data_inicio=None, data_fim=None):
+    """Consolida os 3 dataframes e calcula custo por entrega"""
+    
+    df_rate_grouped = df_rate.groupby(['LOJA', 'PERIODO'])['VALOR_CUSTO_LOJA'].sum().reset_index()
+    df_custos_grouped = df_custo_entregadores.groupby(['LOJA', 'PERIODO'])['custo_entregadores'].sum().reset_index()
+    
+    df_merged = pd.merge(df_custos_grouped, df_ROMANEIO, on=['LOJA', 'PERIODO'], how='outer')
+    df_consolidado = pd.merge(df_merged, df_rate_grouped, on=['LOJA', 'PERIODO'], how='outer')
+    
+    df_consolidado = df_consolidado.fillna(0)
+    
+    # Filtrar por período
+    if data_inicio and data_fim:
+        periodo_inicio = pd.Period(data_inicio, freq='M')
+        periodo_fim = pd.Period(data_fim, freq='M')
+        df_consolidado = df_consolidado[
+            (df_consolidado['PERIODO'] >= periodo_inicio) & 
+            (df_consolidado['PERIODO'] <= periodo_fim)
+        ]
+    
+    df_consolidado = df_consolidado.copy()
+    df_consolidado['custo_total'] = (df_consolidado['custo_entregadores'] + 
+                                   df_consolidado['VALOR_CUSTO_LOJA']).round(2)
+    
+    # Sem expedições, o custo por entrega é o próprio custo total
+    df_consolidado['custo_por_entrega'] = razao(
+        df_consolidado['custo_total'], df_consolidado['total_expedicoes'],
+        se_zero=df_consolidado['custo_total'], decimais=2
+    )
+    
+    df_consolidado['PERIODO_STR'] = df_consolidado['PERIODO'].astype(str)
+    
+    return df_consolidado
+
+
+# =======================
+# Manutenção da frota (api_custo_manutencao_frota)
+# =======================
+def limpa_texto(placa):
+    """
+    Remove caracteres especiais e espaços, deixando apenas letras maiúsculas e números.
+
+    Args:
+        placa (str): Texto a ser limpo (geralmente uma placa de veículo).
+
+    Returns:
+        str: Texto normalizado contendo apenas letras e números maiúsculos.
+    """
+    return re.sub(r'[^A-Z0-9]', '', placa.upper())
+
+
+def extrair_placas(texto, placas_set):
+    """
+    Extrai placas presentes no texto comparando com um conjunto de placas normalizadas.
+
+    Args:
+        texto (str): Texto a ser analisado (ex: coluna OBS).
+        placas_set (set): Conjunto de placas já normalizadas.
+
+    Returns:
+        list: Lista de placas encontradas no texto.
+    """
+    if pd.isna(texto):
+        return []
+    texto_normalizado = limpa_texto(texto)
+    return [placa for placa in placas_set if placa in texto_normalizado]
+
+
+def agregar_custo_frota(custo_frota, placas_df, tabela_pedidos):
+    """
+    Associa as NFEs às placas citadas na OBS e soma com os pedidos da frota, por loja e mês.
+
+    Parte de custo_frota_loja sem acesso ao banco nem ao Streamlit.
+
+    Args:
+        custo_frota (pandas.DataFrame): NFEs de consumo (LOJA, EMISSAO, VALOR_TOTAL, OBS).
+        placas_df (pandas.DataFrame): Placas cadastradas (PLACA).
+        tabela_pedidos (pandas.DataFrame): Pedidos agregados por LOJA e EMISSAO (mensal).
+
+    Returns:
+        pandas.DataFrame: DataFrame com custo total da frota por loja e mês.
+    """
+    custo_frota = custo_frota.copy()
+    placas_df = placas_df.copy()
+    custo_frota['EMISSAO'] = pd.to_datetime(custo_frota['EMISSAO']).dt.to_period('M')
+
+    # Normaliza as placas
+    placas_df['placa_normalizada'] = placas_df['PLACA'].apply(limpa_texto)
+    placas_set = set(placas_df['placa_normalizada'])
+
+    # Extrai placas das observações
+    custo_frota['placas_encontradas'] = custo_frota['OBS'].apply(lambda x: extrair_placas(str(x), placas_set))
+    custo_frota['cont_placa'] = custo_frota['placas_encontradas'].apply(len)
+
+    # Explode as placas por linha (1 linha por placa encontrada)
+    placas_explodidas = custo_frota.explode('placas_encontradas')
+
+    # Agrupa por LOJA, EMISSAO e placa
+    tabela_placas = (
+        placas_explodidas.dropna(subset=['placas_encontradas'])
+        .groupby(['LOJA', 'EMISSAO', 'placas_encontradas'], as_index=False)
+        .agg({'VALOR_TOTAL': 'sum'})
+        .rename(columns={'placas_encontradas': 'PLACA'})
+    )
+
+    # Junta com os pedidos por loja e mês
+    tabela_agrupada = pd.merge(
+        tabela_placas, tabela_pedidos, on=['LOJA', 'EMISSAO'], how='outer'
+    )
+
+    tabela_agrupada['VALOR_TOTAL_x'] = tabela_agrupada['VALOR_TOTAL_x'].fillna(0)
+    tabela_agrupada['VALOR_TOTAL_y'] = tabela_agrupada['VALOR_TOTAL_y'].fillna(0)
+
+    tabela_agrupada['VALOR_TOTAL'] = tabela_agrupada['VALOR_TOTAL_x'] + tabela_agrupada['VALOR_TOTAL_y']
+
+    # Agrupa por loja e mês final
+    tabela_agrupada = tabela_agrupada.groupby(['LOJA', 'EMISSAO'], as_index=False)['VALOR_TOTAL'].sum()
+    tabela_agrupada['VALOR_TOTAL'] = tabela_agrupada['VALOR_TOTAL'].round(2)
+
+    return tabela_agrupada
+
+
+# =======================
+# Mapa de calor por meses (mapa_calor_por_meses)
+# =======================
+DIAS_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
+MESES_NOMES = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 
+               5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 
+               9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
+
+
+def preencher_meses_dias(pivot):
+    meses = list(MESES_NOMES.values())
+    pivot = pivot.reindex(index=meses, columns=DIAS_SEMANA, fill_value=0)
+    return pivot.fillna(0)
+
+
+def remover_outliers(df, coluna):
+    Q1 = df[coluna].quantile(0.25)
+    Q3 = df[coluna].quantile(0.75)
+    IQR = Q3 - Q1
+    return df[(df[coluna] >= Q1 - 1.5*IQR) & (df[coluna] <= Q3 + 1.5*IQR)]
+
+
+def criar_pivot(df, tipo_metrica, coluna_vazia):
+    if tipo_metrica == "Quantidade de ROMANEIO":
+        pivot = df.groupby(['mes', 'dia_semana'])['ROMANEIO'].nunique().reset_index()
+        pivot = pivot.pivot(index='mes', columns='dia_semana', values='ROMANEIO')
+    else:
+        if not coluna_vazia:
+            df_limpo = remover_outliers(df[df['valor'] > 0], 'valor')
+            pivot = df_limpo.pivot_table(values='valor', index='mes', columns='dia_semana', aggfunc='median')
+        else:
+            meses = list(MESES_NOMES.values())
+            pivot = pd.DataFrame(0, index=meses, columns=DIAS_SEMANA)
+    
+    return preencher_meses_dias(pivot)
+
+
+# =======================
+# Custos das lojas (custo_loja_sem_veiculo)
+# =======================
+def resumir_custos(df):
+    """Gera os resumos de custos a partir do resultado de consulta_custos_totais (sem acesso ao banco)"""
+    # Remove duplicatas no DataFrame
+    df = df.drop_duplicates(subset=['LOJA', 'DATA', 'VALOR'])
+    
+    # Converter data
+    df['DATA'] = pd.to_datetime(df['DATA'])
+    df['DATA_FORMATADA'] = df['DATA'].dt.date
+    df['MES_ANO'] = df['DATA'].dt.to_period('M')
+    
+    # Agrupamento por loja, data e descrição
+    resumo_agrupado = df.groupby(['LOJA', 'DATA_FORMATADA', 'CENTRO_CUSTO_DESCRICAO']).agg({
+        'VALOR': ['sum', 'mean', 'count']
+    }).reset_index()
+    
+    # Achatar colunas
+    resumo_agrupado.columns = ['LOJA', 'DATA', 'DESCRICAO', 'TOTAL', 'MEDIA', 'QUANTIDADE']
+    
+    # Resumos para análise
+    resumo_loja = df.groupby('LOJA')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
+    resumo_loja.columns = ['LOJA', 'TOTAL', 'MEDIA', 'QUANTIDADE']
+    
+    resumo_tempo = df.groupby('DATA_FORMATADA')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
+    resumo_tempo.columns = ['DATA', 'TOTAL', 'MEDIA', 'QUANTIDADE']
+    
+    resumo_mensal = df.groupby('MES_ANO')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
+    resumo_mensal['MES_ANO'] = resumo_mensal['MES_ANO'].astype(str)
+    resumo_mensal.columns = ['MES', 'TOTAL', 'MEDIA', 'QUANTIDADE']
+    
+    resumo_desc = df.groupby('CENTRO_CUSTO_DESCRICAO')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
+    resumo_desc.columns = ['DESCRICAO', 'TOTAL', 'MEDIA', 'QUANTIDADE']
+    
+    # Resumo por LOJA, MES e CÓDIGO
+    resumo_loja_mes_codigo = df.groupby(['LOJA', 'MES_ANO', 'CODIGO'])['VALOR'].agg(['sum', 'mean', 'median', 'count']).reset_index()
+    resumo_loja_mes_codigo['MES_ANO'] = resumo_loja_mes_codigo['MES_ANO'].astype(str)
+    resumo_loja_mes_codigo.columns = ['LOJA', 'MES', 'CODIGO', 'TOTAL', 'MEDIA', 'MEDIANA', 'QUANTIDADE']
+    
+    return {
+        'original': df,
+        'agrupado': resumo_agrupado,
+        'por_loja': resumo_loja,
+        'por_dia': resumo_tempo,
+        'por_mes': resumo_mensal,
+        'por_desc': resumo_desc,
+        'por_loja_mes_codigo': resumo_loja_mes_codigo
+    }
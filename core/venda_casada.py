@@ -0,0 +1,65 @@
+"""Romaneios por loja e mês classificados em ROTA, VENDA_CASADA e CLIENTES, em cache por mês."""
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from core.cache import cache_data
+from core.db import DatabaseManager
+
+# Contagens por linha do join (um romaneio com dois pedidos conta duas vendas casadas),
+# como nas consultas que esta substitui
+SQL_VENDA_CASADA = """
+SELECT b.LOJA,
+       DATE_FORMAT(b.CADASTRO, '%Y-%m') AS MES_ANO,
+       SUM(CASE WHEN o.DESCRICAO_SIMPLIFICADA = 'Transferência' THEN 1 ELSE 0 END) AS ROTA,
+       SUM(CASE WHEN a.COMPRA_PEDIDO IS NOT NULL THEN 1 ELSE 0 END) AS VENDA_CASADA,
+       SUM(CASE WHEN o.DESCRICAO_SIMPLIFICADA = 'Venda' AND a.COMPRA_PEDIDO IS NULL THEN 1 ELSE 0 END) AS CLIENTES
+FROM romaneios_dbf b
+LEFT JOIN compras_pedidos a ON a.ROMANEIO_CODIGO = b.ROMANEIO AND a.ROMANEIO_LOJA = b.LOJA
+JOIN movimentos_operacoes o ON b.OPERACAO_CODIGO = o.CODIGO
+WHERE b.CADASTRO BETWEEN :inicio AND :fim
+GROUP BY b.LOJA, DATE_FORMAT(b.CADASTRO, '%Y-%m')
+"""
+
+COLUNAS = ['LOJA', 'MES_ANO', 'ROTA', 'VENDA_CASADA', 'CLIENTES']
+
+def _ler(engine, inicio: str, fim: str) -> pd.DataFrame:
+    df = DatabaseManager.read_sql(text(SQL_VENDA_CASADA), engine, params={'inicio': inicio, 'fim': fim},
+                                  nome="venda_casada", replica=True)
+    df = df.reindex(columns=COLUNAS)
+    df[['ROTA', 'VENDA_CASADA', 'CLIENTES']] = df[['ROTA', 'VENDA_CASADA', 'CLIENTES']].apply(
+        pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+    return df
+
+@cache_data(ttl=86400)
+def _mes_fechado(_engine, inicio: str, fim: str) -> pd.DataFrame:
+    return _ler(_engine, inicio, fim)
+
+@cache_data(ttl=600)
+def _mes_aberto(_engine, inicio: str, fim: str) -> pd.DataFrame:
+    return _ler(_engine, inicio, fim)
+
+def janelas_mensais(inicio, fim) -> list:
+    """[(início, fim)] de cada mês do período, recortados nas pontas (BETWEEN inclusivo)"""
+    inicio, fim = pd.Timestamp(inicio), pd.Timestamp(fim)
+    janelas = []
+    for mes in pd.period_range(inicio, fim, freq='M'):
+        ini = max(inicio, mes.start_time)
+        ult = min(fim, mes.end_time.floor('s'))
+        janelas.append((ini.strftime("%Y-%m-%d %H:%M:%S"), ult.strftime("%Y-%m-%d %H:%M:%S")))
+    return janelas
+
+def fato_venda_casada(engine, inicio, fim, lojas=None) -> pd.DataFrame:
+    """Uma linha por (LOJA, MES_ANO 'AAAA-MM') com ROTA, VENDA_CASADA e CLIENTES do período"""
+    agora = datetime.now()
+    partes = []
+    for ini, ult in janelas_mensais(inicio, fim):
+        fechado = pd.Timestamp(ult) < pd.Timestamp(agora).to_period('M').start_time
+        partes.append((_mes_fechado if fechado else _mes_aberto)(engine, ini, ult))
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS)
+    df = pd.concat(partes, ignore_index=True)
+    if lojas:
+        df = df[df['LOJA'].isin(list(lojas))]
+    return df.sort_values(['LOJA', 'MES_ANO'], kind='stable').reset_index(drop=True)
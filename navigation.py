@@ -21,7 +21,8 @@ class AccessControl:
         "entrega_logistica_40.py": ["Gestor", "Contas_pagar", "Compras", "Estagiário de TI", "Sócio", "Gerente de Vendas"],
         "centro_custo.py": ["Gestor", "Encarregado", "VENDAS", "Estagiário de TI", "Sócio", "Desenvolvedora de Software", "Gerente de Vendas"],
         "proporcao_compras_transferencias.py": ["Gestor", "Encarregado", "VENDAS", "Estagiário de TI", "Sócio", "Desenvolvedora de Software", "Gerente de Vendas"],
-        "entrega40.py": ["Gestor", "Encarregado", "VENDAS", "Estagiário de TI", "Sócio", "Desenvolvedora de Software", "Gerente de Vendas"]
+        "entrega40.py": ["Gestor", "Encarregado", "VENDAS", "Estagiário de TI", "Sócio", "Desenvolvedora de Software", "Gerente de Vendas"],
+        "desempenho.py": ["Estagiário de TI", "Desenvolvedora de Software"]
     }
     
     PAGES = [
@@ -42,6 +43,7 @@ class AccessControl:
         {"file": "abastecimento_veic.py", "label": "Custo combustivel frota", "permitir": PERMISSIONS.get("abastecimento_veic.py")},
         {"file": "produto_cruzado_fraga.py", "label": "Produtos Cruzado Fraga", "permitir": PERMISSIONS.get("produto_cruzado_fraga.py")},
         {"file": "motorista_ocioso.py", "label": "Motoristas Ocioso", "permitir": PERMISSIONS.get("motorista_ocioso.py")},
+        {"file": "desempenho.py", "label": "Desempenho do Sistema (TI)", "permitir": PERMISSIONS.get("desempenho.py")},
         # {"file": "entrega_em_40.py", "label": "Endicadores de Entregas", "permitir": PERMISSIONS.get("entrega_em_40.py")},
         #{"file": "centro_custo.py", "label": "Centro de custo", "permitir": PERMISSIONS.get("centro_custo.py")},
         # commit Removendo dashboard centro_custo.py por talvez nao ser mais necessario, pois sera centralizado em outro dashboard e agora as informacoes estao na tabela comp_rateio, sem a necessidade de varios joins e usar as varias apis
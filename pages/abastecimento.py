@@ -4,8 +4,10 @@ if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
     st.warning("Você não está logado. Redirecionando para a página de login...")
     st.switch_page("app.py")
     st.stop()
-import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.transformacoes import comparativo_anual
 import plotly.graph_objects as go
 from datetime import datetime
 
@@ -45,9 +47,7 @@ if opcao == "SOMA POR LOJA, MES E VEICULO":
     data_fim = col2.date_input("Data Fim", datetime(2025, 9, 30))
     
     # Buscar lojas disponíveis
-    lojas_query = "SELECT DISTINCT LOJA FROM cadastros_veiculos_abastecimentos ORDER BY LOJA"
-    lojas_df = pd.read_sql(lojas_query, engine)
-    lojas_lista = ["Todas"] + lojas_df['LOJA'].tolist()
+    lojas_lista = ["Todas"] + refdata.codigos_lojas(engine)
     
     loja_selecionada = st.sidebar.selectbox("Selecione a Loja", lojas_lista)
     
@@ -74,7 +74,7 @@ if opcao == "SOMA POR LOJA, MES E VEICULO":
     ORDER BY K.LOJA, CADASTRO
     """
     
-    df = pd.read_sql(query, engine)
+    df = DatabaseManager.read_sql(query, engine)
     
     # Filtros acima da tabela
     col_filtro1, col_filtro2 = st.columns(2)
@@ -112,9 +112,7 @@ elif opcao == "SOMA POR LOJA E MES":
     data_fim = col2.date_input("Data Fim", datetime(2025, 9, 30))
     
     # Buscar lojas disponíveis
-    lojas_query = "SELECT DISTINCT LOJA FROM cadastros_veiculos_abastecimentos ORDER BY LOJA"
-    lojas_df = pd.read_sql(lojas_query, engine)
-    lojas_lista = ["Todas"] + lojas_df['LOJA'].tolist()
+    lojas_lista = ["Todas"] + refdata.codigos_lojas(engine)
     
     loja_selecionada = st.sidebar.selectbox("Selecione a Loja", lojas_lista)
     
@@ -137,7 +135,7 @@ elif opcao == "SOMA POR LOJA E MES":
     ORDER BY K.LOJA, CADASTRO
     """
     
-    df = pd.read_sql(query, engine)
+    df = DatabaseManager.read_sql(query, engine)
     
     # Gráfico de barras
     fig = go.Figure()
@@ -180,7 +178,7 @@ else:
     ORDER BY YEAR(K.CADASTRO), MONTH(K.CADASTRO)
     """
     
-    df = pd.read_sql(query, engine)
+    df = DatabaseManager.read_sql(query, engine)
     
     # Nomes dos meses
     meses_nomes = {1: 'January', 2: 'February', 3: 'March', 4: 'April', 5: 'May', 6: 'June',
@@ -222,61 +220,7 @@ else:
     # Criar tabela formatada
     st.subheader("📊 Tabela Comparativa por Ano")
     
-    # Preparar dados da tabela
-    tabela_data = {'ANO': []}
-    for mes_num in range(1, 13):
-        tabela_data[meses_nomes[mes_num]] = []
-    tabela_data['Total Ano'] = []
-    tabela_data['YTD'] = []
-    
-    # Preencher dados para cada ano
-    for ano in anos:
-        tabela_data['ANO'].append(ano)
-        total_ano = 0
-        mes_atual = datetime.now().month if ano == ano_atual else 12
-        
-        for mes_num in range(1, 13):
-            if ano in df_pivot.columns and mes_num in df_pivot.index:
-                valor = df_pivot.loc[mes_num, ano]
-                tabela_data[meses_nomes[mes_num]].append(f'{valor:,.2f}')
-                if mes_num <= mes_atual:
-                    total_ano += valor
-            else:
-                tabela_data[meses_nomes[mes_num]].append('0.00')
-        
-        tabela_data['Total Ano'].append(f'{total_ano:,.2f}')
-        tabela_data['YTD'].append(f'{total_ano:,.2f}')
-    
-    # Calcular variações
-    if len(anos) >= 2:
-        tabela_data['ANO'].append(f'Var% {anos[1]}x{anos[0]}')
-        for mes_num in range(1, 13):
-            col_name = meses_nomes[mes_num]
-            val_2023 = float(tabela_data[col_name][0].replace(',', ''))
-            val_2024 = float(tabela_data[col_name][1].replace(',', ''))
-            var = ((val_2024 - val_2023) / val_2023 * 100) if val_2023 > 0 else 0
-            tabela_data[col_name].append(f'{var:.2f}')
-        
-        total_2023 = float(tabela_data['Total Ano'][0].replace(',', ''))
-        total_2024 = float(tabela_data['Total Ano'][1].replace(',', ''))
-        var_total = ((total_2024 - total_2023) / total_2023 * 100) if total_2023 > 0 else 0
-        tabela_data['Total Ano'].append(f'{var_total:.2f}')
-        tabela_data['YTD'].append(f'{var_total:.2f}')
-    
-    if len(anos) >= 3:
-        tabela_data['ANO'].append(f'Var% {anos[2]}x{anos[1]}')
-        for mes_num in range(1, 13):
-            col_name = meses_nomes[mes_num]
-            val_2024 = float(tabela_data[col_name][1].replace(',', ''))
-            val_2025 = float(tabela_data[col_name][2].replace(',', ''))
-            var = ((val_2025 - val_2024) / val_2024 * 100) if val_2024 > 0 else 0
-            tabela_data[col_name].append(f'{var:.2f}')
-        
-        total_2024 = float(tabela_data['Total Ano'][1].replace(',', ''))
-        total_2025 = float(tabela_data['Total Ano'][2].replace(',', ''))
-        var_total = ((total_2025 - total_2024) / total_2024 * 100) if total_2024 > 0 else 0
-        tabela_data['Total Ano'].append(f'{var_total:.2f}')
-        tabela_data['YTD'].append(f'{var_total:.2f}')
-    
-    df_tabela = pd.DataFrame(tabela_data)
-    st.dataframe(df_tabela, use_container_width=True)
\ No newline at end of file
+    # Meses sem abastecimento valem zero; YTD até o mês corrente em todos os anos
+    df_tabela = comparativo_anual(df, 'MES_NUM', 'SOMA_ABASTECIMENTOS', anos=anos, periodos=range(1, 13),
+                                  rotulos=meses_nomes, ytd_ate=datetime.now().month, se_zero=0)
+    st.dataframe(df_tabela.style.format("{:,.2f}"), use_container_width=True)
\ No newline at end of file
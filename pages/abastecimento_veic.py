@@ -15,6 +15,13 @@ import plotly.express as px
 import calendar
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.cache import cache_por_loja
+from core.multiloja import condicao_lojas, descrever_lojas, selecionar_lojas
+from core.metricas import medir_pagina
+from core.transformacoes import (process_data_year_mode, generate_yearly_value_table, comparativo_anual,
+                                 NOMES_MESES)
 
 # =======================
 # 1. Funções de Conexão e Consulta ao Banco
@@ -26,18 +33,22 @@ def criar_conexao():
           f"{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url)
 
-def executar_query(engine, query):
+@cache_por_loja(ttl=3600)
+def carregar_abastecimentos(_engine, lojas, inicio, fim):
+    """Abastecimentos das lojas no período, numa única consulta (cada loja fica no cache)"""
+    return DatabaseManager.read_sql(gerar_query_dados(inicio, fim, lojas), _engine, replica=True)
+
+def executar_query(engine, lojas, inicio, fim):
     """Executa a query no banco de dados e retorna um DataFrame."""
     try:
-        return pd.read_sql(query, engine)
+        return carregar_abastecimentos(engine, lojas, inicio, fim)
     except Exception as e:
         st.error(f"Erro ao executar a query: {e}")
         return pd.DataFrame()
 
 def consultar_lojas(engine):
-    """Consulta e retorna os dados das lojas."""
-    query = "SELECT codigo, nome FROM autogeral.lojas ORDER BY codigo"
-    return executar_query(engine, query)
+    """Retorna as lojas (codigo, nome) dos dados de referência."""
+    return refdata.lojas(engine)
 
 # =======================
 # 2. Funções Auxiliares para Datas
@@ -62,15 +73,16 @@ def obter_semanas_do_mes(data):
 # =======================
 # 3. Função para Gerar a Query de Dados
 # =======================
-def gerar_query_dados(inicio, fim, loja, custom_query=None):
+def gerar_query_dados(inicio, fim, lojas, custom_query=None):
     """
     Gera a query SQL para extrair os dados.
-    Se 'custom_query' for fornecida, ela deve ter os placeholders {inicio}, {fim} e {loja}.
+    Se 'custom_query' for fornecida, ela deve ter os placeholders {inicio}, {fim} e {lojas}
+    (condição SQL, ex.: K.LOJA IN (1, 2)).
     """
     if custom_query:
         return custom_query.format(inicio=inicio.strftime("%Y-%m-%d"),
                                      fim=fim.strftime("%Y-%m-%d"),
-                                     loja=loja)
+                                     lojas=condicao_lojas('K.LOJA', lojas))
     inicio_str = inicio.strftime("%Y-%m-%d")
     fim_str = fim.strftime("%Y-%m-%d")
     query = f"""
@@ -86,36 +98,13 @@ def gerar_query_dados(inicio, fim, loja, custom_query=None):
            LEFT JOIN produto_veiculo A ON V.VEICULO_CODIGO = A.CODIGO
            LEFT JOIN produto_montadora B ON A.MONTADORA_CODIGO = B.CODIGO
      WHERE K.CADASTRO BETWEEN '{inicio_str} 00:00:00' AND '{fim_str} 23:59:59'
-       AND K.LOJA = {loja};
+       AND {condicao_lojas('K.LOJA', lojas)};
     """
     return query
 
 # =======================
 # 4. Funções de Processamento dos Dados
 # =======================
-def process_data_year_mode(df, anos_interesse):
-    """Processa os dados para o modo 'Ano' ou 'Selecione data'."""
-    df = df.copy()
-    df['CADASTRO'] = pd.to_datetime(df['CADASTRO'])
-    df['CADASTRO'] = df['CADASTRO'].dt.to_period('M')
-    df.drop_duplicates(keep='first', inplace=True)
-    drop_cols = ['CRIADO_POR', 'ALTERADO', 'ALTERADO_POR']
-    df.drop(columns=[c for c in drop_cols if c in df.columns], inplace=True, errors='ignore')
-
-    df_final = df.groupby(['CADASTRO'], as_index=False).agg({
-         'VALOR_TOTAL': 'sum',
-         'COMBUSTIVEL_1_LITROS': 'sum',
-         'COMBUSTIVEL_2_LITROS': 'sum'
-    })
-    df_final['COMBUSTIVEL_1_LITROS'] = df_final['COMBUSTIVEL_1_LITROS'].fillna(0).infer_objects()
-    df_final['COMBUSTIVEL_2_LITROS'] = df_final['COMBUSTIVEL_2_LITROS'].fillna(0).infer_objects()
-    df_final['TOTAL_COMBUSTIVEL'] = df_final['COMBUSTIVEL_1_LITROS'] + df_final['COMBUSTIVEL_2_LITROS']
-    df_final['CADASTRO'] = df_final['CADASTRO'].dt.to_timestamp()
-    df_final['ANO'] = df_final['CADASTRO'].dt.year
-    df_final['MES'] = df_final['CADASTRO'].dt.month
-    df_final = df_final[df_final['ANO'].isin(anos_interesse)]
-    return df_final
-
 def process_data_month_mode(df, anos_interesse):
     """Processa os dados para o modo 'Mês'."""
     df = df.copy()
@@ -162,38 +151,6 @@ def generate_yearly_value_chart(df):
     fig.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
     return fig
 
-def generate_yearly_value_table(df, anos_interesse):
-    """Gera tabela pivot para o Valor Total com Total Ano, YTD e variação percentual."""
-    df_pivot = df.pivot_table(
-        index='ANO',
-        columns='MES',
-        values='VALOR_TOTAL',
-        aggfunc='sum'
-    ).fillna(0)
-    meses_map = {i: calendar.month_name[i] for i in range(1, 13)}
-    df_pivot.rename(columns=meses_map, inplace=True)
-    df_pivot['Total Ano'] = df_pivot.sum(axis=1)
-    ultimo_mes = df['MES'].max()
-    colunas_ytd = [meses_map[m] for m in range(1, ultimo_mes + 1) if m in meses_map]
-    df_pivot['YTD'] = df_pivot[colunas_ytd].sum(axis=1)
-    ordem = list(meses_map.values()) + ['Total Ano', 'YTD']
-    df_pivot = df_pivot[[c for c in ordem if c in df_pivot.columns]]
-    
-    df_final = df_pivot.copy()
-    anos_existentes = sorted(df_final.index)
-    for i in range(1, len(anos_existentes)):
-        ano_atual = anos_existentes[i]
-        ano_ant = anos_existentes[i - 1]
-        rotulo = f"Var% {ano_atual}x{ano_ant}"
-        diff = df_final.loc[ano_atual] - df_final.loc[ano_ant]
-        perc = (diff / df_final.loc[ano_ant].replace(0, np.nan)) * 100
-        df_final.loc[rotulo] = perc
-
-    # Converter índice e colunas para string
-    df_final.index = df_final.index.map(str)
-    df_final.columns = df_final.columns.map(str)
-    return df_final.round(2)
-
 def generate_yearly_combustible_chart(df):
     """Gera gráfico de barras comparando o Total Combustível por mês e por ano."""
     df_pivot = df.pivot_table(
@@ -228,34 +185,7 @@ def generate_yearly_combustible_chart(df):
 
 def generate_yearly_combustible_table(df, anos_interesse):
     """Gera tabela pivot para o Total Combustível com Total Ano, YTD e variação percentual."""
-    df_pivot = df.pivot_table(
-        index='ANO',
-        columns='MES',
-        values='TOTAL_COMBUSTIVEL',
-        aggfunc='sum'
-    ).fillna(0)
-    meses_map = {i: calendar.month_name[i] for i in range(1, 13)}
-    df_pivot.rename(columns=meses_map, inplace=True)
-    df_pivot['Total Ano'] = df_pivot.sum(axis=1)
-    ultimo_mes = df['MES'].max()
-    colunas_ytd = [meses_map[m] for m in range(1, ultimo_mes + 1) if m in meses_map]
-    df_pivot['YTD'] = df_pivot[colunas_ytd].sum(axis=1)
-    ordem = list(meses_map.values()) + ['Total Ano', 'YTD']
-    df_pivot = df_pivot[[c for c in ordem if c in df_pivot.columns]]
-    
-    df_final = df_pivot.copy()
-    anos_existentes = sorted(df_final.index)
-    for i in range(1, len(anos_existentes)):
-        ano_atual = anos_existentes[i]
-        ano_ant = anos_existentes[i - 1]
-        rotulo = f"Var% {ano_atual}x{ano_ant}"
-        diff = df_final.loc[ano_atual] - df_final.loc[ano_ant]
-        perc = (diff / df_final.loc[ano_ant].replace(0, np.nan)) * 100
-        df_final.loc[rotulo] = perc
-
-    df_final.index = df_final.index.map(str)
-    df_final.columns = df_final.columns.map(str)
-    return df_final.round(2)
+    return comparativo_anual(df, 'MES', 'TOTAL_COMBUSTIVEL', rotulos=NOMES_MESES, ytd_ate=df['MES'].max())
 
 # =======================
 # 6. Funções de Visualização para Modo "Mês"
@@ -308,55 +238,24 @@ def generate_weekly_combustible_chart(df_mes, mes_selecionado):
 
 def generate_weekly_value_table(df_mes):
     """Gera tabela comparativa semanal para o Valor Total."""
-    df_mes = df_mes.copy()
-    df_mes['SEMANA'] = df_mes['CADASTRO'].apply(obter_semanas_do_mes)
-    df_pivot = df_mes.pivot_table(
-        index='ANO',
-        columns='SEMANA',
-        values='VALOR_TOTAL',
-        aggfunc='sum'
-    ).fillna(0)
-    df_pivot['Total Mês'] = df_pivot.sum(axis=1)
-    
-    df_final = df_pivot.copy()
-    anos_existentes = sorted(df_final.index)
-    for i in range(1, len(anos_existentes)):
-        ano_atual = anos_existentes[i]
-        ano_ant = anos_existentes[i - 1]
-        rotulo = f"Var% {ano_atual}x{ano_ant}"
-        diff = df_final.loc[ano_atual] - df_final.loc[ano_ant]
-        perc = (diff / df_final.loc[ano_ant].replace(0, np.nan)) * 100
-        df_final.loc[rotulo] = perc
-
-    df_final.index = df_final.index.map(str)
-    df_final.columns = df_final.columns.map(str)
-    return df_final.round(2)
+    df_mes = df_mes.assign(SEMANA=df_mes['CADASTRO'].apply(obter_semanas_do_mes))
+    return comparativo_anual(df_mes, 'SEMANA', 'VALOR_TOTAL', total='Total Mês')
 
 def generate_weekly_combustible_table(df_mes):
     """Gera tabela comparativa semanal para o Total Combustível."""
-    df_mes = df_mes.copy()
-    df_mes['SEMANA'] = df_mes['CADASTRO'].apply(obter_semanas_do_mes)
-    df_pivot = df_mes.pivot_table(
-        index='ANO',
-        columns='SEMANA',
-        values='TOTAL_COMBUSTIVEL',
-        aggfunc='sum'
-    ).fillna(0)
-    df_pivot['Total Mês'] = df_pivot.sum(axis=1)
-    
-    df_final = df_pivot.copy()
-    anos_existentes = sorted(df_final.index)
-    for i in range(1, len(anos_existentes)):
-        ano_atual = anos_existentes[i]
-        ano_ant = anos_existentes[i - 1]
-        rotulo = f"Var% {ano_atual}x{ano_ant}"
-        diff = df_final.loc[ano_atual] - df_final.loc[ano_ant]
-        perc = (diff / df_final.loc[ano_ant].replace(0, np.nan)) * 100
-        df_final.loc[rotulo] = perc
+    df_mes = df_mes.assign(SEMANA=df_mes['CADASTRO'].apply(obter_semanas_do_mes))
+    return comparativo_anual(df_mes, 'SEMANA', 'TOTAL_COMBUSTIVEL', total='Total Mês')
 
-    df_final.index = df_final.index.map(str)
-    df_final.columns = df_final.columns.map(str)
-    return df_final.round(2)
+def generate_store_comparison_table(df, anos_interesse, loja_dict):
+    """Valor total e litros por loja e ano, num único agrupamento dos dados brutos."""
+    df = df.drop_duplicates()
+    anos = pd.to_datetime(df['CADASTRO']).dt.year
+    df = df.assign(ANO=anos, LITROS=df['COMBUSTIVEL_1_LITROS'].fillna(0) + df['COMBUSTIVEL_2_LITROS'].fillna(0))
+    df = df[df['ANO'].isin(anos_interesse)]
+    tabela = df.pivot_table(index='LOJA', columns='ANO', values=['VALOR_TOTAL', 'LITROS'], aggfunc='sum', fill_value=0)
+    tabela.index = tabela.index.map(lambda loja: loja_dict.get(loja, loja))
+    tabela.columns = [f"{'Valor' if medida == 'VALOR_TOTAL' else 'Litros'} {ano}" for medida, ano in tabela.columns]
+    return tabela.round(2)
 
 # =======================
 # 7. Execução Principal
@@ -372,12 +271,7 @@ def main():
     
     st.sidebar.write("## Selecione os parâmetros")
 
-    loja_selecionada = st.sidebar.selectbox(
-        "Selecione a loja",
-        options=list(loja_dict.keys()),
-        format_func=lambda x: loja_dict[x],
-        key="select_loja"
-    )
+    lojas_selecionadas = selecionar_lojas(loja_dict, key="select_lojas")
     
     navegacao = st.sidebar.radio(
         "Navegação", 
@@ -403,8 +297,7 @@ def main():
         fim = datetime(max(anos_interesse), 12, 31)
     
     # Execução da query para obter os dados
-    query = gerar_query_dados(inicio, fim, loja_selecionada)
-    df_raw = executar_query(engine, query)
+    df_raw = executar_query(engine, lojas_selecionadas, inicio, fim)
     
     if df_raw.empty:
         st.error("Nenhum dado retornado da consulta.")
@@ -414,7 +307,7 @@ def main():
     if navegacao in ["Ano", "Selecione data"]:
         df_processado = process_data_year_mode(df_raw, anos_interesse)
         
-        st.title("Custo de combustivel - Modo Ano")
+        st.title(f"Custo de combustivel - Modo Ano - {descrever_lojas(lojas_selecionadas, loja_dict)}")
         
         fig_valor = generate_yearly_value_chart(df_processado)
         st.plotly_chart(fig_valor, use_container_width=True)
@@ -427,6 +320,11 @@ def main():
         
         df_tab_comb = generate_yearly_combustible_table(df_processado, anos_interesse)
         st.dataframe(df_tab_comb.style.format("{:,.2f}"))
+        
+        if len(lojas_selecionadas) > 1:
+            st.subheader("Comparação entre as lojas")
+            df_lojas_ano = generate_store_comparison_table(df_raw, anos_interesse, loja_dict)
+            st.dataframe(df_lojas_ano.style.format("{:,.2f}"))
     
     elif navegacao == "Mês":
         df_processado = process_data_month_mode(df_raw, anos_interesse)
@@ -436,7 +334,7 @@ def main():
         mes_numero = meses_dict[mes_selecionado]
         df_mes = df_processado[df_processado['MES'] == mes_numero].copy()
         
-        st.title(f"Custo de combustivel - Modo Mês: {mes_selecionado}")
+        st.title(f"Custo de combustivel - Modo Mês: {mes_selecionado} - {descrever_lojas(lojas_selecionadas, loja_dict)}")
         
         fig_semana_valor = generate_weekly_value_chart(df_mes, mes_selecionado)
         st.plotly_chart(fig_semana_valor, use_container_width=True)
@@ -451,4 +349,5 @@ def main():
         st.dataframe(df_weekly_comb.style.format("{:,.2f}"))
 
 if __name__ == "__main__":
-    main()
+    with medir_pagina("abastecimento_veic"):
+        main()
@@ -5,6 +5,8 @@ import pandas as pd
 import io
 import datetime
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core.metricas import requisicao_medida
 import warnings
 import streamlit as st
 
@@ -28,7 +30,7 @@ def buscar_dados_por_periodo(data_inicio: datetime.datetime, data_fim: datetime.
             "accept": "text/csv",
             "cobli-api-key": CHAVE_API
         }
-        resposta = requests.get(url, headers=cabecalhos)
+        resposta = requisicao_medida("cobli", "costs/report", "get", url, headers=cabecalhos)
         resposta.raise_for_status()
     except requests.RequestException as erro:
         st.error(f"Erro ao buscar dados na API COBLI: {erro}")
@@ -111,7 +113,7 @@ def concatenar_dados_com_banco(df_agrupado: pd.DataFrame) -> pd.DataFrame:
     query = "SELECT cv.LOJA, cv.PLACA FROM cadastros_veiculos_ultilizacao cv;"
     try:
         engine = criar_conexao()
-        df_banco = pd.read_sql_query(query, engine)
+        df_banco = DatabaseManager.read_sql(query, engine)
     except Exception as e:
         st.error(f"Erro ao conectar ao banco na função COBLI: {e}")
         return pd.DataFrame()
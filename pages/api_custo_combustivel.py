@@ -1,5 +1,6 @@
 import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
 import streamlit as st
 def criar_conexao():
     """
@@ -26,7 +27,7 @@ def consulta_custo_cobustivel(str_inicio,str_fim,engine):
         AND K.CADASTRO_LOJA IN (1,2,3,4,5,6,7,8,9,10,11,12,13)
     ORDER BY K.CADASTRO, K.LOJA;
     """
-    return pd.read_sql_query(query, engine)
+    return DatabaseManager.read_sql(query, engine)
 
 def preparar_dados(str_inicio,str_fim,):
     """
@@ -1,6 +1,8 @@
-import re
 import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.transformacoes import agregar_custo_frota
 import streamlit as st
 
 def criar_conexao():
@@ -30,15 +32,7 @@ def listar_placas(engine):
     Returns:
         pandas.DataFrame: DataFrame contendo as placas únicas encontradas.
     """
-    query = """
-    SELECT cv.PLACA 
-    FROM cadastros_veiculos AS cv
-    WHERE cv.TIPO IN ('MOTO','CARRO')
-    ORDER BY cv.CADASTRO_CODIGO;
-    """
-    lista_de_placas = pd.read_sql(query, engine)
-    placas = lista_de_placas.drop_duplicates()
-    return placas
+    return refdata.placas(engine, tipos=("MOTO", "CARRO"))
 
 
 def consulta_nfe_bd(inicio_str, fim_str):
@@ -109,7 +103,7 @@ def calc_pedidos(inicio_str, fim_str):
         if engine is None:
             return pd.DataFrame()
         query = consulta_pedidos_bd(inicio_str, fim_str)
-        df = pd.read_sql(query, engine)
+        df = DatabaseManager.read_sql(query, engine)
         if df.empty:
             st.warning("Nenhum dado encontrado para o intervalo de datas fornecido.")
             return df
@@ -120,36 +114,6 @@ def calc_pedidos(inicio_str, fim_str):
         return pd.DataFrame()
 
 
-def limpa_texto(placa):
-    """
-    Remove caracteres especiais e espaços, deixando apenas letras maiúsculas e números.
-
-    Args:
-        placa (str): Texto a ser limpo (geralmente uma placa de veículo).
-
-    Returns:
-        str: Texto normalizado contendo apenas letras e números maiúsculos.
-    """
-    return re.sub(r'[^A-Z0-9]', '', placa.upper())
-
-
-def extrair_placas(texto, placas_set):
-    """
-    Extrai placas presentes no texto comparando com um conjunto de placas normalizadas.
-
-    Args:
-        texto (str): Texto a ser analisado (ex: coluna OBS).
-        placas_set (set): Conjunto de placas já normalizadas.
-
-    Returns:
-        list: Lista de placas encontradas no texto.
-    """
-    if pd.isna(texto):
-        return []
-    texto_normalizado = limpa_texto(texto)
-    return [placa for placa in placas_set if placa in texto_normalizado]
-
-
 def custo_frota_loja(inicio_str, fim_str):
     """
     Calcula o custo total da frota por loja e mês, com base nas NFEs e pedidos que referenciam placas.
@@ -172,52 +136,15 @@ def custo_frota_loja(inicio_str, fim_str):
         
         # Consulta base NFE
         query = consulta_nfe_bd(inicio_str, fim_str)
-        custo_frota = pd.read_sql(query, engine)
+        custo_frota = DatabaseManager.read_sql(query, engine)
 
         if custo_frota.empty:
             st.warning("Nenhum dado encontrado para o intervalo de datas fornecido.")
             return custo_frota
         
-        custo_frota['EMISSAO'] = pd.to_datetime(custo_frota['EMISSAO']).dt.to_period('M')
-
-        # Carrega e normaliza as placas
         placas_df = listar_placas(engine)
-        placas_df['placa_normalizada'] = placas_df['PLACA'].apply(limpa_texto)
-        placas_set = set(placas_df['placa_normalizada'])
-
-        # Extrai placas das observações
-        custo_frota['placas_encontradas'] = custo_frota['OBS'].apply(lambda x: extrair_placas(str(x), placas_set))
-        custo_frota['cont_placa'] = custo_frota['placas_encontradas'].apply(len)
-
-        # Explode as placas por linha (1 linha por placa encontrada)
-        placas_explodidas = custo_frota.explode('placas_encontradas')
-
-        # Agrupa por LOJA, EMISSAO e placa
-        tabela_placas = (
-            placas_explodidas.dropna(subset=['placas_encontradas'])
-            .groupby(['LOJA', 'EMISSAO', 'placas_encontradas'], as_index=False)
-            .agg({'VALOR_TOTAL': 'sum'})
-            .rename(columns={'placas_encontradas': 'PLACA'})
-        )
-
-        # Junta os pedidos
         tabela_pedidos = calc_pedidos(inicio_str, fim_str)
-
-        # Junta com os dados por placa
-        tabela_agrupada = pd.merge(
-            tabela_placas, tabela_pedidos, on=['LOJA', 'EMISSAO'], how='outer'
-        )
-
-        tabela_agrupada['VALOR_TOTAL_x'] = tabela_agrupada['VALOR_TOTAL_x'].fillna(0)
-        tabela_agrupada['VALOR_TOTAL_y'] = tabela_agrupada['VALOR_TOTAL_y'].fillna(0)
-
-        tabela_agrupada['VALOR_TOTAL'] = tabela_agrupada['VALOR_TOTAL_x'] + tabela_agrupada['VALOR_TOTAL_y']
-
-        # Agrupa por loja e mês final
-        tabela_agrupada = tabela_agrupada.groupby(['LOJA', 'EMISSAO'], as_index=False)['VALOR_TOTAL'].sum()
-        tabela_agrupada['VALOR_TOTAL'] = tabela_agrupada['VALOR_TOTAL'].round(2)
-        
-        return tabela_agrupada
+        return agregar_custo_frota(custo_frota, placas_df, tabela_pedidos)
 
     except Exception as e:
         st.error(f"Erro ao processar custos da frota: {e}")
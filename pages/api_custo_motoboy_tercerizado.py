@@ -1,5 +1,6 @@
 import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
 import streamlit as st
 
 def criar_conexao():
@@ -31,7 +32,7 @@ def calc_custo_motobiy_tercerizado(inicio_str,fim_str):
             st.warning("Erro ao estabelecer conexão com banco de dados!.")
             return pd.DataFrame()
         query = query_motoboy_tercerizado(inicio_str, fim_str)
-        df = pd.read_sql(query, engine)
+        df = DatabaseManager.read_sql(query, engine)
         if df.empty:
             st.warning("Nenhum dado encontrado para o intervalo de datas fornecido.")
             return df
@@ -1,5 +1,6 @@
 import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
 import streamlit as st
 
 def criar_conexao():
@@ -41,7 +42,7 @@ def calcula_custo_pedagio(str_inicio,str_fim):
             GROUP BY LOJA_VEICULO, DATA_ULTILIZADA
             ORDER BY LOJA_VEICULO, DATA_ULTILIZADA;
     """
-    df = pd.read_sql(query, criar_conexao())
+    df = DatabaseManager.read_sql(query, criar_conexao())
     # converter Emissao para datetime e extrair o ano e mês
     df['DATA_ULTILIZACAO'] = pd.to_datetime(df['DATA_ULTILIZACAO']).dt.to_period('M')
 
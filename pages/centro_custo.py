@@ -5,6 +5,9 @@ import matplotlib.pyplot as plt
 import calendar
 from datetime import datetime, date, timedelta
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core.metricas import medir_pagina
+from core.formatacao import numero_br
 
 # Configuração do pandas para evitar downcasting silencioso
 pd.set_option('future.no_silent_downcasting', True)
@@ -31,7 +34,7 @@ def criar_conexao():
 def executar_query(engine, query):
     """Executa a query no banco de dados e retorna um DataFrame."""
     try:
-        return pd.read_sql(query, engine)
+        return DatabaseManager.read_sql(query, engine)
     except Exception as e:
         st.error(f"Erro ao executar a query: {e}")
         return pd.DataFrame()
@@ -239,9 +242,8 @@ def plot_total_geral_grafico(df_total: pd.DataFrame, titulo: str, y_label: str):
     ax.tick_params(axis='x', rotation=45)
 
     # Exibir valores acima das barras
-    for bar in bars:
+    for bar, texto_formatado in zip(bars, numero_br(valores, decimais=2)):
         altura = bar.get_height()
-        texto_formatado = f'{altura:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
         ax.text(bar.get_x() + bar.get_width() / 2, altura + altura * 0.01,
                 texto_formatado, ha='center', va='bottom', fontsize=14)
 
@@ -472,7 +474,8 @@ def main():
         exibir_total_geral(df_total_geral, "Total Anual", "Valor total do custo")
     
 if __name__ == "__main__":
-    main()
+    with medir_pagina("centro_custo"):
+        main()
 
 
 # Atualiza o codigo 
@@ -4,6 +4,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 from datetime import datetime, date, timedelta
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core.custos_frota import custos_frota_compras, custos_frota_por_compra
+from core.metricas import medir_pagina
 import calendar
 
 # Proteção de acesso
@@ -19,7 +22,7 @@ def obter_lojas_disponiveis(engine):
     """Obtém todas as lojas disponíveis com custos de FROTA"""
     from sqlalchemy import text
     query = "SELECT DISTINCT COMP_LOJA FROM comp_rate_ativ WHERE DSCR LIKE :frota_pattern ORDER BY COMP_LOJA"
-    result = pd.read_sql_query(text(query), engine, params={'frota_pattern': '%FROTA%'})
+    result = DatabaseManager.read_sql(text(query), engine, params={'frota_pattern': '%FROTA%'})
     return result['COMP_LOJA'].tolist()
 
 def obter_loja_dict(engine):
@@ -35,137 +38,71 @@ def criar_conexao():
     url = f"{config['dialect']}://{config['username']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url)
 
-def obter_entregas(engine, inicio_str, fim_str, tipo_entrega="TODAS", loja_dict=None):
-    """Obtém dados de entregas baseado no tipo selecionado."""
-    
-    if tipo_entrega == "ENTREGA PARA CLIENTES":
-        query = f"""
-        SELECT E.CADASTRO, E.LOJA, SUM(EI.ITEM) AS TOTAL_ENTREGAS
-        FROM expedicao_itens EI
-        LEFT JOIN expedicao E ON EI.EXPEDICAO_CODIGO = E.expedicao AND EI.EXPEDICAO_LOJA = E.LOJA
-        LEFT JOIN cadastros_enderecos CE ON EI.ENDERECO_ENTREGA_CODIGO = CE.ENDERECO_CODIGO AND EI.ENDERECO_ENTREGA_LOJA = CE.ENDERECO_LOJA
-        LEFT JOIN cadastros C ON CE.CADASTRO_CODIGO = C.CODIGO AND CE.CADASTRO_LOJA = C.LOJA
-        WHERE E.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}' AND C.NOME NOT LIKE '%%AUTO GERAL AUTO%%'
-        GROUP BY E.CADASTRO, E.LOJA
-        """
-    elif tipo_entrega == "ROTA":
-        query_todas = f"""
-        SELECT E.CADASTRO, E.LOJA, SUM(EI.ITEM) AS TOTAL_ENTREGAS
-        FROM expedicao_itens EI
-        LEFT JOIN expedicao E ON EI.EXPEDICAO_CODIGO = E.expedicao AND EI.EXPEDICAO_LOJA = E.LOJA
-        LEFT JOIN cadastros_enderecos CE ON EI.ENDERECO_ENTREGA_CODIGO = CE.ENDERECO_CODIGO AND EI.ENDERECO_ENTREGA_LOJA = CE.ENDERECO_LOJA
-        LEFT JOIN cadastros C ON CE.CADASTRO_CODIGO = C.CODIGO AND CE.CADASTRO_LOJA = C.LOJA
-        WHERE E.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
-        GROUP BY E.CADASTRO, E.LOJA
-        """
-        
-        query_clientes = f"""
-        SELECT E.CADASTRO, E.LOJA, SUM(EI.ITEM) AS TOTAL_ENTREGAS
-        FROM expedicao_itens EI
-        LEFT JOIN expedicao E ON EI.EXPEDICAO_CODIGO = E.expedicao AND EI.EXPEDICAO_LOJA = E.LOJA
-        LEFT JOIN cadastros_enderecos CE ON EI.ENDERECO_ENTREGA_CODIGO = CE.ENDERECO_CODIGO AND EI.ENDERECO_ENTREGA_LOJA = CE.ENDERECO_LOJA
-        LEFT JOIN cadastros C ON CE.CADASTRO_CODIGO = C.CODIGO AND CE.CADASTRO_LOJA = C.LOJA
-        WHERE E.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}' AND C.NOME NOT LIKE '%%AUTO GERAL AUTO%%'
-        GROUP BY E.CADASTRO, E.LOJA
-        """
-        
-        try:
-            df_todas = pd.read_sql(query_todas, engine)
-            df_clientes = pd.read_sql(query_clientes, engine)
-            
-            if not df_todas.empty and not df_clientes.empty:
-                df_merged = df_todas.merge(df_clientes, on=['CADASTRO', 'LOJA'], suffixes=('_todas', '_clientes'))
-                df_merged['TOTAL_ENTREGAS'] = df_merged['TOTAL_ENTREGAS_todas'] - df_merged['TOTAL_ENTREGAS_clientes']
-                df = df_merged[['CADASTRO', 'LOJA', 'TOTAL_ENTREGAS']].copy()
-                df["DATA"] = pd.to_datetime(df["CADASTRO"]).dt.date
-                if loja_dict:
-                    df['LOJA_NOME'] = df['LOJA'].map(loja_dict)
-                return df
-            else:
-                return pd.DataFrame()
-        except Exception as e:
-            st.error(f"Erro ao obter entregas ROTA: {e}")
-            return pd.DataFrame()
-    
-    else:  # TODAS ENTREGAS
-        query = f"""
-        SELECT E.CADASTRO, E.LOJA, SUM(EI.ITEM) AS TOTAL_ENTREGAS
-        FROM expedicao_itens EI
-        LEFT JOIN expedicao E ON EI.EXPEDICAO_CODIGO = E.expedicao AND EI.EXPEDICAO_LOJA = E.LOJA
-        LEFT JOIN cadastros_enderecos CE ON EI.ENDERECO_ENTREGA_CODIGO = CE.ENDERECO_CODIGO AND EI.ENDERECO_ENTREGA_LOJA = CE.ENDERECO_LOJA
-        LEFT JOIN cadastros C ON CE.CADASTRO_CODIGO = C.CODIGO AND CE.CADASTRO_LOJA = C.LOJA
-        WHERE E.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
-        GROUP BY E.CADASTRO, E.LOJA
-        """
-    
+# Tipo de entrega -> coluna do fato de entregas por loja
+COLUNAS_TIPO_ENTREGA = {"TODAS ENTREGAS": "TODAS", "ENTREGA PARA CLIENTES": "CLIENTES", "ROTA": "ROTA"}
+
+def consultar_entregas_por_loja(engine, inicio_str, fim_str):
+    """Entregas por loja dos três tipos em uma única leitura (agregação condicional)."""
+    query = f"""
+    SELECT E.LOJA,
+           SUM(EI.ITEM) AS TODAS,
+           SUM(CASE WHEN C.NOME NOT LIKE '%%AUTO GERAL AUTO%%' THEN EI.ITEM ELSE 0 END) AS CLIENTES
+    FROM expedicao_itens EI
+    LEFT JOIN expedicao E ON EI.EXPEDICAO_CODIGO = E.expedicao AND EI.EXPEDICAO_LOJA = E.LOJA
+    LEFT JOIN cadastros_enderecos CE ON EI.ENDERECO_ENTREGA_CODIGO = CE.ENDERECO_CODIGO AND EI.ENDERECO_ENTREGA_LOJA = CE.ENDERECO_LOJA
+    LEFT JOIN cadastros C ON CE.CADASTRO_CODIGO = C.CODIGO AND CE.CADASTRO_LOJA = C.LOJA
+    WHERE E.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
+    GROUP BY E.LOJA
+    """
     try:
-        df = pd.read_sql(query, engine)
+        df = DatabaseManager.read_sql(query, engine, nome="entregas_por_tipo")
         if not df.empty:
-            df["DATA"] = pd.to_datetime(df["CADASTRO"]).dt.date
-            if loja_dict:
-                df['LOJA_NOME'] = df['LOJA'].map(loja_dict)
+            df[['TODAS', 'CLIENTES']] = df[['TODAS', 'CLIENTES']].astype(float)
+            # ROTA: entregas que não são para clientes (TODAS - CLIENTES)
+            df['ROTA'] = df['TODAS'] - df['CLIENTES']
         return df
     except Exception as e:
         st.error(f"Erro ao obter entregas: {e}")
         return pd.DataFrame()
 
+def obter_entregas(df_entregas_loja, tipo_entrega="TODAS ENTREGAS", loja_dict=None):
+    """Entregas por loja do tipo selecionado, a partir do fato de entregas por loja."""
+    if df_entregas_loja.empty:
+        return pd.DataFrame()
+    df = df_entregas_loja[['LOJA']].copy()
+    df['TOTAL_ENTREGAS'] = df_entregas_loja[COLUNAS_TIPO_ENTREGA.get(tipo_entrega, 'TODAS')]
+    if loja_dict:
+        df['LOJA_NOME'] = df['LOJA'].map(loja_dict)
+    return df
+
 def consulta_custos_totais(data_inicio, data_fim, engine, lojas_selecionadas=None, descricoes_selecionadas=None):
     """Consulta custos totais entre datas com filtros - apenas custos de FROTA"""
-    where_conditions = [
-        f"a.CADASTRO BETWEEN '{data_inicio}' AND '{data_fim}'"
-    ]
-    
-    # Adicionar filtro FROTA usando text() para escape adequado
-    from sqlalchemy import text
-    
-    if lojas_selecionadas:
-        lojas_str = ','.join(map(str, lojas_selecionadas))
-        where_conditions.append(f"c.COMP_LOJA IN ({lojas_str})")
-    
-    if descricoes_selecionadas:
-        descricoes_str = "','".join(descricoes_selecionadas)
-        where_conditions.append(f"c.DSCR IN ('{descricoes_str}')")
-    
-    query = f"""
-    SELECT
-        c.COMP_LOJA AS LOJA,
-        c.COMP_CODI AS COMPRA,
-        c.CADA_ATIV_ID AS CADASTRO_VEICULO,
-        c.VALR_RATE AS VALOR_UNITARIO_CUSTO,
-        (c.VALR_RATE / a.VALOR_TOTAL_NOTA) AS PERC,
-        c.DSCR AS DESCRICAO,
-        a.CADASTRO,
-        a.VALOR_TOTAL_NOTA
-    FROM comp_rate_ativ c
-    LEFT JOIN compras_dbf a ON c.COMP_CODI = a.COMPRA
-    AND c.COMP_LOJA = a.LOJA
-    WHERE {' AND '.join(where_conditions)} AND c.DSCR LIKE :frota_pattern
-    ORDER BY a.CADASTRO, c.COMP_LOJA
-    """
-    
-    return pd.read_sql_query(text(query), engine, params={'frota_pattern': '%FROTA%'})
+    df = custos_frota_compras(engine, data_inicio, data_fim)
+    return custos_frota_por_compra(df, lojas_selecionadas, descricoes_selecionadas)
 
-def obter_custos_por_tipo(engine, inicio_str, fim_str, tipo_entrega, loja_dict=None):
-    """Obtém custos baseado no tipo de entrega"""
+def obter_custos(engine, inicio_str, fim_str, loja_dict=None):
+    """Custos de FROTA por loja no período (os mesmos para todos os tipos de entrega)"""
     try:
         df_custos = consulta_custos_totais(inicio_str, fim_str, engine)
         if df_custos.empty:
             return pd.DataFrame()
         
-        # Processar dados
-        df_custos['CADASTRO'] = pd.to_datetime(df_custos['CADASTRO'])
-        df_custos['DATA'] = df_custos['CADASTRO'].dt.date
         if loja_dict:
             df_custos['LOJA_NOME'] = df_custos['LOJA'].map(loja_dict)
         
         # Agrupar por loja
-        resumo_custos = df_custos.groupby(['LOJA', 'LOJA_NOME'])['VALOR_UNITARIO_CUSTO'].sum().reset_index()
-        resumo_custos['TIPO_ENTREGA'] = tipo_entrega
-        
-        return resumo_custos
+        return df_custos.groupby(['LOJA', 'LOJA_NOME'])['VALOR_UNITARIO_CUSTO'].sum().reset_index()
     except Exception as e:
-        st.error(f"Erro ao obter custos {tipo_entrega}: {e}")
+        st.error(f"Erro ao obter custos: {e}")
+        return pd.DataFrame()
+
+def obter_custos_por_tipo(resumo_custos, tipo_entrega):
+    """Custos por loja marcados com o tipo de entrega"""
+    if resumo_custos.empty:
         return pd.DataFrame()
+    resumo = resumo_custos.copy()
+    resumo['TIPO_ENTREGA'] = tipo_entrega
+    return resumo
 
 # -----------------------
 # Visualização
@@ -285,6 +222,9 @@ def main():
         with st.spinner("Carregando dados..."):
             engine = criar_conexao()
             loja_dict = obter_loja_dict(engine)
+            # Uma leitura de entregas e uma de custos servem todos os tipos
+            df_entregas_loja = consultar_entregas_por_loja(engine, inicio_str, fim_str)
+            resumo_custos = obter_custos(engine, inicio_str, fim_str, loja_dict)
             
             if tipo_entrega == "TODOS OS TIPOS":
                 # Processar todos os tipos
@@ -292,8 +232,8 @@ def main():
                 dados_todos = []
                 
                 for tipo in tipos:
-                    df_custos = obter_custos_por_tipo(engine, inicio_str, fim_str, tipo, loja_dict)
-                    df_entregas = obter_entregas(engine, inicio_str, fim_str, tipo, loja_dict)
+                    df_custos = obter_custos_por_tipo(resumo_custos, tipo)
+                    df_entregas = obter_entregas(df_entregas_loja, tipo, loja_dict)
                     
                     if not df_custos.empty and not df_entregas.empty:
                         df_resultado = calcular_custo_por_entrega(df_custos, df_entregas)
@@ -351,8 +291,8 @@ def main():
             
             else:
                 # Processar tipo específico
-                df_custos = obter_custos_por_tipo(engine, inicio_str, fim_str, tipo_entrega, loja_dict)
-                df_entregas = obter_entregas(engine, inicio_str, fim_str, tipo_entrega, loja_dict)
+                df_custos = obter_custos_por_tipo(resumo_custos, tipo_entrega)
+                df_entregas = obter_entregas(df_entregas_loja, tipo_entrega, loja_dict)
                 
                 if df_custos.empty or df_entregas.empty:
                     st.error("❌ Nenhum dado encontrado")
@@ -420,4 +360,5 @@ def main():
     """)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("custo_entrega"):
+        main()
\ No newline at end of file
@@ -1,8 +1,16 @@
 import pandas as pd
+import numpy as np
 from sqlalchemy import create_engine, text
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from core.cache import guardar_na_sessao
+from core.custos_frota import custos_frota, rateio, rateio_frota_mensal, detalhe
+from core.db import DatabaseManager
+from core.formatacao import moeda_br, numero_br
+from core.kpi import totais
+from core.metricas import medir_pagina
+from core.transformacoes import consolidar_custos_entrega
 
 # Proteção de acesso
 if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
@@ -43,60 +51,15 @@ def gerar_dataframes_custos(data_inicio='2025-03-01 00:00:00', data_fim='2025-06
         AND C.PAGO_EM BETWEEN :data_inicio AND :data_fim;
         """
         
-        df_custos_raw = pd.read_sql(text(query_custos), engine_autogeral, params=params)
-        df_custos_raw['VALOR'] = pd.to_numeric(df_custos_raw['VALOR'], errors='coerce')
+        df_custos_raw = DatabaseManager.read_sql(text(query_custos), engine_autogeral, params=params, compactar=True)
         
         df_custo_entregadores = df_custos_raw.groupby(['LOJA', 'PAGO_EM'])['VALOR'].sum().round(2).reset_index()
         df_custo_entregadores = df_custo_entregadores.rename(columns={'VALOR': 'custo_entregadores'})
         df_custo_entregadores['PERIODO'] = pd.to_datetime(df_custo_entregadores['PAGO_EM'], format='%Y-%m-%d %H:%M:%S').dt.to_period('M')
         
-        # QUERY 2: Custos de Frota
-        query_rate = """
-        select
-            distinct
-            cvu.LOJA as LOJA,
-            c.COMP_CODI as COMPRA,
-            c.CADA_ATIV_ID as CADASTRO_VEICULO,
-            cv.PLACA,
-            c.cada_ativ_id as CADA_ATIV_ID,
-            c.VALR_RATE as VALOR_UNITARIO_CUSTO,
-            (c.VALR_RATE / a.VALOR_TOTAL_NOTA) as PERC,
-            c.DSCR as DESCRICAO,
-            a.CADASTRO,
-            a.VALOR_TOTAL_NOTA
-        from
-            comp_rate_ativ c
-        left join compras_dbf a on
-            c.COMP_CODI = a.COMPRA
-            and c.COMP_LOJA = a.LOJA
-        left join cadastros_ativos ca on
-                    c.CADA_ATIV_ID = ca.CADA_ATIV_ID
-        left join cadastros_veiculos cv on
-            ca.CADA_VEIC_ID = cv.CADA_VEIC_ID
-        left join cadastros_veiculos_ultilizacao cvu on
-            ca.CADA_VEIC_ID = cvu.CADA_VEIC_ID
-        where
-            a.CADASTRO between :data_inicio and :data_fim
-        order by
-            a.CADASTRO,
-            c.COMP_LOJA;
-        """
-        
-        df_rate_raw = pd.read_sql(text(query_rate), engine_autogeral, params=params)
-        df_rate_raw['CADASTRO'] = pd.to_datetime(df_rate_raw['CADASTRO'], format='%Y-%m-%d %H:%M:%S')
-        df_rate_raw['VALOR_UNITARIO_CUSTO'] = pd.to_numeric(df_rate_raw['VALOR_UNITARIO_CUSTO'], errors='coerce')
-        df_rate_raw['VALOR_TOTAL_NOTA'] = pd.to_numeric(df_rate_raw['VALOR_TOTAL_NOTA'], errors='coerce')
-        
-        df_frota = df_rate_raw[df_rate_raw['DESCRICAO'].str.contains('FROTA', case=False, na=False)]
-        
-        df_rate = df_frota.groupby([
-            'LOJA',
-            pd.Grouper(key='CADASTRO', freq='ME'),
-            'DESCRICAO'
-        ])['VALOR_UNITARIO_CUSTO'].sum().round(2).reset_index()
-        
-        df_rate = df_rate.rename(columns={'VALOR_UNITARIO_CUSTO': 'VALOR_CUSTO_LOJA'})
-        df_rate['PERIODO'] = df_rate['CADASTRO'].dt.to_period('M')
+        # QUERY 2: Custos de Frota (join de rateio lido uma vez por período, compartilhado com a QUERY 4)
+        df_custos_frota = custos_frota(engine_autogeral, data_inicio, data_fim)
+        df_rate = rateio_frota_mensal(rateio(df_custos_frota))
         
         # QUERY 3: Quantidade de EXPEDICAO 
         query_romaneios = """
@@ -130,7 +93,7 @@ def gerar_dataframes_custos(data_inicio='2025-03-01 00:00:00', data_fim='2025-06
             E.LOJA;
         """
 
-        df_romaneios_raw = pd.read_sql(text(query_romaneios), engine_autogeral, params=params)
+        df_romaneios_raw = DatabaseManager.read_sql(text(query_romaneios), engine_autogeral, params=params)
 
         # Converter PERIODO para period
         df_romaneios_raw['PERIODO'] = pd.to_datetime(df_romaneios_raw['PERIODO'], format='%m/%Y').dt.to_period('M')
@@ -138,28 +101,8 @@ def gerar_dataframes_custos(data_inicio='2025-03-01 00:00:00', data_fim='2025-06
         # Apenas renomear 
         df_ROMANEIO = df_romaneios_raw.rename(columns={'EXPEDICAO_CODIGO': 'total_expedicoes'})
         
-        # QUERY 4: Detalhes dos Centro de Custo
-        query_comp_rate = """
-            SELECT DISTINCT
-                cvu.LOJA AS LOJA,
-                c.COMP_CODI AS COMPRA,
-                c.COMP_LOJA,
-                c.CADA_ATIV_ID AS CADASTRO_VEICULO,
-                cv.PLACA,
-                c.VALR_RATE AS VALOR_UNITARIO_CUSTO,
-                c.DSCR AS DESCRICAO,
-                a.CADASTRO,
-                a.VALOR_TOTAL_NOTA
-            FROM comp_rate_ativ c
-            LEFT JOIN compras_dbf a ON c.COMP_CODI = a.COMPRA AND c.COMP_LOJA = a.LOJA
-            LEFT JOIN cadastros_ativos ca ON c.CADA_ATIV_ID = ca.CADA_ATIV_ID 
-            LEFT JOIN cadastros_veiculos cv ON ca.CADA_VEIC_ID = cv.CADA_VEIC_ID
-            LEFT JOIN cadastros_veiculos_ultilizacao cvu ON ca.CADA_VEIC_ID = cvu.CADA_VEIC_ID
-            WHERE a.CADASTRO BETWEEN :data_inicio AND :data_fim
-            ORDER BY a.CADASTRO, c.COMP_LOJA
-        """
-        
-        df_comp_rate_ativ = pd.read_sql(text(query_comp_rate), engine_autogeral, params=params)
+        # QUERY 4: Detalhes dos Centro de Custo (mesmo conjunto da QUERY 2)
+        df_comp_rate_ativ = detalhe(df_custos_frota)
         
         engine_autogeral.dispose()
         return df_custo_entregadores, df_rate, df_ROMANEIO, df_comp_rate_ativ
@@ -169,51 +112,6 @@ def gerar_dataframes_custos(data_inicio='2025-03-01 00:00:00', data_fim='2025-06
         engine_autogeral.dispose()
         return None, None, None, None
 
-def format_br_currency(value):
-    """Formata valor para padrão brasileiro R$"""
-    return f"R$ {value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-
-def format_number_br(value):
-    """Formata número para padrão brasileiro com ponto e vírgula"""
-    if isinstance(value, (int, float)):
-        if value != int(value):
-            return f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-        else:
-            return f"{int(value):,}".replace(',', '.')
-    return str(value)
-
-def consolidar_custos_entrega(df_custo_entregadores, df_rate, df_ROMANEIO, data_inicio=None, data_fim=None):
-    """Consolida os 3 dataframes e calcula custo por entrega"""
-    
-    df_rate_grouped = df_rate.groupby(['LOJA', 'PERIODO'])['VALOR_CUSTO_LOJA'].sum().reset_index()
-    df_custos_grouped = df_custo_entregadores.groupby(['LOJA', 'PERIODO'])['custo_entregadores'].sum().reset_index()
-    
-    df_merged = pd.merge(df_custos_grouped, df_ROMANEIO, on=['LOJA', 'PERIODO'], how='outer')
-    df_consolidado = pd.merge(df_merged, df_rate_grouped, on=['LOJA', 'PERIODO'], how='outer')
-    
-    df_consolidado = df_consolidado.fillna(0)
-    
-    # Filtrar por período
-    if data_inicio and data_fim:
-        periodo_inicio = pd.Period(data_inicio, freq='M')
-        periodo_fim = pd.Period(data_fim, freq='M')
-        df_consolidado = df_consolidado[
-            (df_consolidado['PERIODO'] >= periodo_inicio) & 
-            (df_consolidado['PERIODO'] <= periodo_fim)
-        ]
-    
-    df_consolidado['custo_total'] = (df_consolidado['custo_entregadores'] + 
-                                   df_consolidado['VALOR_CUSTO_LOJA']).round(2)
-    
-    df_consolidado['custo_por_entrega'] = df_consolidado.apply(
-        lambda row: round(row['custo_total'] / row['total_expedicoes'], 2) 
-        if row['total_expedicoes'] > 0 else row['custo_total'], axis=1
-    )
-    
-    df_consolidado['PERIODO_STR'] = df_consolidado['PERIODO'].astype(str)
-    
-    return df_consolidado
-
 def filtrar_por_lojas(df, lojas_selecionadas):
     """Filtra dataframe pelas lojas selecionadas"""
     if 'Todas' in lojas_selecionadas or not lojas_selecionadas:
@@ -323,12 +221,12 @@ def main():
             
             if df_custo is not None:
                 # CORREÇÃO: Passar data_inicio e data_fim
-                st.session_state.df_consolidado = consolidar_custos_entrega(
+                guardar_na_sessao('df_consolidado', consolidar_custos_entrega(
                     df_custo, df_rate, df_romaneio,
                     data_inicio=data_inicio,
                     data_fim=data_fim
-                )
-                st.session_state.df_comp_rate_ativ = df_comp_rate_ativ
+                ))
+                guardar_na_sessao('df_comp_rate_ativ', df_comp_rate_ativ)
                 st.session_state.dados_atualizados = False
                 st.success(f"Dados carregados com sucesso! Período: {data_inicio} até {data_fim}")
             else:
@@ -346,6 +244,7 @@ def main():
         st.sidebar.warning("- Nenhum dado encontrado para o período selecionado")
     
     # KPIs principais
+    soma = totais(df, ['total_expedicoes', 'custo_total'])
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
@@ -353,29 +252,26 @@ def main():
         st.metric("Total de Lojas", total_lojas)
     
     with col2:
-        total_expedicoes = int(df['total_expedicoes'].sum())
-        st.metric("Total Expedições", f"{total_expedicoes:,.0f}".replace(',', '.'))
+        st.metric("Total Expedições", numero_br([soma['total_expedicoes']])[0])
     
     with col3:
-        custo_total = df['custo_total'].sum()
-        st.metric("Custo Total", format_br_currency(custo_total))
+        st.metric("Custo Total", moeda_br([soma['custo_total']])[0])
     
     with col4:
-        custo_mediano = df['custo_por_entrega'].median()
-        st.metric("Custo Mediano/Entrega", format_br_currency(custo_mediano))
+        st.metric("Custo Mediano/Entrega", moeda_br([df['custo_por_entrega'].median()])[0])
     
     st.markdown("---")
 
     # Tabelas primeiro - antes dos gráficos
     st.subheader("📋 Tabela Detalhada")
     
-    # Preparar tabela formatada
+    # Preparar tabela formatada (cada coluna formatada de uma vez)
     df_tabela = df.copy()
-    df_tabela['Custo Entregadores'] = df_tabela['custo_entregadores'].apply(format_br_currency)
-    df_tabela['Custo Frota'] = df_tabela['VALOR_CUSTO_LOJA'].apply(format_br_currency)
-    df_tabela['Custo Total'] = df_tabela['custo_total'].apply(format_br_currency)
-    df_tabela['Custo/Entrega'] = df_tabela['custo_por_entrega'].apply(format_br_currency)
-    df_tabela['Total Expedições'] = df_tabela['total_expedicoes'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
+    df_tabela['Custo Entregadores'] = moeda_br(df_tabela['custo_entregadores'])
+    df_tabela['Custo Frota'] = moeda_br(df_tabela['VALOR_CUSTO_LOJA'])
+    df_tabela['Custo Total'] = moeda_br(df_tabela['custo_total'])
+    df_tabela['Custo/Entrega'] = moeda_br(df_tabela['custo_por_entrega'])
+    df_tabela['Total Expedições'] = numero_br(df_tabela['total_expedicoes'])
     
     tabela_final = df_tabela[['LOJA', 'PERIODO_STR', 'Custo Entregadores', 'Custo Frota', 
                              'Total Expedições', 'Custo Total', 'Custo/Entrega']]
@@ -394,9 +290,9 @@ def main():
         'custo_por_entrega': 'mean'
     }).round(2)
     
-    stats_loja['custo_total_fmt'] = stats_loja['custo_total'].apply(format_br_currency)
-    stats_loja['custo_por_entrega_fmt'] = stats_loja['custo_por_entrega'].apply(format_br_currency)
-    stats_loja['total_expedicoes_fmt'] = stats_loja['total_expedicoes'].apply(lambda x: f"{int(x):,}".replace(',', '.'))
+    stats_loja['custo_total_fmt'] = moeda_br(stats_loja['custo_total'])
+    stats_loja['custo_por_entrega_fmt'] = moeda_br(stats_loja['custo_por_entrega'])
+    stats_loja['total_expedicoes_fmt'] = numero_br(stats_loja['total_expedicoes'])
     
     stats_final = stats_loja[['custo_total_fmt', 'total_expedicoes_fmt', 'custo_por_entrega_fmt']]
     stats_final.columns = ['Custo Total', 'Total Expedições', 'Custo Médio/Entrega']
@@ -438,12 +334,8 @@ def main():
     # Mostrar tabela filtrada
     if len(df_filtrado) > 0:
         df_exibir = df_filtrado.copy()
-        df_exibir['VALOR_UNITARIO_CUSTO'] = df_exibir['VALOR_UNITARIO_CUSTO'].apply(
-            lambda x: format_br_currency(x) if pd.notna(x) else 'N/A'
-        )
-        df_exibir['VALOR_TOTAL_NOTA'] = df_exibir['VALOR_TOTAL_NOTA'].apply(
-            lambda x: format_br_currency(x) if pd.notna(x) else 'N/A'
-        )
+        df_exibir['VALOR_UNITARIO_CUSTO'] = moeda_br(df_exibir['VALOR_UNITARIO_CUSTO'], nulo='N/A')
+        df_exibir['VALOR_TOTAL_NOTA'] = moeda_br(df_exibir['VALOR_TOTAL_NOTA'], nulo='N/A')
         
         colunas_exibir = {
             'LOJA': 'Loja',
@@ -474,28 +366,33 @@ def main():
     
     cores_alternadas = ['#1f4e79', '#87ceeb']
     
+    # Rótulos e cores das barras calculados uma vez para todas as lojas e meses
+    df_graficos = df.assign(
+        texto_custo_total=moeda_br(df['custo_total']),
+        texto_custo_por_entrega=moeda_br(df['custo_por_entrega']),
+        cor_barra=np.where(df.groupby('LOJA').cumcount() % 2 == 0, cores_alternadas[0], cores_alternadas[1])
+    )
+    graficos_por_loja = dict(tuple(df_graficos.groupby('LOJA')))
+    
     for i in range(0, len(lojas_ate_12), 2):
         cols = st.columns(2)
         
         for j, loja in enumerate(lojas_ate_12[i:i+2]):
-            df_loja = df[df['LOJA'] == loja].copy()
+            df_loja = graficos_por_loja.get(loja, df_graficos.iloc[:0])
             
             if len(df_loja) > 0:
                 with cols[j]:
-                    cores_barras = [cores_alternadas[idx % 2] for idx in range(len(df_loja))]
-                    
                     fig_loja = px.bar(
                         df_loja,
                         x='PERIODO_STR',
                         y='custo_total',
                         title=f"Loja {loja} - Custo Total",
-                        text='custo_total'
+                        text='texto_custo_total'
                     )
                     
                     fig_loja.update_traces(
-                        texttemplate=[f'R$ {format_number_br(val)}' for val in df_loja['custo_total']], 
                         textposition='outside',
-                        marker_color=cores_barras
+                        marker_color=df_loja['cor_barra']
                     )
                     
                     fig_loja.update_layout(
@@ -517,24 +414,21 @@ def main():
         cols = st.columns(2)
         
         for j, loja in enumerate(lojas_ate_12[i:i+2]):
-            df_loja = df[df['LOJA'] == loja].copy()
+            df_loja = graficos_por_loja.get(loja, df_graficos.iloc[:0])
             
             if len(df_loja) > 0:
                 with cols[j]:
-                    cores_barras = [cores_alternadas[idx % 2] for idx in range(len(df_loja))]
-                    
                     fig_loja_entrega = px.bar(
                         df_loja,
                         x='PERIODO_STR',
                         y='custo_por_entrega',
                         title=f"Loja {loja} - Custo por Entrega",
-                        text='custo_por_entrega'
+                        text='texto_custo_por_entrega'
                     )
                     
                     fig_loja_entrega.update_traces(
-                        texttemplate=[f'R$ {format_number_br(val)}' for val in df_loja['custo_por_entrega']], 
                         textposition='outside',
-                        marker_color=cores_barras
+                        marker_color=df_loja['cor_barra']
                     )
                     
                     fig_loja_entrega.update_layout(
@@ -553,7 +447,9 @@ def main():
     st.subheader("- Comparação: Custos Entregadores vs Frota")
     
     df_entregadores = df.groupby(['LOJA', 'PERIODO_STR'])['custo_entregadores'].sum().reset_index()
+    df_entregadores['texto'] = moeda_br(df_entregadores['custo_entregadores'])
     df_frota = df.groupby(['LOJA', 'PERIODO_STR'])['VALOR_CUSTO_LOJA'].sum().reset_index()
+    df_frota['texto'] = moeda_br(df_frota['VALOR_CUSTO_LOJA'])
     
     st.subheader("- Custos de Entregadores por Loja e Período")
     
@@ -563,14 +459,11 @@ def main():
         y='custo_entregadores',
         color='PERIODO_STR',
         title="Custos de Entregadores",
-        text='custo_entregadores',
+        text='texto',
         color_discrete_sequence=[cores_alternadas[i % 2] for i in range(len(df_entregadores['PERIODO_STR'].unique()))]
     )
     
-    fig_entregadores.update_traces(
-        texttemplate=[f'R$ {format_number_br(val)}' for val in df_entregadores['custo_entregadores']], 
-        textposition='outside'
-    )
+    fig_entregadores.update_traces(textposition='outside')
     fig_entregadores.update_layout(
         xaxis_title="Loja",
         yaxis_title="Custo Entregadores (R$)",
@@ -586,14 +479,11 @@ def main():
         y='VALOR_CUSTO_LOJA',
         color='PERIODO_STR',
         title="Custos de Frota",
-        text='VALOR_CUSTO_LOJA',
+        text='texto',
         color_discrete_sequence=[cores_alternadas[i % 2] for i in range(len(df_frota['PERIODO_STR'].unique()))]
     )
     
-    fig_frota.update_traces(
-        texttemplate=[f'R$ {format_number_br(val)}' for val in df_frota['VALOR_CUSTO_LOJA']], 
-        textposition='outside'
-    )
+    fig_frota.update_traces(textposition='outside')
     fig_frota.update_layout(
         xaxis_title="Loja",
         yaxis_title="Custo Frota (R$)",
@@ -602,4 +492,5 @@ def main():
     st.plotly_chart(fig_frota, width='stretch')
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("custo_entrega_entregadores"):
+        main()
\ No newline at end of file
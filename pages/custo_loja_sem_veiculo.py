@@ -1,5 +1,8 @@
-import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.metricas import medir_pagina
+from core.transformacoes import resumir_custos
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
@@ -15,15 +18,11 @@ def criar_conexao():
 
 def obter_centros_custo_disponiveis(engine):
     """Obtém todos os centros de custo disponíveis"""
-    query = "SELECT DISTINCT DESCRICAO FROM centros_custo ORDER BY DESCRICAO"
-    result = pd.read_sql_query(query, engine)
-    return result['DESCRICAO'].tolist()
+    return refdata.centros_custo(engine)
 
 def obter_lojas_disponiveis(engine):
     """Obtém todas as lojas disponíveis"""
-    query = "SELECT DISTINCT LOJA FROM despesas ORDER BY LOJA"
-    result = pd.read_sql_query(query, engine)
-    return result['LOJA'].tolist()
+    return refdata.codigos_lojas(engine)
 
 def consulta_custos_totais(data_inicio, data_fim, engine, lojas_selecionadas=None, descricoes_selecionadas=None):
     """Consulta custos totais entre datas com filtros - SEM DUPLICATAS"""
@@ -70,7 +69,7 @@ def consulta_custos_totais(data_inicio, data_fim, engine, lojas_selecionadas=Non
             AND {' AND '.join(where_conditions)}
         ORDER BY D.DATA, D.LOJA
     """
-    return pd.read_sql_query(query, engine)
+    return DatabaseManager.read_sql(query, engine)
 
 def processar_dados_custos(data_inicio, data_fim, lojas_selecionadas=None, descricoes_selecionadas=None):
     """Processa dados de custos totais - função reutilizável"""
@@ -79,51 +78,7 @@ def processar_dados_custos(data_inicio, data_fim, lojas_selecionadas=None, descr
     
     if df.empty:
         return None
-    
-    # Remove duplicatas no DataFrame
-    df = df.drop_duplicates(subset=['LOJA', 'DATA', 'VALOR'])
-    
-    # Converter data
-    df['DATA'] = pd.to_datetime(df['DATA'])
-    df['DATA_FORMATADA'] = df['DATA'].dt.date
-    df['MES_ANO'] = df['DATA'].dt.to_period('M')
-    
-    # Agrupamento por loja, data e descrição
-    resumo_agrupado = df.groupby(['LOJA', 'DATA_FORMATADA', 'CENTRO_CUSTO_DESCRICAO']).agg({
-        'VALOR': ['sum', 'mean', 'count']
-    }).reset_index()
-    
-    # Achatar colunas
-    resumo_agrupado.columns = ['LOJA', 'DATA', 'DESCRICAO', 'TOTAL', 'MEDIA', 'QUANTIDADE']
-    
-    # Resumos para análise
-    resumo_loja = df.groupby('LOJA')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
-    resumo_loja.columns = ['LOJA', 'TOTAL', 'MEDIA', 'QUANTIDADE']
-    
-    resumo_tempo = df.groupby('DATA_FORMATADA')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
-    resumo_tempo.columns = ['DATA', 'TOTAL', 'MEDIA', 'QUANTIDADE']
-    
-    resumo_mensal = df.groupby('MES_ANO')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
-    resumo_mensal['MES_ANO'] = resumo_mensal['MES_ANO'].astype(str)
-    resumo_mensal.columns = ['MES', 'TOTAL', 'MEDIA', 'QUANTIDADE']
-    
-    resumo_desc = df.groupby('CENTRO_CUSTO_DESCRICAO')['VALOR'].agg(['sum', 'mean', 'count']).reset_index()
-    resumo_desc.columns = ['DESCRICAO', 'TOTAL', 'MEDIA', 'QUANTIDADE']
-    
-    # Resumo por LOJA, MES e CÓDIGO
-    resumo_loja_mes_codigo = df.groupby(['LOJA', 'MES_ANO', 'CODIGO'])['VALOR'].agg(['sum', 'mean', 'median', 'count']).reset_index()
-    resumo_loja_mes_codigo['MES_ANO'] = resumo_loja_mes_codigo['MES_ANO'].astype(str)
-    resumo_loja_mes_codigo.columns = ['LOJA', 'MES', 'CODIGO', 'TOTAL', 'MEDIA', 'MEDIANA', 'QUANTIDADE']
-    
-    return {
-        'original': df,
-        'agrupado': resumo_agrupado,
-        'por_loja': resumo_loja,
-        'por_dia': resumo_tempo,
-        'por_mes': resumo_mensal,
-        'por_desc': resumo_desc,
-        'por_loja_mes_codigo': resumo_loja_mes_codigo
-    }
+    return resumir_custos(df)
 
 def gerar_grafico_custos(dados, tipo_grafico, tipo_analise):
     """Gera gráfico baseado nas seleções"""
@@ -392,4 +347,5 @@ def main():
         )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("custo_loja_sem_veiculo"):
+        main()
\ No newline at end of file
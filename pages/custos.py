@@ -1,5 +1,8 @@
 import pandas as pd
 from sqlalchemy import create_engine
+from core import refdata
+from core.custos_frota import custos_frota, custos_por_veiculo, custos_todas_lojas
+from core.metricas import medir_pagina
 from sqlalchemy.pool import NullPool
 import streamlit as st
 import plotly.express as px
@@ -25,91 +28,40 @@ def criar_conexao():
         pool_pre_ping=True
     )
 
-@st.cache_data(ttl=300)
-def obter_descricoes_disponiveis():
-    """Obtém todas as descrições disponíveis"""
+def obter_descricoes_disponiveis(data_inicio, data_fim):
+    """Descrições de rateio presentes no período (do mesmo join em cache que alimenta o relatório)"""
     engine = criar_conexao()
-    query = "SELECT DISTINCT DSCR FROM comp_rate_ativ ORDER BY DSCR"
     try:
-        result = pd.read_sql_query(query, engine)
-        return result['DSCR'].tolist()
+        df = custos_frota(engine, data_inicio, data_fim)
     finally:
         engine.dispose()
+    return sorted(df['DESCRICAO'].dropna().astype(str).unique().tolist())
 
-@st.cache_data(ttl=300)
 def obter_lojas_disponiveis():
     """Obtém todas as lojas disponíveis"""
     engine = criar_conexao()
-    query = "SELECT DISTINCT cvu.LOJA FROM cadastros_veiculos_ultilizacao cvu ORDER BY cvu.LOJA"
     try:
-        result = pd.read_sql_query(query, engine)
-        return result['LOJA'].tolist()
+        return refdata.lojas_com_veiculos(engine)
     finally:
         engine.dispose()
 
 def consulta_custos_totais(data_inicio, data_fim, lojas_selecionadas=None, descricoes_selecionadas=None):
     """Consulta custos totais entre datas com filtros"""
-    where_conditions = [f"a.CADASTRO BETWEEN '{data_inicio}' AND '{data_fim}'"]
-    
-    if lojas_selecionadas:
-        lojas_str = ','.join(map(str, lojas_selecionadas))
-        where_conditions.append(f"cvu.LOJA IN ({lojas_str})")
-    
-    if descricoes_selecionadas:
-        descricoes_str = "','".join([d.replace("'", "''") for d in descricoes_selecionadas])
-        where_conditions.append(f"c.DSCR IN ('{descricoes_str}')")
-    
-    query = f"""
-    SELECT DISTINCT
-        cvu.LOJA AS LOJA,
-        c.COMP_CODI AS COMPRA,
-        c.CADA_ATIV_ID AS CADASTRO_VEICULO,
-        cv.PLACA,
-        c.VALR_RATE AS VALOR_UNITARIO_CUSTO,
-        c.DSCR AS DESCRICAO,
-        a.CADASTRO,
-        a.VALOR_TOTAL_NOTA
-    FROM comp_rate_ativ c
-    LEFT JOIN compras_dbf a ON c.COMP_CODI = a.COMPRA AND c.COMP_LOJA = a.LOJA
-    LEFT JOIN cadastros_ativos ca ON c.CADA_ATIV_ID = ca.CADA_ATIV_ID 
-    LEFT JOIN cadastros_veiculos cv ON ca.CADA_VEIC_ID = cv.CADA_VEIC_ID
-    LEFT JOIN cadastros_veiculos_ultilizacao cvu ON ca.CADA_VEIC_ID = cvu.CADA_VEIC_ID
-    WHERE {' AND '.join(where_conditions)}
-    ORDER BY cvu.LOJA 
-    """
-    
     engine = criar_conexao()
     try:
-        return pd.read_sql_query(query, engine)
+        df = custos_frota(engine, data_inicio, data_fim)
     finally:
         engine.dispose()
+    return custos_por_veiculo(df, lojas_selecionadas, descricoes_selecionadas)
 
 def consulta_custos_todas_lojas(data_inicio, data_fim, descricoes_selecionadas=None):
     """Consulta custos de TODAS as lojas para o gráfico comparativo"""
-    where_conditions = [f"a.CADASTRO BETWEEN '{data_inicio}' AND '{data_fim}'"]
-    
-    if descricoes_selecionadas:
-        descricoes_str = "','".join([d.replace("'", "''") for d in descricoes_selecionadas])
-        where_conditions.append(f"c.DSCR IN ('{descricoes_str}')")
-    
-    query = f"""
-    SELECT DISTINCT
-        cvu.LOJA AS LOJA,
-        c.VALR_RATE AS VALOR_UNITARIO_CUSTO
-    FROM comp_rate_ativ c
-    LEFT JOIN compras_dbf a ON c.COMP_CODI = a.COMPRA AND c.COMP_LOJA = a.LOJA
-    LEFT JOIN cadastros_ativos ca ON c.CADA_ATIV_ID = ca.CADA_ATIV_ID 
-    LEFT JOIN cadastros_veiculos cv ON ca.CADA_VEIC_ID = cv.CADA_VEIC_ID
-    LEFT JOIN cadastros_veiculos_ultilizacao cvu ON ca.CADA_VEIC_ID = cvu.CADA_VEIC_ID
-    WHERE {' AND '.join(where_conditions)}
-    ORDER BY cvu.LOJA 
-    """
-    
     engine = criar_conexao()
     try:
-        return pd.read_sql_query(query, engine)
+        df = custos_frota(engine, data_inicio, data_fim)
     finally:
         engine.dispose()
+    return custos_todas_lojas(df, descricoes_selecionadas)
 
 def processar_dados_custos(data_inicio, data_fim, lojas_selecionadas=None, descricoes_selecionadas=None):
     """Processa dados de custos com filtros + dados de todas as lojas"""
@@ -129,12 +81,12 @@ def processar_dados_custos(data_inicio, data_fim, lojas_selecionadas=None, descr
     
     resumos = {
         'original': df,
-        'por_loja': df.groupby('LOJA')['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
-        'por_loja_todas': df_todas_lojas.groupby('LOJA')['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
-        'por_dia': df.groupby('DATA')['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
-        'por_mes': df.groupby('MES_ANO')['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
-        'por_desc': df.groupby('DESCRICAO')['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
-        'por_ativ': df.groupby('CADASTRO_VEICULO')['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index()
+        'por_loja': df.groupby('LOJA', observed=True)['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
+        'por_loja_todas': df_todas_lojas.groupby('LOJA', observed=True)['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
+        'por_dia': df.groupby('DATA', observed=True)['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
+        'por_mes': df.groupby('MES_ANO', observed=True)['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
+        'por_desc': df.groupby('DESCRICAO', observed=True)['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index(),
+        'por_ativ': df.groupby('CADASTRO_VEICULO', observed=True)['VALOR_UNITARIO_CUSTO'].agg(['sum', 'mean', 'count']).reset_index()
     }
     
     for key in ['por_loja', 'por_loja_todas', 'por_dia', 'por_mes', 'por_desc', 'por_ativ']:
@@ -230,7 +182,7 @@ def main():
         data_fim = st.date_input("Data Fim", value=datetime.now())
     
     try:
-        descricoes_disponiveis = obter_descricoes_disponiveis()
+        descricoes_disponiveis = obter_descricoes_disponiveis(data_inicio, data_fim)
         lojas_disponiveis = obter_lojas_disponiveis()
     except Exception as e:
         st.error(f"Erro ao carregar opções: {e}")
@@ -354,4 +306,5 @@ def main():
         )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("custos"):
+        main()
\ No newline at end of file
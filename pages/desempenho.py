@@ -0,0 +1,164 @@
+import streamlit as st
+import plotly.express as px
+from navigation import AccessControl
+from core.db import admissao
+from core.instrumentacao import log_consultas, ranking
+from core.metricas import metricas, memoria_processo
+from core.cache import estatisticas_caches, limpar_cache, limpar_todos, caches_registrados, governador
+from core.profiler import perfis_recentes
+import pandas as pd
+import os
+
+# Proteção de acesso
+if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
+    st.warning("Você não está logado. Redirecionando para a página de login...")
+    st.switch_page("app.py")
+    st.stop()
+
+# Página restrita à equipe de TI
+cargo = (st.session_state.get("user_info") or {}).get("cargo")
+if not AccessControl.has_access("desempenho.py", cargo):
+    st.error("Acesso restrito à equipe de TI.")
+    st.stop()
+
+def exibir_paginas():
+    """Tempo de execução das páginas (p50/p95) desde o início do processo"""
+    st.subheader("📄 Tempo de execução por página")
+    df = metricas.resumo_paginas()
+    if df.empty:
+        st.info("Nenhuma página medida ainda neste processo.")
+        return
+    st.dataframe(df.round(3), use_container_width=True, hide_index=True)
+    fig = px.bar(df, x="pagina", y=["p50", "p95"], barmode="group",
+                 labels={"value": "Segundos", "pagina": "Página", "variable": ""})
+    st.plotly_chart(fig, use_container_width=True)
+
+def exibir_consultas():
+    """Ranking e histograma de latência das consultas a partir do log local"""
+    st.subheader("🗄️ Latência das consultas")
+    dias = st.selectbox("Período do log", options=[1, 7, 30], index=1, format_func=lambda d: f"Últimos {d} dias")
+    df_log = log_consultas.ler(dias)
+    if df_log.empty:
+        st.info("Nenhuma consulta registrada no período.")
+        return
+
+    ordem = st.radio("Ordenar por", ["total", "p95", "maximo", "execucoes"], horizontal=True)
+    st.dataframe(ranking(df_log, ordem, top=30), use_container_width=True, hide_index=True)
+
+    df_log["consulta"] = df_log["pagina"] + " · " + df_log["nome"]
+    consultas = sorted(df_log["consulta"].unique())
+    selecionada = st.selectbox("Histograma da consulta", options=consultas)
+    fig = px.histogram(df_log[df_log["consulta"] == selecionada], x="duracao", nbins=40,
+                       labels={"duracao": "Duração (s)"}, title=selecionada)
+    st.plotly_chart(fig, use_container_width=True)
+
+    lentas = df_log[df_log["explain"].notna()].sort_values("duracao", ascending=False)
+    if not lentas.empty:
+        with st.expander(f"EXPLAIN capturados ({len(lentas)})"):
+            escolha = st.selectbox("Execução", options=lentas["id"].tolist(),
+                                   format_func=lambda i: f"#{i} - {lentas.loc[lentas['id'] == i, 'consulta'].iloc[0]} "
+                                                         f"({lentas.loc[lentas['id'] == i, 'duracao'].iloc[0]:.2f}s)")
+            st.code(lentas.loc[lentas["id"] == escolha, "explain"].iloc[0], language="json")
+
+def exibir_pools():
+    """Utilização dos pools de conexão e fila de consultas pesadas"""
+    st.subheader("🔌 Pools de conexão")
+    df_pools = metricas.uso_pools()
+    if df_pools.empty:
+        st.info("Nenhum engine utilizado ainda neste processo.")
+    else:
+        st.dataframe(df_pools, use_container_width=True, hide_index=True)
+
+    st.subheader("🚦 Consultas pesadas")
+    stats = admissao.estatisticas()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Em execução", f"{stats['ativas']} / {stats['limite_global']}")
+    col2.metric("Na fila", stats["na_fila"])
+    col3.metric("Limite por usuário", stats["limite_usuario"])
+
+    st.subheader("🦆 Réplica DuckDB")
+    df_fallbacks = metricas.fallbacks_replica()
+    if df_fallbacks.empty:
+        st.info("Nenhuma consulta voltou da réplica para o MySQL neste processo.")
+    else:
+        st.caption("Consultas que falharam na réplica e seguiram pelo MySQL")
+        st.dataframe(df_fallbacks, use_container_width=True, hide_index=True)
+
+def exibir_caches():
+    """Taxa de acerto e memória por cache, uso do orçamento por namespace e invalidação"""
+    st.subheader("🧠 Caches")
+    resumo = governador.resumo()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Memória do processo (RSS)", f"{memoria_processo() / 1024 ** 2:,.0f} MB".replace(",", "."))
+    col2.metric("Caches / orçamento", f"{resumo['caches'] / 1024 ** 2:,.0f} / {resumo['orcamento'] / 1024 ** 2:,.0f} MB")
+    col3.metric("Frames em sessão", f"{resumo['sessoes'] / 1024 ** 2:,.0f} MB",
+                help=f"{resumo['sessoes_ativas']} sessão(ões) com frames guardados")
+
+    df_caches = estatisticas_caches()
+    if df_caches.empty:
+        st.info("Nenhum cache registrado ainda neste processo.")
+    else:
+        st.dataframe(df_caches, use_container_width=True, hide_index=True)
+        st.caption("Uso das cotas por namespace")
+        st.dataframe(governador.uso_namespaces(), use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        selecionados = st.multiselect("Caches para invalidar", options=caches_registrados())
+    with col2:
+        st.write("")
+        if st.button("Invalidar selecionados", disabled=not selecionados):
+            for nome in selecionados:
+                limpar_cache(nome)
+            st.success(f"{len(selecionados)} cache(s) invalidado(s).")
+
+    if st.button("🗑️ Invalidar todos os caches", type="primary"):
+        limpar_todos()
+        st.success("Todos os caches foram invalidados.")
+
+def exibir_profiler():
+    """Liga o profiler para a sessão e lista os perfis gerados"""
+    st.subheader("🔬 Profiler de páginas")
+    ativo = st.toggle("Perfilar minhas execuções de página", value=st.session_state.get("perfilar_paginas", False))
+    st.session_state["perfilar_paginas"] = ativo
+    if os.getenv("DASHBOARD_PROFILE", "0") == "1":
+        st.info("DASHBOARD_PROFILE=1: todas as execuções de página estão sendo perfiladas.")
+
+    if not perfis_recentes:
+        st.info("Nenhum perfil gerado ainda neste processo.")
+        return
+
+    df_perfis = pd.DataFrame(list(perfis_recentes)).fillna(0)
+    st.dataframe(df_perfis.drop(columns=["arquivo"]), use_container_width=True, hide_index=True)
+
+    arquivos = [a for a in df_perfis["arquivo"] if a and os.path.exists(a)]
+    if arquivos:
+        escolhido = st.selectbox("Arquivo speedscope", options=arquivos, format_func=os.path.basename)
+        with open(escolhido, "rb") as f:
+            st.download_button("⬇️ Baixar perfil (abrir em speedscope.app)", f.read(),
+                               file_name=os.path.basename(escolhido), mime="application/json")
+
+def main():
+    st.set_page_config(page_title="Desempenho", layout="wide")
+    st.title("⚙️ Desempenho do Sistema")
+
+    if st.sidebar.button("Voltar"):
+        st.switch_page("app.py")
+    if st.sidebar.button("🔄 Atualizar"):
+        st.rerun()
+
+    tab_paginas, tab_consultas, tab_pools, tab_caches, tab_profiler = st.tabs(
+        ["Páginas", "Consultas", "Conexões", "Caches", "Profiler"])
+    with tab_paginas:
+        exibir_paginas()
+    with tab_consultas:
+        exibir_consultas()
+    with tab_pools:
+        exibir_pools()
+    with tab_caches:
+        exibir_caches()
+    with tab_profiler:
+        exibir_profiler()
+
+if __name__ == "__main__":
+    main()
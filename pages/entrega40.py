@@ -6,6 +6,9 @@ if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
 
 import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.metricas import medir_pagina
 import plotly.graph_objects as go
 import plotly.express as px
 
@@ -18,7 +21,7 @@ def criar_conexao():
 
 def executar_query(engine, query):
     try:
-        df = pd.read_sql(query, engine)
+        df = DatabaseManager.read_sql(query, engine)
         return df.fillna(0)
     except Exception as e:
         st.error(f"Erro ao executar a query: {e}")
@@ -38,8 +41,7 @@ def criar_filtros_sidebar(engine):
     data_inicio_str = f"{data_inicio} 00:00:00"
     data_fim_str = f"{data_fim} 23:59:59"
     
-    df_lojas = executar_query(engine, "SELECT DISTINCT LOJA FROM autogeral.expedicao ORDER BY LOJA")
-    loja = st.sidebar.selectbox("Selecione a Loja", df_lojas['LOJA'].tolist() if not df_lojas.empty else [])
+    loja = st.sidebar.selectbox("Selecione a Loja", refdata.codigos_lojas(engine))
     
     consultar = st.sidebar.button("Consultar")
 
@@ -395,4 +397,5 @@ def main():
                 st.warning("- Nenhum dado encontrado")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("entrega40"):
+        main()
\ No newline at end of file
@@ -11,6 +11,10 @@ import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.cache import cache_data
+from core.venda_casada import fato_venda_casada
 import plotly.graph_objects as go
 from sqlalchemy.exc import SQLAlchemyError
 import seaborn as sns
@@ -27,13 +31,11 @@ def criar_conexao():
     return create_engine(url)
 
 # Função para consultar dados de lojas
-@st.cache_data(ttl=3600)
-def consultar_lojas(_engine):
-    query = "SELECT codigo, nome FROM autogeral.lojas ORDER BY codigo"
-    return pd.read_sql(query, _engine)
+def consultar_lojas(engine):
+    return refdata.lojas(engine)
 
 # Função para consultar dados de entregas
-@st.cache_data(ttl=3600)
+@cache_data(ttl=3600)
 def consultar_entregas(_engine, loja, inicio_periodo_str, termino_periodo_str):
     query = f""" SELECT a.cadastro, a.LOJA, d.DESCRICAO 'Entregador'
      , b.PLACA, a.KM_RETORNO - a.KM_SAIDA KMS
@@ -51,7 +53,7 @@ def consultar_entregas(_engine, loja, inicio_periodo_str, termino_periodo_str):
    AND a.cadastro BETWEEN '{inicio_periodo_str}' AND '{termino_periodo_str}'
  ORDER BY a.LOJA, a.cadastro;
     """
-    return pd.read_sql(query, _engine)
+    return DatabaseManager.read_sql(query, _engine)
 
 # Função para calcular índices de entrega
 def calcular_indices(entrega_df):
@@ -148,28 +150,14 @@ if gerar_relatorio:
 
 # Inicio merge do codigo
 
-# Função para consultar dados do banco
-# Cachear a consulta por 1 hora para melhorar desempenho
-# @st.cache_data(ttl=3600)  Porem não esta carrergando os dados corretamente
+# Rota, venda casada e clientes por loja e mês (core.venda_casada: em cache por mês,
+# com o período na chave)
 def get_data():
-    query = f""" 
-    SELECT b.cadastro, b.ROMANEIO, b.LOJA, o.DESCRICAO_SIMPLIFICADA, a.COMPRA_PEDIDO, b.ENTREGA,
-           CASE WHEN o.DESCRICAO_SIMPLIFICADA = 'Transferência' THEN 1 ELSE 0 END AS ROTA,
-           CASE WHEN a.COMPRA_PEDIDO IS NOT NULL THEN 1 ELSE 0 END AS "Venda casada"
-    FROM romaneios_dbf b
-    LEFT JOIN compras_pedidos a ON a.romaneio_codigo = b.ROMANEIO AND a.ROMANEIO_LOJA = b.LOJA
-    JOIN movimentos_operacoes o ON b.OPERACAO_CODIGO = o.CODIGO
-    WHERE b.cadastro BETWEEN '{inicio_periodo_str}' AND '{termino_periodo_str}'
-        and b.LOJA = {loja};
-    """
-    engine = criar_conexao()
-    if engine:
-        try:
-            return pd.read_sql(query, engine)
-        except SQLAlchemyError as e:
-            st.error(f"Erro ao executar a consulta: {e}")
-            return pd.DataFrame()
-    return pd.DataFrame()
+    try:
+        return fato_venda_casada(engine, inicio_periodo_str, termino_periodo_str, lojas=[loja])
+    except SQLAlchemyError as e:
+        st.error(f"Erro ao executar a consulta: {e}")
+        return pd.DataFrame()
 
 # Carregar dados
 rota_df = get_data()
@@ -177,35 +165,13 @@ rota_df = get_data()
 if rota_df.empty:
     st.warning("Não há dados disponíveis para exibir.")
 else:
-    # Converter a coluna 'cadastro' para mês e ano
-    rota_df['cadastro'] = pd.to_datetime(rota_df['cadastro']).dt.to_period('M')
-
-    # Filtrar dados
-    filtered_df = rota_df[(rota_df['ROTA'] == 1) | (rota_df['Venda casada'] == 1)][['ROMANEIO', 'LOJA', 'cadastro', 'ROTA', 'Venda casada']]
-
-    # Filtrar as linhas onde 'DESCRICAO_SIMPLIFICADA' é 'venda' e 'COMPRA_PEDIDO' está vazio
-    vendas_df = rota_df[(rota_df['DESCRICAO_SIMPLIFICADA'] == 'Venda') & (rota_df['COMPRA_PEDIDO'].isna())][['LOJA', 'cadastro']]
-    # st.write(vendas_df)
-
-    # Criar um dataframe com a coluna 'clientes', que é a soma das linhas filtradas
-    clientes_df = vendas_df.groupby(['LOJA', 'cadastro']).size().reset_index(name='cliente')
-    
-    # Agrupar por romaneio LOJA e cadastro
-    grupoRoma_df = filtered_df.groupby(['ROMANEIO', 'LOJA', 'cadastro']).agg({
-        'ROTA': 'sum',
-        'Venda casada': 'sum'
-    }).reset_index()
-
-    # Agrupar por LOJA e cadastro e somas total de Venda casada e Total de Rota
-    grupo_df = filtered_df.groupby(['LOJA', 'cadastro']).agg({
-        'ROTA': 'sum',
-        'Venda casada': 'sum'
-    }).reset_index()
+    # Mês e ano como período, como as colunas de total_entrega e entrega_40
+    rota_df['cadastro'] = pd.PeriodIndex(rota_df['MES_ANO'], freq='M')
 
     # Cria colunas pivotada
-    soma_total_rota = grupo_df.pivot(index='LOJA', columns='cadastro', values='ROTA').fillna(0)
-    soma_total_venda_casada = grupo_df.pivot(index='LOJA', columns='cadastro', values='Venda casada').fillna(0)
-    clientes = clientes_df.pivot(index='LOJA', columns='cadastro', values='cliente').fillna(0)
+    soma_total_rota = rota_df.pivot(index='LOJA', columns='cadastro', values='ROTA').fillna(0)
+    soma_total_venda_casada = rota_df.pivot(index='LOJA', columns='cadastro', values='VENDA_CASADA').fillna(0)
+    clientes = rota_df.pivot(index='LOJA', columns='cadastro', values='CLIENTES').fillna(0)
 
 # Fim Merge do codigo
 
@@ -5,6 +5,9 @@ import matplotlib.pyplot as plt
 import calendar
 from datetime import datetime, date
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core.metricas import medir_pagina
+from core.transformacoes import aggregate_data
 
 pd.set_option('future.no_silent_downcasting', True)
 # -----------------------
@@ -28,7 +31,7 @@ def criar_conexao():
 def executar_query(engine, query):
     """Executa a query no banco de dados e retorna um DataFrame."""
     try:
-        return pd.read_sql(query, engine)
+        return DatabaseManager.read_sql(query, engine)
     except Exception as e:
         st.error(f"Erro ao executar a query: {e}")
         return pd.DataFrame()
@@ -43,22 +46,6 @@ def obter_meses():
         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
     ]
 
-LOJA_DICT = {
-    1: 'CD',
-    2: 'SALTO',
-    3: 'SOROCABA',
-    4: 'CAETANO',
-    5: 'INDAIATUBA',
-    6: 'PORTO FELIZ',
-    7: 'ÉDEN',
-    8: 'JACARE',
-    9: 'TATUI',
-    10: 'BOITUVA',
-    11: 'PIEDADE',
-    12: 'OTAVIANO',
-    13: 'CERQUILHO'
-}
-
 def gerar_query_dados(inicio_str: str, fim_str: str) -> str:
     return f"""
         SELECT a.expedicao, r.ROMANEIO, a.LOJA, a.CADASTRO,
@@ -101,35 +88,6 @@ def process_data(df: pd.DataFrame, meses_validos: list) -> pd.DataFrame:
     df["MES"] = df["CADASTRO"].dt.strftime('%Y-%m')
     return df[df["MES"].isin(meses_validos)]
 
-def aggregate_data(df: pd.DataFrame) -> pd.DataFrame:
-
-    # Agrega os dados agrupando por MES e LOJA. Calcula:
-    #   - TOTAL_ENTREGAS: total de entregas (count de MINUTOS_ENTREGA)
-    #   - Entrega_40: quantidade de entregas com MINUTOS_ENTREGA <= 40
-    #   - PORCENTAGEM_ENTREGA_40: (Entrega_40/TOTAL_ENTREGAS)*100
-    #   - PORCENTAGEM_TOTAL_ENTREGAS: percentual de TOTAL_ENTREGAS da loja em relação ao total do mês
-
-    filtro = df[df["ROTA_STATUS"] == "ENTREGUE"].copy()
-    agrupado = filtro.groupby(["MES", "LOJA"]).agg(
-        TOTAL_ENTREGAS=("MINUTOS_ENTREGA", "count"),
-        Entrega_40=("MINUTOS_ENTREGA", lambda x: (x <= 40).sum())
-    ).reset_index()
-    
-    agrupado["PORCENTAGEM_ENTREGA_40"] = (agrupado["Entrega_40"] / agrupado["TOTAL_ENTREGAS"]) * 100
-    
-    # Calcula o total de entregas por mês e, em seguida, o percentual de cada loja
-    agrupado["TOTAL_DELIVERIES_MES"] = agrupado.groupby("MES")["TOTAL_ENTREGAS"].transform("sum")
-    agrupado["PORCENTAGEM_TOTAL_ENTREGAS"] = (agrupado["TOTAL_ENTREGAS"] / agrupado["TOTAL_DELIVERIES_MES"]) * 100
-
-    agrupado["LOJA"] = agrupado["LOJA"].astype(int)
-    agrupado["LOJA_NOME"] = agrupado["LOJA"].map(LOJA_DICT)
-
-    # Ordenando lojas por numero de loja e nao em ordem alfabetica
-    loja_cats = pd.CategoricalDtype(categories=[LOJA_DICT[i] for i in range(1, 14)], ordered=True)
-    agrupado["LOJA_NOME"] = agrupado["LOJA_NOME"].astype(loja_cats)
-    agrupado = agrupado.sort_values(by="LOJA_NOME")
-    return agrupado
-
 def pivot_data(agrupado: pd.DataFrame, meses_validos: list) -> pd.DataFrame:
 
     # Cria a tabela pivô para PORCENTAGEM_ENTREGA_40 com
@@ -291,4 +249,5 @@ def main():
                      "Contribuição de cada loja no total de entregas", "Porcentagem do total de entregas")
 
 if __name__ == "__main__":
-    main()
+    with medir_pagina("entrega_em_40"):
+        main()
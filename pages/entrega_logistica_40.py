@@ -7,6 +7,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.cache import cache_por_loja
+from core.multiloja import condicao_lojas, descrever_lojas, selecionar_lojas
+from core.metricas import medir_pagina
 from datetime import datetime, timedelta
 import calendar
 
@@ -30,16 +35,8 @@ def criar_conexao():
     url = f"{config['dialect']}://{config['username']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url)
 
-def executar_query(engine, query):
-    try:
-        return pd.read_sql(query, engine)
-    except Exception as e:
-        st.error(f"Erro ao executar a query: {e}")
-        return pd.DataFrame()
-
 def consultar_lojas(engine):
-    query = "SELECT codigo, nome FROM autogeral.lojas ORDER BY codigo"
-    return executar_query(engine, query)
+    return refdata.lojas(engine)
 
 # Funções de data
 def obter_ultimos_anos():
@@ -53,7 +50,7 @@ def obter_semanas(ano, mes):
     return len(calendar.monthcalendar(ano, mes))
 
 # Query principal
-def gerar_query_dados(inicio, fim, loja):
+def gerar_query_dados(inicio, fim, lojas):
     return f"""
         SELECT a.expedicao, r.ROMANEIO, a.LOJA, a.CADASTRO,
                d.DESCRICAO AS 'Entregador',
@@ -77,13 +74,32 @@ def gerar_query_dados(inicio, fim, loja):
         JOIN entregador d ON a.ENTREGADOR_CODIGO = d.CODIGO
         LEFT JOIN romaneios_dbf r ON e.VENDA_TIPO = 'ROMANEIO' AND e.CODIGO_VENDA = r.ROMANEIO AND e.LOJA_VENDA = r.LOJA
         WHERE a.ROTA_METROS IS NOT NULL
-          AND a.LOJA = {loja}
+          AND {condicao_lojas('a.LOJA', lojas)}
           AND e.ROTA_STATUS = 'ENTREGUE'
           AND r.CADASTRO BETWEEN '{inicio}' AND '{fim}'
           AND TIMESTAMPDIFF(MINUTE, r.CADASTRO, r.TERMINO_SEPARACAO) > 0
           AND TIMESTAMPDIFF(MINUTE, r.CADASTRO, e.ROTA_HORARIO_REALIZADO) > 0;
     """
 
+@cache_por_loja(ttl=3600)
+def carregar_entregas(_engine, lojas, inicio, fim):
+    """Entregas das lojas no período, numa única consulta (cada loja fica no cache)"""
+    return DatabaseManager.read_sql(gerar_query_dados(inicio, fim, lojas), _engine)
+
+def comparativo_lojas(df, loja_dict):
+    """Resumo por loja para comparar as lojas selecionadas"""
+    resumo = df.groupby('LOJA').agg(
+        entregas=('ROMANEIO', 'count'),
+        entregadores=('Entregador', 'nunique'),
+        tempo_total=('MINUTOS_ENTREGA_TOTAL', 'mean'),
+        tempo_separacao=('MINUTOS_SEPARACAO', 'mean'),
+        distancia=('KM_DISTANCIA', 'mean'),
+    ).round(2).reset_index()
+    resumo.insert(0, 'Loja', resumo.pop('LOJA').map(loja_dict))
+    resumo.columns = ['Loja', 'Total Entregas', 'Entregadores Ativos', 'Tempo Médio Total (min)',
+                      'Tempo Médio Separação (min)', 'Distância Média (km)']
+    return resumo.sort_values('Total Entregas', ascending=False)
+
 # Função para eficiência dos entregadores
 def analise_eficiencia_entregadores(df):
     st.subheader("📈 Eficiência dos Entregadores")
@@ -352,9 +368,7 @@ def main():
     # Seleção de loja
     df_lojas = consultar_lojas(engine)
     loja_dict = dict(zip(df_lojas['codigo'], df_lojas['nome']))
-    loja_selecionada = st.sidebar.selectbox("Selecione a loja", 
-                                           options=loja_dict.keys(), 
-                                           format_func=lambda x: loja_dict[x])
+    lojas_selecionadas = selecionar_lojas(loja_dict, key="logistica_lojas")
     
     # Navegação por período
     periodo = st.sidebar.radio("Período de Análise", ["Ano", "Mês", "Semana", "Período Personalizado"])
@@ -415,10 +429,13 @@ def main():
         titulo_periodo = f"Semana {semana_selecionada} - {mes_selecionado}/{ano_selecionado}"
     
     # Executar query
-    st.info(f"Analisando dados para: {loja_dict[loja_selecionada]} - {titulo_periodo}")
+    st.info(f"Analisando dados para: {descrever_lojas(lojas_selecionadas, loja_dict)} - {titulo_periodo}")
     
-    query = gerar_query_dados(data_inicio, data_fim, loja_selecionada)
-    df = executar_query(engine, query)
+    try:
+        df = carregar_entregas(engine, lojas_selecionadas, data_inicio, data_fim)
+    except Exception as e:
+        st.error(f"Erro ao executar a query: {e}")
+        df = pd.DataFrame()
     
     if df.empty:
         st.warning("Nenhum dado encontrado para os filtros selecionados.")
@@ -437,6 +454,10 @@ def main():
     with col4:
         st.metric("Distância Média", f"{df['KM_DISTANCIA'].mean():.1f} km")
     
+    if len(lojas_selecionadas) > 1:
+        st.subheader("🏬 Comparativo entre Lojas")
+        st.dataframe(comparativo_lojas(df, loja_dict), hide_index=True)
+    
     # Tabs para diferentes análises
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "👥 Eficiência Entregadores", 
@@ -462,4 +483,5 @@ def main():
         analise_entregas_40km(df)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("entrega_logistica_40"):
+        main()
\ No newline at end of file
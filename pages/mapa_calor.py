@@ -1,4 +1,5 @@
 import streamlit as st
+from core.metricas import medir_pagina
 
 st.set_page_config(page_title="Mapa de calor de Entregas")
 
@@ -12,18 +13,19 @@ if st.sidebar.button("Voltar", key="btn_voltar"):
 
 st.write("## MAPAS DE CALOR")
 
-tab1, tab2 = st.tabs(["Mapa de calor por horas", "Mapa de calor por meses"])
+with medir_pagina("mapa_calor"):
+    tab1, tab2 = st.tabs(["Mapa de calor por horas", "Mapa de calor por meses"])
 
-with tab1:
-    try:
-        from pages.mapa_calor_horas import main as mapa_calor_horas_main
-        mapa_calor_horas_main()
-    except ModuleNotFoundError:
-        st.error("Erro ao carregar 'Mapa de calor por horas'.")
+    with tab1:
+        try:
+            from pages.mapa_calor_horas import main as mapa_calor_horas_main
+            mapa_calor_horas_main()
+        except ModuleNotFoundError:
+            st.error("Erro ao carregar 'Mapa de calor por horas'.")
 
-with tab2:
-    try:
-        from pages.mapa_calor_por_meses import main as mapa_calor_por_meses_main
-        mapa_calor_por_meses_main()
-    except ModuleNotFoundError:
-        st.error("Erro ao carregar 'Mapa de calor por meses'.")
\ No newline at end of file
+    with tab2:
+        try:
+            from pages.mapa_calor_por_meses import main as mapa_calor_por_meses_main
+            mapa_calor_por_meses_main()
+        except ModuleNotFoundError:
+            st.error("Erro ao carregar 'Mapa de calor por meses'.")
\ No newline at end of file
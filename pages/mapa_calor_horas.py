@@ -6,6 +6,12 @@ if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
 
 import pandas as pd
 from sqlalchemy import create_engine, text
+from core.db import DatabaseManager
+from core import refdata
+from core.metricas import medir_pagina
+from core.cache import cache_data, cache_por_loja
+from core.multiloja import condicao_lojas, descrever_lojas, selecionar_lojas
+from core.formatacao import duracao_curta
 from sqlalchemy.pool import NullPool
 import plotly.graph_objects as go
 from datetime import datetime
@@ -16,22 +22,28 @@ def get_engine():
     url = f"{config['dialect']}://{config['username']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url, poolclass=NullPool, connect_args={'connect_timeout': 60})
 
-@st.cache_data(ttl=3600)
-def executar_query(_engine, query):
+def ler_query(engine, query):
     tentativas = 3
     for i in range(tentativas):
         try:
-            with _engine.connect() as conn:
-                return pd.read_sql(text(query), conn)
+            with engine.connect() as conn:
+                return DatabaseManager.read_sql(text(query), conn, replica=True)
         except Exception as e:
             if i == tentativas - 1:
                 raise e
             st.warning(f"Reconectando... tentativa {i+1}")
 
-@st.cache_data(ttl=3600)
-def consultar_lojas(_engine):
-    query = "SELECT DISTINCT LOJA FROM romaneios_dbf ORDER BY LOJA"
-    return executar_query(_engine, query)
+@cache_data(ttl=3600)
+def executar_query(_engine, query):
+    return ler_query(_engine, query)
+
+def consultar_lojas(engine):
+    return refdata.nomes_lojas(engine)
+
+@cache_por_loja(ttl=3600)
+def carregar_dados(_engine, lojas, query):
+    """Linhas da métrica para as lojas (query com o marcador {lojas}); cada loja fica no cache"""
+    return ler_query(_engine, query.format(lojas=condicao_lojas('r.LOJA', lojas)))
 
 def semanas_do_mes(ano, mes):
     query = f"""
@@ -64,22 +76,6 @@ def gerar_subtitulo(periodo, ano, mes, semana):
         return f"Semana {semana} de {datetime(ano, mes, 1).strftime('%B')} de {ano}"
     return ""
 
-def converter_minutos_para_tempo(minutos):
-    if pd.isna(minutos) or minutos == 0:
-        return "0m"
-    minutos = int(minutos)
-    dias = minutos // 1440
-    horas = (minutos % 1440) // 60
-    mins = minutos % 60
-    partes = []
-    if dias > 0:
-        partes.append(f"{dias}d")
-    if horas > 0:
-        partes.append(f"{horas}h")
-    if mins > 0 or len(partes) == 0:
-        partes.append(f"{mins}m")
-    return " ".join(partes)
-
 def verificar_qualidade_dados(df, tipo_metrica):
     """Verifica se há dados suficientes e de qualidade"""
     if tipo_metrica in ["Mediana MINUTOS_ENTREGA", "Mediana MINUTOS_ENTREGA_REALIZADA"]:
@@ -104,8 +100,9 @@ def main():
     st.sidebar.title("Filtros - Por Horas")
     
     engine = get_engine()
-    lojas = consultar_lojas(engine)
-    loja_selecionada = st.sidebar.selectbox("Loja", lojas['LOJA'], key="loja_horas")
+    loja_dict = consultar_lojas(engine)
+    lojas_selecionadas = selecionar_lojas(loja_dict, key="lojas_horas", rotulo="Lojas")
+    nome_lojas = descrever_lojas(lojas_selecionadas, loja_dict)
     
     tipo_metrica = st.sidebar.selectbox(
         "Métrica",
@@ -139,17 +136,18 @@ def main():
                     WHEN 2 THEN 'Segunda' WHEN 3 THEN 'Terça' WHEN 4 THEN 'Quarta'
                     WHEN 5 THEN 'Quinta' WHEN 6 THEN 'Sexta' WHEN 7 THEN 'Sábado'
                 END AS dia_semana,
+                r.LOJA,
                 HOUR(r.CADASTRO) AS hora,
                 DATE(r.CADASTRO) as data,
                 WEEK(r.CADASTRO, 1) as semana,
                 r.ROMANEIO,
                 COUNT(DISTINCT r.ROMANEIO) AS quantidade
             FROM romaneios_dbf r
-            WHERE r.LOJA = {loja}
+            WHERE {{lojas}}
               AND YEAR(r.CADASTRO) = {ano} {filtro_mes} {filtro_semana}
               AND DAYOFWEEK(r.CADASTRO) BETWEEN 2 AND 7
               AND HOUR(r.CADASTRO) BETWEEN 7 AND 19
-            GROUP BY DAYOFWEEK(r.CADASTRO), HOUR(r.CADASTRO), DATE(r.CADASTRO), WEEK(r.CADASTRO, 1), r.ROMANEIO
+            GROUP BY r.LOJA, DAYOFWEEK(r.CADASTRO), HOUR(r.CADASTRO), DATE(r.CADASTRO), WEEK(r.CADASTRO, 1), r.ROMANEIO
         """,
         "Mediana MINUTOS_DE_SEPARACAO": """
             SELECT 
@@ -157,13 +155,14 @@ def main():
                     WHEN 2 THEN 'Segunda' WHEN 3 THEN 'Terça' WHEN 4 THEN 'Quarta'
                     WHEN 5 THEN 'Quinta' WHEN 6 THEN 'Sexta' WHEN 7 THEN 'Sábado'
                 END AS dia_semana,
+                r.LOJA,
                 HOUR(r.CADASTRO) AS hora,
                 DATE(r.CADASTRO) as data,
                 WEEK(r.CADASTRO, 1) as semana,
                 r.ROMANEIO,
                 TIMESTAMPDIFF(MINUTE, r.CADASTRO, r.TERMINO_SEPARACAO) as valor
             FROM romaneios_dbf r
-            WHERE r.LOJA = {loja}
+            WHERE {{lojas}}
               AND YEAR(r.CADASTRO) = {ano} {filtro_mes} {filtro_semana}
               AND DAYOFWEEK(r.CADASTRO) BETWEEN 2 AND 7
               AND HOUR(r.CADASTRO) BETWEEN 7 AND 19
@@ -174,6 +173,7 @@ def main():
                     WHEN 2 THEN 'Segunda' WHEN 3 THEN 'Terça' WHEN 4 THEN 'Quarta'
                     WHEN 5 THEN 'Quinta' WHEN 6 THEN 'Sexta' WHEN 7 THEN 'Sábado'
                 END AS dia_semana,
+                r.LOJA,
                 HOUR(r.CADASTRO) AS hora,
                 DATE(r.CADASTRO) as data,
                 WEEK(r.CADASTRO, 1) as semana,
@@ -183,7 +183,7 @@ def main():
             FROM romaneios_dbf r
             LEFT JOIN expedicao_itens ei ON ei.VENDA_TIPO = 'ROMANEIO' 
                 AND ei.CODIGO_VENDA = r.ROMANEIO AND ei.LOJA_VENDA = r.LOJA
-            WHERE r.LOJA = {loja}
+            WHERE {{lojas}}
               AND YEAR(r.CADASTRO) = {ano} {filtro_mes} {filtro_semana}
               AND DAYOFWEEK(r.CADASTRO) BETWEEN 2 AND 7
               AND HOUR(r.CADASTRO) BETWEEN 7 AND 19
@@ -194,6 +194,7 @@ def main():
                     WHEN 2 THEN 'Segunda' WHEN 3 THEN 'Terça' WHEN 4 THEN 'Quarta'
                     WHEN 5 THEN 'Quinta' WHEN 6 THEN 'Sexta' WHEN 7 THEN 'Sábado'
                 END AS dia_semana,
+                r.LOJA,
                 HOUR(r.CADASTRO) AS hora,
                 DATE(r.CADASTRO) as data,
                 WEEK(r.CADASTRO, 1) as semana,
@@ -206,7 +207,7 @@ def main():
                 AND ei.CODIGO_VENDA = r.ROMANEIO AND ei.LOJA_VENDA = r.LOJA
             LEFT JOIN expedicao a ON ei.EXPEDICAO_CODIGO = a.EXPEDICAO 
                 AND ei.EXPEDICAO_LOJA = a.LOJA
-            WHERE r.LOJA = {loja}
+            WHERE {{lojas}}
               AND YEAR(r.CADASTRO) = {ano} {filtro_mes} {filtro_semana}
               AND DAYOFWEEK(r.CADASTRO) BETWEEN 2 AND 7
               AND HOUR(r.CADASTRO) BETWEEN 7 AND 19
@@ -217,25 +218,26 @@ def main():
     filtro_semana = f"AND WEEK(r.CADASTRO, 1) = {semana}" if semana else ""
     
     query = queries[tipo_metrica].format(
-        loja=loja_selecionada,
         ano=ano,
         filtro_mes=filtro_mes,
         filtro_semana=filtro_semana
     )
     
     with st.spinner('Carregando dados...'):
-        df = executar_query(engine, query)
+        df = carregar_dados(engine, lojas_selecionadas, query)
     
     if not df.empty:
+        # O número do romaneio se repete entre lojas: a contagem distinta usa (loja, romaneio)
+        df['ROMANEIO'] = df['LOJA'].astype(str) + '-' + df['ROMANEIO'].astype(str)
         subtitulo = gerar_subtitulo(periodo, ano, mes, semana)
-        st.title(f"Mapa de calor - {subtitulo}")
+        st.title(f"Mapa de calor - {subtitulo} - {nome_lojas}")
         
         # Verificação de qualidade dos dados
         dados_ok, coluna_problema = verificar_qualidade_dados(df, tipo_metrica)
         
         # Mostra aviso apenas uma vez no início se houver problema
         if not dados_ok:
-            st.warning(f"⚠️ A coluna '{coluna_problema}' da LOJA {loja_selecionada} não está preenchida corretamente no banco de dados.")
+            st.warning(f"⚠️ A coluna '{coluna_problema}' de {nome_lojas} não está preenchida corretamente no banco de dados.")
         
         # Preparar pivot para o mapa de calor
         if tipo_metrica == "Quantidade de ROMANEIO":
@@ -274,10 +276,10 @@ def main():
                 ).reset_index()
         
         tabela['ano'] = ano
-        tabela['mes'] = tabela['data'].apply(lambda x: x.month if hasattr(x, 'month') else mes)
+        tabela['mes'] = pd.to_datetime(tabela['data']).dt.month
         
         if 'mediana_minutos' in tabela.columns:
-            tabela['mediana_minutos'] = tabela['mediana_minutos'].apply(converter_minutos_para_tempo)
+            tabela['mediana_minutos'] = duracao_curta(tabela['mediana_minutos'])
         
         colunas_base = ['ano', 'mes', 'semana', 'dia_semana', 'data', 'hora', 'quantidade_romaneio']
         if 'mediana_minutos' in tabela.columns:
@@ -330,4 +332,5 @@ def main():
         st.warning("Sem dados para o período selecionado")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("mapa_calor_horas"):
+        main()
\ No newline at end of file
@@ -4,66 +4,37 @@ if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
     st.switch_page("app.py")
     st.stop()
 
-import pandas as pd
 from sqlalchemy import create_engine, text
+from core.db import DatabaseManager
+from core import refdata
+from core.metricas import medir_pagina
+from core.cache import cache_data
+from core.formatacao import duracao_curta
+from core.transformacoes import MESES_NOMES, criar_pivot
 from sqlalchemy.pool import NullPool
 import plotly.graph_objects as go
 from datetime import datetime
 
-DIAS_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
-MESES_NOMES = {1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 
-               5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto', 
-               9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'}
-
 @st.cache_resource
 def get_engine():
     config = st.secrets["connections"]["mysql"]
     url = f"{config['dialect']}://{config['username']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url, poolclass=NullPool, connect_args={'connect_timeout': 60})
 
-@st.cache_data(ttl=3600)
+@cache_data(ttl=3600)
 def executar_query(_engine, query):
     tentativas = 3
     for i in range(tentativas):
         try:
             with _engine.connect() as conn:
-                return pd.read_sql(text(query), conn)
+                return DatabaseManager.read_sql(text(query), conn, replica=True)
         except Exception as e:
             if i == tentativas - 1:
                 raise e
             st.warning(f"Reconectando... tentativa {i+1}")
 
-@st.cache_data(ttl=3600)
-def consultar_lojas(_engine):
-    query = "SELECT DISTINCT LOJA FROM romaneios_dbf ORDER BY LOJA"
-    return executar_query(_engine, query)
-
-def preencher_meses_dias(pivot):
-    meses = list(MESES_NOMES.values())
-    pivot = pivot.reindex(index=meses, columns=DIAS_SEMANA, fill_value=0)
-    return pivot.fillna(0)
-
-def converter_minutos_para_tempo(minutos):
-    if pd.isna(minutos) or minutos == 0:
-        return "0m"
-    minutos = int(minutos)
-    dias = minutos // 1440
-    horas = (minutos % 1440) // 60
-    mins = minutos % 60
-    partes = []
-    if dias > 0:
-        partes.append(f"{dias}d")
-    if horas > 0:
-        partes.append(f"{horas}h")
-    if mins > 0 or len(partes) == 0:
-        partes.append(f"{mins}m")
-    return " ".join(partes)
-
-def remover_outliers(df, coluna):
-    Q1 = df[coluna].quantile(0.25)
-    Q3 = df[coluna].quantile(0.75)
-    IQR = Q3 - Q1
-    return df[(df[coluna] >= Q1 - 1.5*IQR) & (df[coluna] <= Q3 + 1.5*IQR)]
+def consultar_lojas(engine):
+    return refdata.codigos_lojas(engine)
 
 def get_queries():
     return {
@@ -136,20 +107,6 @@ def verificar_coluna_vazia(df, tipo_metrica):
             return True
     return False
 
-def criar_pivot(df, tipo_metrica, coluna_vazia):
-    if tipo_metrica == "Quantidade de ROMANEIO":
-        pivot = df.groupby(['mes', 'dia_semana'])['ROMANEIO'].nunique().reset_index()
-        pivot = pivot.pivot(index='mes', columns='dia_semana', values='ROMANEIO')
-    else:
-        if not coluna_vazia:
-            df_limpo = remover_outliers(df[df['valor'] > 0], 'valor')
-            pivot = df_limpo.pivot_table(values='valor', index='mes', columns='dia_semana', aggfunc='median')
-        else:
-            meses = list(MESES_NOMES.values())
-            pivot = pd.DataFrame(0, index=meses, columns=DIAS_SEMANA)
-    
-    return preencher_meses_dias(pivot)
-
 def criar_mapa_calor(pivot, tipo_metrica):
     valores_texto = pivot.values.astype(int) if tipo_metrica == "Quantidade de ROMANEIO" else pivot.values.round(1)
     formato_hover = '%{x} - %{y}<br>Quantidade: %{z}<extra></extra>' if tipo_metrica == "Quantidade de ROMANEIO" else '%{x} - %{y}<br>Minutos: %{z:.1f}<extra></extra>'
@@ -185,7 +142,7 @@ def criar_tabela_dados(df, tipo_metrica, ano, coluna_vazia):
                 quantidade_romaneio=('ROMANEIO', 'nunique'),
                 mediana_minutos=('valor', 'median')
             ).reset_index()
-            tabela['mediana_minutos'] = tabela['mediana_minutos'].apply(converter_minutos_para_tempo)
+            tabela['mediana_minutos'] = duracao_curta(tabela['mediana_minutos'])
         else:
             tabela = df.groupby(['mes', 'dia_semana']).agg(
                 quantidade_romaneio=('ROMANEIO', 'nunique')
@@ -200,7 +157,7 @@ def main():
     
     engine = get_engine()
     lojas = consultar_lojas(engine)
-    loja_selecionada = st.sidebar.selectbox("Loja", lojas['LOJA'], key="loja_meses")
+    loja_selecionada = st.sidebar.selectbox("Loja", lojas, key="loja_meses")
     
     tipo_metrica = st.sidebar.selectbox(
         "Métrica",
@@ -242,4 +199,5 @@ def main():
         st.warning("Sem dados para o período selecionado")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("mapa_calor_por_meses"):
+        main()
\ No newline at end of file
@@ -10,6 +10,10 @@ import calendar
 from sqlalchemy import create_engine
 from datetime import datetime
 import plotly.express as px
+from core import modo_venda, refdata
+from core.cache import cache_por_loja
+from core.multiloja import descrever_lojas, selecionar_lojas
+from core.metricas import medir_pagina
 
 if st.sidebar.button("Voltar"):
         st.switch_page("app.py")
@@ -44,18 +48,9 @@ def criar_conexao():
           f"{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url)
 
-def executar_query(engine, query):
-    """Executa a query no banco de dados e retorna um DataFrame."""
-    try:
-        return pd.read_sql(query, engine)
-    except Exception as e:
-        st.error(f"Erro ao executar a query: {e}")
-        return pd.DataFrame()
-
 def consultar_lojas(engine):
-    """Consulta e retorna os dados das lojas."""
-    query = "SELECT codigo, nome FROM autogeral.lojas ORDER BY codigo"
-    return executar_query(engine, query)
+    """Retorna as lojas (codigo, nome) dos dados de referência."""
+    return refdata.lojas(engine)
 
 # =======================
 # FUNÇÕES AUXILIARES DE DATAS E CONFIGURAÇÃO
@@ -74,53 +69,6 @@ def obter_semanas(ano, mes):
     """Retorna a quantidade de semanas em um mês para um determinado ano."""
     return len(calendar.monthcalendar(ano, mes))
 
-def gerar_query_dados(inicio, fim, loja):
-    """Gera e retorna a query SQL para extrair os dados."""
-    inicio_str = inicio.strftime("%Y-%m-%d")
-    fim_str = fim.strftime("%Y-%m-%d")
-    query = f"""
-    SELECT R.CADASTRO,
-           (R.ROMANEIO*100+R.LOJA) AS ROMANEIO,
-           R.LOJA,
-           IF(R.OPERACAO_CODIGO=45, 'FUTURA', 'PRONTA_ENTREGA') AS MODO,
-           P.CODIGO AS PRODUTO_CODIGO,
-           P.CODIGO_X,
-           P.CODIGO_SEQUENCIA,
-           P.CURVA_PRODUTO,
-           E.CURVA AS LOJA_CURVA,
-           RI.QUANTIDADE,
-           RI.VALOR_UNIDADE 
-    FROM romaneios_dbf R 
-    JOIN romaneios_itens_dbf RI ON RI.ROMANEIO = R.ROMANEIO AND RI.LOJA = R.LOJA
-    JOIN produtos_dbf P ON RI.PRODUTO_CODIGO = P.CODIGO
-    JOIN produto_estoque E ON P.CODIGO = E.PRODUTO_CODIGO AND E.LOJA = R.LOJA
-    WHERE R.LOJA = {loja}
-      AND R.OPERACAO_CODIGO IN (1,2,3,45)
-      AND R.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
-      AND R.SITUACAO = 'FECHADO'      
-    UNION
-    SELECT R.CADASTRO,
-           (R.ROMANEIO*100+R.LOJA) AS ROMANEIO,
-           R.LOJA,
-           'CASADA' AS MODO,
-           P.CODIGO AS PRODUTO_CODIGO,
-           P.CODIGO_X,
-           P.CODIGO_SEQUENCIA,
-           P.CURVA_PRODUTO,
-           E.CURVA AS LOJA_CURVA,
-           VI.QUANTIDADE,
-           VI.VALOR_REVENDA
-    FROM romaneios_dbf R 
-    JOIN compras_pedidos CP ON CP.ROMANEIO_CODIGO = R.ROMANEIO AND CP.ROMANEIO_LOJA = R.LOJA
-    JOIN compras_pedidos_itens VI ON CP.COMPRA_PEDIDO = VI.COMPRA_PEDIDO AND CP.LOJA = VI.LOJA
-    JOIN produtos_dbf P ON VI.PRODUTO_CODIGO = P.CODIGO
-    JOIN produto_estoque E ON P.CODIGO = E.PRODUTO_CODIGO AND E.LOJA = R.LOJA
-    WHERE R.LOJA = {loja}
-      AND R.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
-      AND R.SITUACAO = 'FECHADO';
-    """
-    return query
-
 # =======================
 # FUNÇÕES DE PROCESSAMENTO E VISUALIZAÇÃO
 # =======================
@@ -227,35 +175,78 @@ def create_stacked_bar_chart_percent(data, x_col, modos_perc, titulo, x_label, c
     
     return fig
 
-def process_visualizacao(engine, data_inicio, data_fim, loja, titulo, periodo):
+@cache_por_loja(ttl=3600)
+def carregar_modos(_engine, lojas, data_inicio, data_fim):
+    """Romaneios das lojas no período com o modo de venda final e a quantidade de itens"""
+    return modo_venda.romaneios(_engine, data_inicio, data_fim, lojas)
+
+@cache_por_loja(ttl=3600)
+def carregar_curvas(_engine, lojas, data_inicio, data_fim):
+    """Cubo de curvas (loja, dia, modo, curva do produto, curva da loja) das lojas no período"""
+    return modo_venda.curvas(_engine, data_inicio, data_fim, lojas)
+
+def percentual_curvas(df_curvas, modo, coluna):
+    """Percentual de cada CURVA_PRODUTO nos itens do modo, por período (coluna), colunas PERC_*"""
+    recorte = df_curvas[df_curvas['MODO'] == modo]
+    pivot = recorte.groupby([coluna, 'CURVA_PRODUTO'], observed=True)['ITENS'].sum().unstack(fill_value=0)
+    percentual = pivot.div(pivot.sum(axis=1).replace(0, 1), axis=0).mul(100)
+    return percentual.add_prefix('PERC_').reset_index()
+
+def exibir_curva_produto(df_curvas, modo, coluna, x_label, por):
+    """Gráfico e tabela do percentual de curva do produto de um modo de venda"""
+    df_percentual = percentual_curvas(df_curvas, modo, coluna)
+    if df_percentual.empty:
+        st.info(f"Sem itens {modo} no período.")
+        return
+    cols_perc = [col for col in df_percentual.columns if col.startswith('PERC_')]
+    fig = create_stacked_bar_chart_percent(
+        data=df_percentual,
+        x_col=coluna,
+        modos_perc=cols_perc,
+        titulo=f"Percentual de Curva do Produto ({modo}) por {por}",
+        x_label=x_label,
+        cores={}
+    )
+    st.subheader(f"Gráfico de Percentual de Curva do Produto ({modo}) - Por {por}")
+    st.plotly_chart(fig)
+    st.subheader(f"Tabela de Percentual de Curva do Produto ({modo})")
+    st.dataframe(df_percentual.style.format({col: "{:.2f}%" for col in cols_perc}))
+
+def process_visualizacao(engine, data_inicio, data_fim, lojas, titulo, periodo):
     """
     Executa a query, processa os dados e chama a função de geração do gráfico e tabelas.
     """
-    query = gerar_query_dados(data_inicio, data_fim, loja)
-    df = executar_query(engine, query)
-    if df.empty:
+    try:
+        df_modo = carregar_modos(engine, lojas, data_inicio, data_fim)
+        df_curvas = carregar_curvas(engine, lojas, data_inicio, data_fim) if not df_modo.empty else pd.DataFrame()
+    except Exception as e:
+        st.error(f"Erro ao executar a query: {e}")
+        df_modo = df_curvas = pd.DataFrame()
+    if df_modo.empty:
         st.warning("Nenhum dado encontrado para o período selecionado.")
     else:
-        gerar_grafico(df, titulo, data_inicio, data_fim, periodo)
+        gerar_grafico(df_modo, df_curvas, titulo, data_inicio, data_fim, periodo)
 
-def gerar_grafico(df, titulo, data_inicio, data_fim, periodo):
+def gerar_grafico(df_modo, df_curvas, titulo, data_inicio, data_fim, periodo):
+    """
+    Modos de venda (quantidade de itens por modo) a partir da dimensão de romaneios
+    e curvas dos produtos a partir do cubo de curvas.
+    """
     try:
         # Converter datas e filtrar o período
-        df['CADASTRO'] = pd.to_datetime(df['CADASTRO'])
-        df = df[(df['CADASTRO'] >= pd.Timestamp(data_inicio)) & 
-                (df['CADASTRO'] <= pd.Timestamp(data_fim))]
-        df['MODO'] = df['MODO'].astype(str)
-        
-        # Se algum ROMANEIO tiver 'CASADA', todos viram 'CASADA'
-        romaneios_casada = df.loc[df['MODO'] == 'CASADA', 'ROMANEIO'].unique()
-        df.loc[df['ROMANEIO'].isin(romaneios_casada), 'MODO'] = 'CASADA'
+        df_modo['CADASTRO'] = pd.to_datetime(df_modo['CADASTRO'])
+        df_modo = df_modo[(df_modo['CADASTRO'] >= pd.Timestamp(data_inicio)) &
+                          (df_modo['CADASTRO'] <= pd.Timestamp(data_fim))].copy()
+        df_curvas = df_curvas[(df_curvas['DIA'] >= pd.Timestamp(data_inicio).normalize()) &
+                              (df_curvas['DIA'] <= pd.Timestamp(data_fim))].copy()
+        meses_ordem = [calendar.month_name[i] for i in range(1, 13)]
         
         periodo_data_str = f"{data_inicio.strftime('%d/%m/%Y')} - {data_fim.strftime('%d/%m/%Y')}"
         
         if periodo == "Ano":
 
-            df['mes'] = df['CADASTRO'].dt.month
-            venda_agrupada = df.groupby(['mes', 'LOJA', 'MODO']).size().unstack(fill_value=0).reset_index()
+            df_modo['mes'] = df_modo['CADASTRO'].dt.month
+            venda_agrupada = df_modo.groupby(['mes', 'LOJA', 'MODO'])['ITENS'].sum().unstack(fill_value=0).reset_index()
             venda_agrupada = add_total_and_percentages(venda_agrupada, MODOS)
             venda_agrupada['mes_nome'] = venda_agrupada['mes'].apply(lambda m: calendar.month_name[m])
             venda_agrupada = venda_agrupada.sort_values('mes')
@@ -263,7 +254,6 @@ def gerar_grafico(df, titulo, data_inicio, data_fim, periodo):
             venda_agrupada = venda_agrupada[colunas_final]
             
             venda_agrupada_graph = venda_agrupada.groupby('mes_nome', as_index=False)[MODOS].sum()
-            meses_ordem = [calendar.month_name[i] for i in range(1, 13)]
             venda_agrupada_graph['mes_nome'] = pd.Categorical(
                 venda_agrupada_graph['mes_nome'], 
                 categories=meses_ordem, 
@@ -322,87 +312,17 @@ def gerar_grafico(df, titulo, data_inicio, data_fim, periodo):
             st.dataframe(df_totals.style.format({f'PERC_{modo}': "{:.2f}%" for modo in MODOS}))
             
             # -------------------------------
-            # NOVA análise: CURVA_PRODUTO para PRONTA_ENTREGA (por Mês)
-            # -------------------------------
-            df_curva_pronta = df[df['MODO'] == 'PRONTA_ENTREGA'].copy()
-            # (1) TRATA VALORES NULOS/VAZIOS EM CURVA_PRODUTO (sem inplace e sem loc encadeado)
-            df_curva_pronta['CURVA_PRODUTO'] = (
-                df_curva_pronta['CURVA_PRODUTO']
-                .fillna('')          # Substitui NaN por string vazia
-                .str.strip()        # Remove espaços no início/fim
-                .replace({'': 'SEM_CURVA'})  # Substitui '' por 'SEM_CURVA'
-            )
-            
-            df_curva_pronta['mes'] = df_curva_pronta['CADASTRO'].dt.month
-            df_curva_pronta['mes_nome'] = df_curva_pronta['mes'].apply(lambda m: calendar.month_name[m])
-            
-            curva_agrupada_pronta = df_curva_pronta.groupby(['mes_nome', 'CURVA_PRODUTO']).size().reset_index(name='Quantidade')
-            curva_pivot_pronta = curva_agrupada_pronta.pivot(index='mes_nome', columns='CURVA_PRODUTO', values='Quantidade').fillna(0).reset_index()
-            curva_pivot_pronta['TOTAL'] = curva_pivot_pronta.drop(columns='mes_nome').sum(axis=1)
-            for col in curva_pivot_pronta.columns:
-                if col not in ['mes_nome', 'TOTAL']:
-                    curva_pivot_pronta[f'PERC_{col}'] = (curva_pivot_pronta[col] / curva_pivot_pronta['TOTAL'].replace(0,1)) * 100
-            cols_perc_pronta = [col for col in curva_pivot_pronta.columns if col.startswith('PERC_')]
-            curva_pivot_pronta['mes_nome'] = pd.Categorical(curva_pivot_pronta['mes_nome'], categories=meses_ordem, ordered=True)
-            curva_pivot_pronta = curva_pivot_pronta.sort_values('mes_nome')
-            df_percentual_curva_pronta = curva_pivot_pronta[['mes_nome'] + cols_perc_pronta].copy()
-            
-            fig_curva_pronta = create_stacked_bar_chart_percent(
-                data=df_percentual_curva_pronta,
-                x_col='mes_nome',
-                modos_perc=cols_perc_pronta,
-                titulo="Percentual de Curva do Produto (PRONTA_ENTREGA) por Mês",
-                x_label="Mês",
-                cores={}
-            )
-            st.subheader("Gráfico de Percentual de Curva do Produto (PRONTA_ENTREGA) - Por Mês")
-            st.plotly_chart(fig_curva_pronta)
-            st.subheader("Tabela de Percentual de Curva do Produto (PRONTA_ENTREGA)")
-            st.dataframe(df_percentual_curva_pronta.style.format({col: "{:.2f}%" for col in cols_perc_pronta}))
-            
-            # -------------------------------
-            # NOVA análise: CURVA_PRODUTO para CASADA (por Mês)
+            # Curvas do produto (PRONTA_ENTREGA e CASADA) por Mês: fatias do cubo
             # -------------------------------
-            df_curva_casada = df[df['MODO'] == 'CASADA'].copy()
-            # TRATA VALORES NULOS/VAZIOS EM CURVA_PRODUTO
-            df_curva_casada['CURVA_PRODUTO'] = (
-                df_curva_casada['CURVA_PRODUTO']
-                .fillna('')
-                .str.strip()
-                .replace({'': 'SEM_CURVA'})
-            )
-            
-            df_curva_casada['mes'] = df_curva_casada['CADASTRO'].dt.month
-            df_curva_casada['mes_nome'] = df_curva_casada['mes'].apply(lambda m: calendar.month_name[m])
-            
-            curva_agrupada_casada = df_curva_casada.groupby(['mes_nome', 'CURVA_PRODUTO']).size().reset_index(name='Quantidade')
-            curva_pivot_casada = curva_agrupada_casada.pivot(index='mes_nome', columns='CURVA_PRODUTO', values='Quantidade').fillna(0).reset_index()
-            curva_pivot_casada['TOTAL'] = curva_pivot_casada.drop(columns='mes_nome').sum(axis=1)
-            for col in curva_pivot_casada.columns:
-                if col not in ['mes_nome', 'TOTAL']:
-                    curva_pivot_casada[f'PERC_{col}'] = (curva_pivot_casada[col] / curva_pivot_casada['TOTAL'].replace(0,1)) * 100
-            cols_perc_casada = [col for col in curva_pivot_casada.columns if col.startswith('PERC_')]
-            curva_pivot_casada['mes_nome'] = pd.Categorical(curva_pivot_casada['mes_nome'], categories=meses_ordem, ordered=True)
-            curva_pivot_casada = curva_pivot_casada.sort_values('mes_nome')
-            df_percentual_curva_casada = curva_pivot_casada[['mes_nome'] + cols_perc_casada].copy()
-            
-            fig_curva_casada = create_stacked_bar_chart_percent(
-                data=df_percentual_curva_casada,
-                x_col='mes_nome',
-                modos_perc=cols_perc_casada,
-                titulo="Percentual de Curva do Produto (CASADA) por Mês",
-                x_label="Mês",
-                cores={}
-            )
-            st.subheader("Gráfico de Percentual de Curva do Produto (CASADA) - Por Mês")
-            st.plotly_chart(fig_curva_casada)
-            st.subheader("Tabela de Percentual de Curva do Produto (CASADA)")
-            st.dataframe(df_percentual_curva_casada.style.format({col: "{:.2f}%" for col in cols_perc_casada}))
-        
+            df_curvas['mes_nome'] = pd.Categorical.from_codes(df_curvas['DIA'].dt.month - 1,
+                                                          categories=meses_ordem, ordered=True)
+            for modo in ['PRONTA_ENTREGA', 'CASADA']:
+                exibir_curva_produto(df_curvas, modo, 'mes_nome', 'Mês', 'Mês')
+
         elif periodo == "Mês":
 
-            df['semana'] = ((df['CADASTRO'].dt.day - 1) // 7) + 1
-            venda_agrupada = df.groupby(['semana', 'LOJA', 'MODO']).size().unstack(fill_value=0).reset_index()
+            df_modo['semana'] = ((df_modo['CADASTRO'].dt.day - 1) // 7) + 1
+            venda_agrupada = df_modo.groupby(['semana', 'LOJA', 'MODO'])['ITENS'].sum().unstack(fill_value=0).reset_index()
             venda_agrupada = add_total_and_percentages(venda_agrupada, MODOS)
             venda_agrupada = venda_agrupada.sort_values('semana')
             colunas_final = ['semana', 'LOJA'] + MODOS + ['TOTAL'] + [f'PERC_{modo}' for modo in MODOS]
@@ -446,83 +366,22 @@ def gerar_grafico(df, titulo, data_inicio, data_fim, periodo):
             st.dataframe(df_totals.style.format({f'PERC_{modo}': "{:.2f}%" for modo in MODOS}))
             
             # -------------------------------
-            # NOVA análise: CURVA_PRODUTO para PRONTA_ENTREGA (por Semana)
-            # -------------------------------
-            df_curva_pronta = df[df['MODO'] == 'PRONTA_ENTREGA'].copy()
-            df_curva_pronta['CURVA_PRODUTO'] = (
-                df_curva_pronta['CURVA_PRODUTO']
-                .fillna('')
-                .str.strip()
-                .replace({'': 'SEM_CURVA'})
-            )
-            
-            df_curva_pronta['semana'] = ((df_curva_pronta['CADASTRO'].dt.day - 1) // 7) + 1
-            curva_agrupada_pronta = df_curva_pronta.groupby(['semana', 'CURVA_PRODUTO']).size().reset_index(name='Quantidade')
-            curva_pivot_pronta = curva_agrupada_pronta.pivot(index='semana', columns='CURVA_PRODUTO', values='Quantidade').fillna(0).reset_index()
-            curva_pivot_pronta['TOTAL'] = curva_pivot_pronta.drop(columns='semana').sum(axis=1)
-            for col in curva_pivot_pronta.columns:
-                if col not in ['semana', 'TOTAL']:
-                    curva_pivot_pronta[f'PERC_{col}'] = (curva_pivot_pronta[col] / curva_pivot_pronta['TOTAL'].replace(0,1)) * 100
-            cols_perc_pronta = [col for col in curva_pivot_pronta.columns if col.startswith('PERC_')]
-            df_percentual_curva_pronta = curva_pivot_pronta[['semana'] + cols_perc_pronta].copy()
-            
-            fig_curva_pronta = create_stacked_bar_chart_percent(
-                data=df_percentual_curva_pronta,
-                x_col='semana',
-                modos_perc=cols_perc_pronta,
-                titulo="Percentual de Curva do Produto (PRONTA_ENTREGA) por Semana",
-                x_label="Semana",
-                cores={}
-            )
-            st.subheader("Gráfico de Percentual de Curva do Produto (PRONTA_ENTREGA) - Por Semana")
-            st.plotly_chart(fig_curva_pronta)
-            st.subheader("Tabela de Percentual de Curva do Produto (PRONTA_ENTREGA)")
-            st.dataframe(df_percentual_curva_pronta.style.format({col: "{:.2f}%" for col in cols_perc_pronta}))
-            
-            # -------------------------------
-            # NOVA análise: CURVA_PRODUTO para CASADA (por Semana)
+            # Curvas do produto (PRONTA_ENTREGA e CASADA) por Semana: fatias do cubo
             # -------------------------------
-            df_curva_casada = df[df['MODO'] == 'CASADA'].copy()
-            df_curva_casada['CURVA_PRODUTO'] = (
-                df_curva_casada['CURVA_PRODUTO']
-                .fillna('')
-                .str.strip()
-                .replace({'': 'SEM_CURVA'})
-            )
-            
-            df_curva_casada['semana'] = ((df_curva_casada['CADASTRO'].dt.day - 1) // 7) + 1
-            curva_agrupada_casada = df_curva_casada.groupby(['semana', 'CURVA_PRODUTO']).size().reset_index(name='Quantidade')
-            curva_pivot_casada = curva_agrupada_casada.pivot(index='semana', columns='CURVA_PRODUTO', values='Quantidade').fillna(0).reset_index()
-            curva_pivot_casada['TOTAL'] = curva_pivot_casada.drop(columns='semana').sum(axis=1)
-            for col in curva_pivot_casada.columns:
-                if col not in ['semana', 'TOTAL']:
-                    curva_pivot_casada[f'PERC_{col}'] = (curva_pivot_casada[col] / curva_pivot_casada['TOTAL'].replace(0,1)) * 100
-            cols_perc_casada = [col for col in curva_pivot_casada.columns if col.startswith('PERC_')]
-            df_percentual_curva_casada = curva_pivot_casada[['semana'] + cols_perc_casada].copy()
-            
-            fig_curva_casada = create_stacked_bar_chart_percent(
-                data=df_percentual_curva_casada,
-                x_col='semana',
-                modos_perc=cols_perc_casada,
-                titulo="Percentual de Curva do Produto (CASADA) por Semana",
-                x_label="Semana",
-                cores={}
-            )
-            st.subheader("Gráfico de Percentual de Curva do Produto (CASADA) - Por Semana")
-            st.plotly_chart(fig_curva_casada)
-            st.subheader("Tabela de Percentual de Curva do Produto (CASADA)")
-            st.dataframe(df_percentual_curva_casada.style.format({col: "{:.2f}%" for col in cols_perc_casada}))
-        
+            df_curvas['semana'] = ((df_curvas['DIA'].dt.day - 1) // 7) + 1
+            for modo in ['PRONTA_ENTREGA', 'CASADA']:
+                exibir_curva_produto(df_curvas, modo, 'semana', 'Semana', 'Semana')
+
         elif periodo == "Selecione data":
             
-            df['semana_period'] = df['CADASTRO'].dt.to_period('W')
-            df['semana'] = df['semana_period'].apply(lambda r: r.start_time)
-            df['semana_ano'] = df['CADASTRO'].dt.isocalendar().year
-            df['semana_num'] = df['CADASTRO'].dt.isocalendar().week
-            df['semana_label'] = df['semana'].dt.strftime('%d/%m/%Y')
-            venda_agrupada = df.groupby(
+            df_modo['semana_period'] = df_modo['CADASTRO'].dt.to_period('W')
+            df_modo['semana'] = df_modo['semana_period'].apply(lambda r: r.start_time)
+            df_modo['semana_ano'] = df_modo['CADASTRO'].dt.isocalendar().year
+            df_modo['semana_num'] = df_modo['CADASTRO'].dt.isocalendar().week
+            df_modo['semana_label'] = df_modo['semana'].dt.strftime('%d/%m/%Y')
+            venda_agrupada = df_modo.groupby(
                 ['semana', 'semana_ano', 'semana_num', 'semana_label', 'LOJA', 'MODO']
-            ).size().unstack(fill_value=0).reset_index()
+            )['ITENS'].sum().unstack(fill_value=0).reset_index()
             venda_agrupada = add_total_and_percentages(venda_agrupada, MODOS)
             venda_agrupada = venda_agrupada.sort_values('semana')
             colunas_final = ['semana', 'semana_ano', 'semana_num', 'semana_label', 'LOJA'] \
@@ -562,75 +421,12 @@ def gerar_grafico(df, titulo, data_inicio, data_fim, periodo):
             st.plotly_chart(fig_stack)
             
             # -------------------------------
-            # NOVA análise: CURVA_PRODUTO para PRONTA_ENTREGA (por Data)
-            # -------------------------------
-            df_curva_pronta = df[df['MODO'] == 'PRONTA_ENTREGA'].copy()
-            df_curva_pronta['CURVA_PRODUTO'] = (
-                df_curva_pronta['CURVA_PRODUTO']
-                .fillna('')
-                .str.strip()
-                .replace({'': 'SEM_CURVA'})
-            )
-            
-            df_curva_pronta['data'] = df_curva_pronta['CADASTRO'].dt.date
-            curva_agrupada_pronta = df_curva_pronta.groupby(['data', 'CURVA_PRODUTO']).size().reset_index(name='Quantidade')
-            curva_pivot_pronta = curva_agrupada_pronta.pivot(index='data', columns='CURVA_PRODUTO', values='Quantidade').fillna(0).reset_index()
-            curva_pivot_pronta['TOTAL'] = curva_pivot_pronta.drop(columns='data').sum(axis=1)
-            for col in curva_pivot_pronta.columns:
-                if col not in ['data', 'TOTAL']:
-                    curva_pivot_pronta[f'PERC_{col}'] = (curva_pivot_pronta[col] / curva_pivot_pronta['TOTAL'].replace(0,1)) * 100
-            cols_perc_pronta = [col for col in curva_pivot_pronta.columns if col.startswith('PERC_')]
-            curva_pivot_pronta = curva_pivot_pronta.sort_values('data')
-            df_percentual_curva_pronta = curva_pivot_pronta[['data'] + cols_perc_pronta].copy()
-            
-            fig_curva_pronta = create_stacked_bar_chart_percent(
-                data=df_percentual_curva_pronta,
-                x_col='data',
-                modos_perc=cols_perc_pronta,
-                titulo="Percentual de Curva do Produto (PRONTA_ENTREGA) por Data",
-                x_label="Data",
-                cores={}
-            )
-            st.subheader("Gráfico de Percentual de Curva do Produto (PRONTA_ENTREGA) - Por Data")
-            st.plotly_chart(fig_curva_pronta)
-            st.subheader("Tabela de Percentual de Curva do Produto (PRONTA_ENTREGA)")
-            st.dataframe(df_percentual_curva_pronta.style.format({col: "{:.2f}%" for col in cols_perc_pronta}))
-            
-            # -------------------------------
-            # NOVA análise: CURVA_PRODUTO para CASADA (por Data)
+            # Curvas do produto (PRONTA_ENTREGA e CASADA) por Data: fatias do cubo
             # -------------------------------
-            df_curva_casada = df[df['MODO'] == 'CASADA'].copy()
-            df_curva_casada['CURVA_PRODUTO'] = (
-                df_curva_casada['CURVA_PRODUTO']
-                .fillna('')
-                .str.strip()
-                .replace({'': 'SEM_CURVA'})
-            )
-            
-            df_curva_casada['data'] = df_curva_casada['CADASTRO'].dt.date
-            curva_agrupada_casada = df_curva_casada.groupby(['data', 'CURVA_PRODUTO']).size().reset_index(name='Quantidade')
-            curva_pivot_casada = curva_agrupada_casada.pivot(index='data', columns='CURVA_PRODUTO', values='Quantidade').fillna(0).reset_index()
-            curva_pivot_casada['TOTAL'] = curva_pivot_casada.drop(columns='data').sum(axis=1)
-            for col in curva_pivot_casada.columns:
-                if col not in ['data', 'TOTAL']:
-                    curva_pivot_casada[f'PERC_{col}'] = (curva_pivot_casada[col] / curva_pivot_casada['TOTAL'].replace(0,1)) * 100
-            cols_perc_casada = [col for col in curva_pivot_casada.columns if col.startswith('PERC_')]
-            curva_pivot_casada = curva_pivot_casada.sort_values('data')
-            df_percentual_curva_casada = curva_pivot_casada[['data'] + cols_perc_casada].copy()
-            
-            fig_curva_casada = create_stacked_bar_chart_percent(
-                data=df_percentual_curva_casada,
-                x_col='data',
-                modos_perc=cols_perc_casada,
-                titulo="Percentual de Curva do Produto (CASADA) por Data",
-                x_label="Data",
-                cores={}
-            )
-            st.subheader("Gráfico de Percentual de Curva do Produto (CASADA) - Por Data")
-            st.plotly_chart(fig_curva_casada)
-            st.subheader("Tabela de Percentual de Curva do Produto (CASADA)")
-            st.dataframe(df_percentual_curva_casada.style.format({col: "{:.2f}%" for col in cols_perc_casada}))
-        
+            df_curvas['data'] = df_curvas['DIA'].dt.date
+            for modo in ['PRONTA_ENTREGA', 'CASADA']:
+                exibir_curva_produto(df_curvas, modo, 'data', 'Data', 'Data')
+
         else:
             st.error("Tipo de período inválido.")
     
@@ -646,12 +442,8 @@ def main():
     loja_dict = dict(zip(df_lojas['codigo'], df_lojas['nome']))
     
     st.sidebar.write("## Selecione os parâmetros")
-    loja_selecionada = st.sidebar.selectbox(
-        "Selecione a loja",
-        options=list(loja_dict.keys()),
-        format_func=lambda x: loja_dict[x],
-        key="mnavh_loja"
-    )
+    lojas_selecionadas = selecionar_lojas(loja_dict, key="mnavh_lojas")
+    nome_lojas = descrever_lojas(lojas_selecionadas, loja_dict)
     
     navegacao = st.sidebar.radio("Navegação", options=["Ano", "Mês", "Selecione data"], key="mnavh_navegacao")
     
@@ -661,8 +453,8 @@ def main():
         data_inicio = datetime(ano_selecionado, 1, 1)
         data_fim = datetime(ano_selecionado, 12, 31)
         # if st.sidebar.button("Gerar gráfico e tabela"):
-        titulo = f"Vendas por Mês - {ano_selecionado}"
-        process_visualizacao(engine, data_inicio, data_fim, loja_selecionada, titulo, "Ano")
+        titulo = f"Vendas por Mês - {ano_selecionado} - {nome_lojas}"
+        process_visualizacao(engine, data_inicio, data_fim, lojas_selecionadas, titulo, "Ano")
                 
     elif navegacao == "Mês":
         anos = obter_ultimos_anos()
@@ -674,8 +466,8 @@ def main():
         _, ultimo_dia = calendar.monthrange(ano_selecionado, mes_index)
         data_fim = datetime(ano_selecionado, mes_index, ultimo_dia)
         # if st.sidebar.button("Gerar gráfico e tabela"):
-        titulo = f"Vendas por Semana - {mes_selecionado}/{ano_selecionado}"
-        process_visualizacao(engine, data_inicio, data_fim, loja_selecionada, titulo, "Mês")
+        titulo = f"Vendas por Semana - {mes_selecionado}/{ano_selecionado} - {nome_lojas}"
+        process_visualizacao(engine, data_inicio, data_fim, lojas_selecionadas, titulo, "Mês")
                 
     elif navegacao == "Selecione data":
         st.sidebar.write("### Selecione o intervalo de datas para agrupar por semana")
@@ -690,8 +482,9 @@ def main():
         data_fim = datetime.combine(data_fim_input, datetime.max.time())
         
         # if st.sidebar.button("Gerar gráfico e tabela"):
-        titulo = f"Vendas por Semana: {data_inicio_input.strftime('%d/%m/%Y')} a {data_fim_input.strftime('%d/%m/%Y')}"
-        process_visualizacao(engine, data_inicio, data_fim, loja_selecionada, titulo, "Semana")
+        titulo = f"Vendas por Semana: {data_inicio_input.strftime('%d/%m/%Y')} a {data_fim_input.strftime('%d/%m/%Y')} - {nome_lojas}"
+        process_visualizacao(engine, data_inicio, data_fim, lojas_selecionadas, titulo, "Selecione data")
 
 if __name__ == "__main__":
-    main()
+    with medir_pagina("modo_venda_itens_curva"):
+        main()
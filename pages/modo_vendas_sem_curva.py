@@ -10,6 +10,10 @@ import calendar
 from sqlalchemy import create_engine
 from datetime import datetime
 import plotly.express as px
+from core import modo_venda, refdata
+from core.cache import cache_por_loja
+from core.multiloja import descrever_lojas, selecionar_lojas
+from core.metricas import medir_pagina
 
 if st.sidebar.button("Voltar"):
         st.switch_page("app.py")
@@ -44,18 +48,9 @@ def criar_conexao():
           f"{config['host']}:{config['port']}/{config['database']}"
     return create_engine(url)
 
-def executar_query(engine, query):
-    """Executa a query no banco de dados e retorna um DataFrame."""
-    try:
-        return pd.read_sql(query, engine)
-    except Exception as e:
-        st.error(f"Erro ao executar a query: {e}")
-        return pd.DataFrame()
-
 def consultar_lojas(engine):
-    """Consulta e retorna os dados das lojas."""
-    query = "SELECT codigo, nome FROM autogeral.lojas ORDER BY codigo"
-    return executar_query(engine, query)
+    """Retorna as lojas (codigo, nome) dos dados de referência."""
+    return refdata.lojas(engine)
 
 # =======================
 # FUNÇÕES AUXILIARES DE DATAS E CONFIGURAÇÃO
@@ -74,73 +69,6 @@ def obter_semanas(ano, mes):
     """Retorna a quantidade de semanas em um mês para um determinado ano."""
     return len(calendar.monthcalendar(ano, mes))
 
-def gerar_query_dados(inicio, fim, loja):
-    """Gera e retorna a query SQL para extrair os dados."""
-    inicio_str = inicio.strftime("%Y-%m-%d")
-    fim_str = fim.strftime("%Y-%m-%d")
-    query = f"""
-    WITH CTE AS (
-    SELECT 
-           R.CADASTRO,
-           (R.ROMANEIO*100+R.LOJA) AS ROMANEIO,
-           R.LOJA,
-           IF(R.OPERACAO_CODIGO=45, 'FUTURA', 'PRONTA_ENTREGA') AS MODO,
-           P.CODIGO AS PRODUTO_CODIGO,
-           P.CODIGO_X,
-           P.CODIGO_SEQUENCIA,
-           P.CURVA_PRODUTO,
-           E.CURVA AS LOJA_CURVA,
-           RI.QUANTIDADE,
-           RI.VALOR_UNIDADE,
-           ROW_NUMBER() OVER (PARTITION BY (R.ROMANEIO*100 + R.LOJA) ORDER BY R.CADASTRO) AS RN
-    FROM romaneios_dbf R
-    JOIN romaneios_itens_dbf RI ON RI.ROMANEIO = R.ROMANEIO AND RI.LOJA = R.LOJA
-    JOIN produtos_dbf P ON RI.PRODUTO_CODIGO = P.CODIGO
-    JOIN produto_estoque E ON P.CODIGO = E.PRODUTO_CODIGO AND E.LOJA = R.LOJA
-    WHERE R.LOJA = {loja}
-      AND R.OPERACAO_CODIGO IN (1,2,3,45)
-      AND R.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
-      AND R.SITUACAO = 'FECHADO'
-    UNION
-    SELECT 
-           R.CADASTRO,
-           (R.ROMANEIO*100+R.LOJA) AS ROMANEIO,
-           R.LOJA,
-           'CASADA' AS MODO,
-           P.CODIGO AS PRODUTO_CODIGO,
-           P.CODIGO_X,
-           P.CODIGO_SEQUENCIA,
-           P.CURVA_PRODUTO,
-           E.CURVA AS LOJA_CURVA,
-           VI.QUANTIDADE,
-           VI.VALOR_REVENDA,
-           ROW_NUMBER() OVER (PARTITION BY (R.ROMANEIO*100 + R.LOJA) ORDER BY R.CADASTRO) AS RN
-    FROM romaneios_dbf R
-    JOIN compras_pedidos CP ON CP.ROMANEIO_CODIGO = R.ROMANEIO AND CP.ROMANEIO_LOJA = R.LOJA
-    JOIN compras_pedidos_itens VI ON CP.COMPRA_PEDIDO = VI.COMPRA_PEDIDO AND CP.LOJA = VI.LOJA
-    JOIN produtos_dbf P ON VI.PRODUTO_CODIGO = P.CODIGO
-    JOIN produto_estoque E ON P.CODIGO = E.PRODUTO_CODIGO AND E.LOJA = R.LOJA
-    WHERE R.LOJA = {loja}
-      AND R.CADASTRO BETWEEN '{inicio_str}' AND '{fim_str}'
-      AND R.SITUACAO = 'FECHADO'
-)
-SELECT 
-    CADASTRO,
-    ROMANEIO,
-    LOJA,
-    MODO,
-    PRODUTO_CODIGO,
-    CODIGO_X,
-    CODIGO_SEQUENCIA,
-    CURVA_PRODUTO,
-    LOJA_CURVA,
-    QUANTIDADE,
-    VALOR_UNIDADE
-FROM CTE
-WHERE RN = 1;
-    """
-    return query
-
 # =======================
 # FUNÇÕES DE PROCESSAMENTO E VISUALIZAÇÃO
 # =======================
@@ -248,12 +176,20 @@ def create_stacked_bar_chart_percent(data, x_col, modos_perc, titulo, x_label, c
     
     return fig
 
-def process_visualizacao(engine, data_inicio, data_fim, loja, titulo, periodo):
+@cache_por_loja(ttl=3600)
+def carregar_dados(_engine, lojas, data_inicio, data_fim):
+    """Romaneios das lojas no período com o modo de venda final (cada loja fica no cache)"""
+    return modo_venda.romaneios(_engine, data_inicio, data_fim, lojas)
+
+def process_visualizacao(engine, data_inicio, data_fim, lojas, titulo, periodo):
     """
     Executa a query, processa os dados e chama a função de geração do gráfico e tabelas.
     """
-    query = gerar_query_dados(data_inicio, data_fim, loja)
-    df = executar_query(engine, query)
+    try:
+        df = carregar_dados(engine, lojas, data_inicio, data_fim)
+    except Exception as e:
+        st.error(f"Erro ao executar a query: {e}")
+        df = pd.DataFrame()
     if df.empty:
         st.warning("Nenhum dado encontrado para o período selecionado.")
     else:
@@ -271,10 +207,6 @@ def gerar_grafico(df, titulo, data_inicio, data_fim, periodo):
                 (df['CADASTRO'] <= pd.Timestamp(data_fim))]
         df['MODO'] = df['MODO'].astype(str)
         
-        # Se algum ROMANEIO tiver 'CASADA', todos viram 'CASADA'
-        romaneios_casada = df.loc[df['MODO'] == 'CASADA', 'ROMANEIO'].unique()
-        df.loc[df['ROMANEIO'].isin(romaneios_casada), 'MODO'] = 'CASADA'
-        
         periodo_data_str = f"{data_inicio.strftime('%d/%m/%Y')} - {data_fim.strftime('%d/%m/%Y')}"
         
         if periodo == "Ano":
@@ -500,12 +432,8 @@ def main():
     loja_dict = dict(zip(df_lojas['codigo'], df_lojas['nome']))
     
     st.sidebar.write("## Selecione os parâmetros")
-    loja_selecionada = st.sidebar.selectbox(
-        "Selecione a loja",
-        options=list(loja_dict.keys()),
-        format_func=lambda x: loja_dict[x],
-        key="mnavh_loja"
-    )
+    lojas_selecionadas = selecionar_lojas(loja_dict, key="mnavh_lojas")
+    nome_lojas = descrever_lojas(lojas_selecionadas, loja_dict)
     
     navegacao = st.sidebar.radio("Navegação", options=["Ano", "Mês", "Selecione data"], key="mnavh_navegacao")
     
@@ -515,8 +443,8 @@ def main():
         data_inicio = datetime(ano_selecionado, 1, 1)
         data_fim = datetime(ano_selecionado, 12, 31)
         # if st.sidebar.button("Gerar gráfico e tabela"):
-        titulo = f"Vendas por Mês - {ano_selecionado}"
-        process_visualizacao(engine, data_inicio, data_fim, loja_selecionada, titulo, "Ano")
+        titulo = f"Vendas por Mês - {ano_selecionado} - {nome_lojas}"
+        process_visualizacao(engine, data_inicio, data_fim, lojas_selecionadas, titulo, "Ano")
                 
     elif navegacao == "Mês":
         anos = obter_ultimos_anos()
@@ -528,8 +456,8 @@ def main():
         _, ultimo_dia = calendar.monthrange(ano_selecionado, mes_index)
         data_fim = datetime(ano_selecionado, mes_index, ultimo_dia)
         # if st.sidebar.button("Gerar gráfico e tabela"):
-        titulo = f"Vendas por Semana - {mes_selecionado}/{ano_selecionado}"
-        process_visualizacao(engine, data_inicio, data_fim, loja_selecionada, titulo, "Mês")
+        titulo = f"Vendas por Semana - {mes_selecionado}/{ano_selecionado} - {nome_lojas}"
+        process_visualizacao(engine, data_inicio, data_fim, lojas_selecionadas, titulo, "Mês")
                 
     elif navegacao == "Selecione data":
         st.sidebar.write("### Selecione o intervalo de datas para agrupar por semana")
@@ -544,8 +472,9 @@ def main():
         data_fim = datetime.combine(data_fim_input, datetime.max.time())
         
         # if st.sidebar.button("Gerar gráfico e tabela"):
-        titulo = f"Vendas por Semana: {data_inicio_input.strftime('%d/%m/%Y')} a {data_fim_input.strftime('%d/%m/%Y')}"
-        process_visualizacao(engine, data_inicio, data_fim, loja_selecionada, titulo, "Semana")
+        titulo = f"Vendas por Semana: {data_inicio_input.strftime('%d/%m/%Y')} a {data_fim_input.strftime('%d/%m/%Y')} - {nome_lojas}"
+        process_visualizacao(engine, data_inicio, data_fim, lojas_selecionadas, titulo, "Semana")
 
 if __name__ == "__main__":
-    main()
+    with medir_pagina("modo_vendas_sem_curva"):
+        main()
@@ -8,6 +8,9 @@ import requests
 import pandas as pd
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
+from core import refdata
+from core.formatacao import colunas_numericas, duracao_hms
+from core.metricas import medir_pagina, requisicao_medida
 
 class CobliAPI:
     def __init__(self):
@@ -29,7 +32,7 @@ class CobliAPI:
         }
 
         try:
-            response = requests.post(url, json=payload, headers=self.headers, timeout=30)
+            response = requisicao_medida("cobli", "idle-engine/vehicle", "post", url, json=payload, headers=self.headers, timeout=30)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -44,22 +47,13 @@ class CobliAPI:
         }
 
         try:
-            response = requests.get(url, headers=headers_get, timeout=30)
+            response = requisicao_medida("cobli", "vehicles", "get", url, headers=headers_get, timeout=30)
             response.raise_for_status()
             return response.json().get('data', [])
         except requests.exceptions.RequestException as e:
             st.error(f"Erro ao buscar lista de veículos: {e}")
             return []
 
-def minutes_to_hms(minutes):
-    if not minutes:
-        return "00:00:00"
-    total_seconds = int(minutes * 60)
-    hours = total_seconds // 3600
-    mins = (total_seconds % 3600) // 60
-    secs = total_seconds % 60
-    return f"{hours:02d}:{mins:02d}:{secs:02d}"
-
 def hms_to_minutes(hms_str):
     """Converte HH:MM:SS para minutos"""
     if not hms_str or hms_str == "00:00:00":
@@ -67,9 +61,6 @@ def hms_to_minutes(hms_str):
     parts = hms_str.split(':')
     return int(parts[0]) * 60 + int(parts[1]) + int(parts[2]) / 60
 
-def format_percentage(value):
-    return f"{value * 100:.2f}%" if value else "0.00%"
-
 # Função para criar conexão com o banco de dados
 def criar_conexao():
     config = st.secrets["connections"]["mysql"]
@@ -79,20 +70,9 @@ def criar_conexao():
 def get_entregadores_data():
     """Busca dados dos entregadores do banco"""
     try:
-        engine = criar_conexao()
-        query = """
-        SELECT
-            E.LOJA_PRINCIPAL,
-            E.DESCRICAO,
-            E.ENTREGADOR_TIPO,
-            E.COBL_CODE,
-            E.COBL_ID
-        FROM entregador E
-        WHERE E.ATIVO = 1
-        AND E.COBL_ID IS NOT NULL
-        AND E.COBL_ID != ''
-        """
-        return pd.read_sql(query, engine)
+        entregadores = refdata.entregadores(criar_conexao(), apenas_ativos=True, com_cobli=True)
+        colunas = ['LOJA_PRINCIPAL', 'DESCRICAO', 'ENTREGADOR_TIPO', 'COBL_CODE', 'COBL_ID']
+        return entregadores[colunas].reset_index(drop=True)
     except Exception as e:
         st.error(f"Erro ao conectar com o banco: {e}")
         return pd.DataFrame()
@@ -155,13 +135,13 @@ def main():
             'marca': item['vehicle']['brand'],
             'modelo': item['vehicle']['model'],
             'tempo_ocioso_min': item['total_idle_in_minutes'],
-            'tempo_ocioso': minutes_to_hms(item['total_idle_in_minutes']),
             'percentual_ocioso': item['percentage_idle'],
             'percentual_uso_motor': item['percentage_engine_usage'],
-            'consumo_combustivel': f"{item['fuel_consumption']:.2f}L",
-            'custo_combustivel': f"R$ {item['fuel_costs']:.2f}",
+            'consumo_combustivel': item['fuel_consumption'],
+            'custo_combustivel': item['fuel_costs'],
             'total_paradas': item['total_stop_count']
         } for item in motor_data])
+        motor_df['tempo_ocioso'] = duracao_hms(motor_df['tempo_ocioso_min'])
         
         vehicles_df = pd.DataFrame([{
             'lista_id': vehicle['id'],
@@ -202,7 +182,7 @@ def main():
         ranking_motoristas = merged_df.groupby(['DESCRICAO', 'LOJA_PRINCIPAL']).agg({
             'tempo_ocioso_min': 'sum'
         }).reset_index()
-        ranking_motoristas['Tempo Ocioso'] = ranking_motoristas['tempo_ocioso_min'].apply(minutes_to_hms)
+        ranking_motoristas['Tempo Ocioso'] = duracao_hms(ranking_motoristas['tempo_ocioso_min'])
         ranking_motoristas = ranking_motoristas.rename(columns={
             'DESCRICAO': 'Motorista',
             'LOJA_PRINCIPAL': 'Loja'
@@ -212,7 +192,7 @@ def main():
         ranking_lojas = merged_df.groupby('LOJA_PRINCIPAL').agg({
             'tempo_ocioso_min': 'sum'
         }).reset_index()
-        ranking_lojas['Tempo Ocioso'] = ranking_lojas['tempo_ocioso_min'].apply(minutes_to_hms)
+        ranking_lojas['Tempo Ocioso'] = duracao_hms(ranking_lojas['tempo_ocioso_min'])
         ranking_lojas = ranking_lojas.rename(columns={'LOJA_PRINCIPAL': 'Loja'})
         
         # Layout em 2 colunas
@@ -265,7 +245,10 @@ def main():
         individual_df['grupo_num'] = individual_df['Grupo'].str.extract(r'(\d+)').fillna(0).astype(int)
         individual_df = individual_df.sort_values(['grupo_num', 'Placa']).drop('grupo_num', axis=1)
         
-        st.dataframe(individual_df, use_container_width=True)
+        st.dataframe(individual_df, use_container_width=True, column_config={
+            **colunas_numericas(moeda=['Custo Combustível']),
+            'Consumo (L)': st.column_config.NumberColumn('Consumo (L)', format="%.2fL"),
+        })
         
         # Tabela agrupada
         st.subheader("📊 Dados Agrupados por Grupo e Motorista")
@@ -273,31 +256,31 @@ def main():
         # Filtrar apenas registros com motorista válido para agrupamento
         merged_valid = merged_df[merged_df['DESCRICAO'].notna()]
         
-        # Agrupar dados
-        grouped_data = []
-        for (grupo, motorista, loja), group in merged_valid.groupby(['grupo_nome', 'DESCRICAO', 'LOJA_PRINCIPAL']):
-            total_tempo_min = group['tempo_ocioso_min'].sum()
-            avg_percentual_ocioso = group['percentual_ocioso'].mean()
-            avg_percentual_uso = group['percentual_uso_motor'].mean()
-            total_veiculos = len(group)
-            
-            grouped_data.append({
-                'Grupo': grupo,
-                'Motorista': motorista,
-                'Loja': loja,
-                'Tempo Total Ocioso': minutes_to_hms(total_tempo_min),
-                '% Ocioso Médio': format_percentage(avg_percentual_ocioso),
-                '% Uso Motor Médio': format_percentage(avg_percentual_uso),
-                'Qtd Veículos': total_veiculos
-            })
-        
-        grouped_df = pd.DataFrame(grouped_data)
+        # Agrupar dados (percentuais em 0-100 para o column_config)
+        grouped_df = merged_valid.groupby(['grupo_nome', 'DESCRICAO', 'LOJA_PRINCIPAL']).agg(
+            tempo_min=('tempo_ocioso_min', 'sum'),
+            percentual_ocioso=('percentual_ocioso', 'mean'),
+            percentual_uso=('percentual_uso_motor', 'mean'),
+            veiculos=('motor_id', 'size'),
+        ).reset_index()
+        grouped_df = pd.DataFrame({
+            'Grupo': grouped_df['grupo_nome'],
+            'Motorista': grouped_df['DESCRICAO'],
+            'Loja': grouped_df['LOJA_PRINCIPAL'],
+            'Tempo Total Ocioso': duracao_hms(grouped_df['tempo_min']),
+            '% Ocioso Médio': grouped_df['percentual_ocioso'].fillna(0) * 100,
+            '% Uso Motor Médio': grouped_df['percentual_uso'].fillna(0) * 100,
+            'Qtd Veículos': grouped_df['veiculos'],
+        })
         
         # Ordenar por grupo
         grouped_df['grupo_num'] = grouped_df['Grupo'].str.extract(r'(\d+)').fillna(0).astype(int)
         grouped_df = grouped_df.sort_values(['grupo_num', 'Motorista']).drop('grupo_num', axis=1)
         
-        st.dataframe(grouped_df, use_container_width=True)
+        st.dataframe(grouped_df, use_container_width=True,
+                     column_config=colunas_numericas(percentuais=['% Ocioso Médio', '% Uso Motor Médio'],
+                                                     inteiros=['Qtd Veículos']))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("motorista_ocioso"):
+        main()
\ No newline at end of file
@@ -1,5 +1,7 @@
-import pandas as pd
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core.metricas import medir_pagina
+from core.formatacao import numero_br, percentual_br
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
@@ -39,7 +41,7 @@ def conectar_db(usar_streamlit=True):
 def executar_query(engine, query):
     """Executa query no banco e retorna DataFrame"""
     try:
-        df = pd.read_sql(query, con=engine)
+        df = DatabaseManager.read_sql(query, con=engine)
         return df
     except Exception as e:
         st.error(f"Erro na query: {e}")
@@ -83,7 +85,7 @@ def criar_graficos(df_todos, df_disponivel):
         name='Todos os Produtos',
         x=df_todos_graf.index,
         y=df_todos_graf['Cobertura %'],
-        text=df_todos_graf['Cobertura %'].astype(str) + '%',
+        text=percentual_br(df_todos_graf['Cobertura %']),
         textposition='auto',
         marker_color='lightblue'
     ))
@@ -92,7 +94,7 @@ def criar_graficos(df_todos, df_disponivel):
         name='Produtos Disponíveis',
         x=df_disponivel_graf.index,
         y=df_disponivel_graf['Cobertura %'],
-        text=df_disponivel_graf['Cobertura %'].astype(str) + '%',
+        text=percentual_br(df_disponivel_graf['Cobertura %']),
         textposition='auto',
         marker_color='darkblue'
     ))
@@ -143,14 +145,14 @@ def criar_metricas_cards(df_todos, df_disponivel):
     with col1:
         st.metric(
             label="Total de Produtos",
-            value=f"{total_produtos:,}".replace(',', '.'),
+            value=numero_br([total_produtos])[0],
             help="Todos os produtos cadastrados"
         )
     
     with col2:
         st.metric(
             label="Produtos Disponíveis",
-            value=f"{total_disponivel:,}".replace(',', '.'),
+            value=numero_br([total_disponivel])[0],
             help="Produtos com estoque > 0"
         )
     
@@ -249,10 +251,9 @@ def analisar_cobertura_produtos():
         
         # Formata tabela para melhor visualização
         df_formato = resultado_todos.copy()
-        df_formato['Sem Fraga'] = df_formato['Sem Fraga'].astype(int).apply(lambda x: f"{x:,}".replace(',', '.'))
-        df_formato['Com Fraga'] = df_formato['Com Fraga'].astype(int).apply(lambda x: f"{x:,}".replace(',', '.'))
-        df_formato['Total Itens'] = df_formato['Total Itens'].astype(int).apply(lambda x: f"{x:,}".replace(',', '.'))
-        df_formato['Cobertura %'] = df_formato['Cobertura %'].astype(str) + '%'
+        for coluna in ['Sem Fraga', 'Com Fraga', 'Total Itens']:
+            df_formato[coluna] = numero_br(df_formato[coluna])
+        df_formato['Cobertura %'] = percentual_br(df_formato['Cobertura %'])
         
         st.dataframe(
             df_formato,
@@ -265,10 +266,9 @@ def analisar_cobertura_produtos():
         
         # Formata tabela para melhor visualização
         df_formato2 = resultado_disponivel.copy()
-        df_formato2['Sem Fraga'] = df_formato2['Sem Fraga'].astype(int).apply(lambda x: f"{x:,}".replace(',', '.'))
-        df_formato2['Com Fraga'] = df_formato2['Com Fraga'].astype(int).apply(lambda x: f"{x:,}".replace(',', '.'))
-        df_formato2['Total Itens'] = df_formato2['Total Itens'].astype(int).apply(lambda x: f"{x:,}".replace(',', '.'))
-        df_formato2['Cobertura %'] = df_formato2['Cobertura %'].astype(str) + '%'
+        for coluna in ['Sem Fraga', 'Com Fraga', 'Total Itens']:
+            df_formato2[coluna] = numero_br(df_formato2[coluna])
+        df_formato2['Cobertura %'] = percentual_br(df_formato2['Cobertura %'])
         
         st.dataframe(
             df_formato2,
@@ -307,10 +307,11 @@ def analisar_cobertura_produtos():
     with col2:
         st.warning(f"**Curva menos coberta**: Curva {curva_menos_coberta} com {valor_menos_coberta:.1f}%")
         if produtos_sem_curva > 0:
-            st.warning(f"**Produtos sem curva**: {produtos_sem_curva:,} itens (Curva Z)".replace(',', '.'))
+            st.warning(f"**Produtos sem curva**: {numero_br([produtos_sem_curva])[0]} itens (Curva Z)")
         else:
             st.success("**Todos os produtos têm curva definida!**")
 
 # Execução principal
 if __name__ == "__main__":
-    analisar_cobertura_produtos()
\ No newline at end of file
+    with medir_pagina("produto_cruzado_fraga"):
+        analisar_cobertura_produtos()
\ No newline at end of file
@@ -1,8 +1,10 @@
-import pandas as pd
 import streamlit as st
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 from sqlalchemy import create_engine
+from core.cache import guardar_na_sessao
+from core.db import DatabaseManager
+from core.metricas import medir_pagina
 from datetime import date
 
 def conectar_banco():
@@ -23,7 +25,7 @@ def buscar_dados_compras(engine, data_inicio, data_fim):
                 WHERE cadastro BETWEEN '{data_inicio} 00:00:00' AND '{data_fim} 23:59:59'
                 GROUP BY LOJA, OPERACAO_DESCRICAO, MONTH(CADASTRO)'''
     
-    return pd.read_sql(query, con=engine)
+    return DatabaseManager.read_sql(query, con=engine)
 
 def filtrar_mercadorias(df):
     """Filtra apenas operações de mercadoria, excluindo consumo e comodato"""
@@ -199,9 +201,9 @@ def main():
                         df_loja, df_operacao = agrupar_dados(df_filtrado)
                         
                         # Armazenar no session_state
-                        st.session_state.df_pivot = df_pivot
-                        st.session_state.df_loja = df_loja
-                        st.session_state.df_operacao = df_operacao
+                        guardar_na_sessao('df_pivot', df_pivot)
+                        guardar_na_sessao('df_loja', df_loja)
+                        guardar_na_sessao('df_operacao', df_operacao)
                         
                         st.success(f'Dados carregados! Período: {data_inicio} a {data_fim}')
                         
@@ -226,4 +228,5 @@ def main():
             st.pyplot(fig2)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with medir_pagina("proporcao_compras_transferencias"):
+        main()
\ No newline at end of file
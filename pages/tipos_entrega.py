@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
+import plotly.express as px
 import plotly.graph_objects as go
 from sqlalchemy import create_engine
+from core.db import DatabaseManager
+from core import refdata
+from core.transformacoes import combinar_tipos_entrega
+from core.venda_casada import fato_venda_casada
 from datetime import datetime, date
 
 # Configuração da página
@@ -24,20 +29,9 @@ def criar_conexao():
     return create_engine(url)
 
 # Função para obter lojas
-@st.cache_data
 def obter_lojas_disponiveis():
     try:
-        engine = criar_conexao()
-        query = """
-            SELECT DISTINCT E.LOJA 
-            FROM expedicao_itens EI 
-            LEFT JOIN expedicao E ON EI.EXPEDICAO_CODIGO = E.expedicao 
-                AND EI.EXPEDICAO_LOJA = E.LOJA
-            WHERE E.LOJA IS NOT NULL
-            ORDER BY E.LOJA
-        """
-        result = pd.read_sql_query(query, engine)
-        return result['LOJA'].tolist()
+        return refdata.codigos_lojas(criar_conexao())
     except:
         return list(range(1, 14))
 
@@ -93,25 +87,12 @@ def executar_query(query_tipo, loja_filtro, data_inicio, data_fim):
         GROUP BY E.LOJA, E.SITUACAO, EI.EXPEDICAO_TIPO, N.DESCRICAO, C.NOME, E.HORA_SAIDA, E.CADASTRO
         """
     
-    return pd.read_sql_query(query, engine)
+    return DatabaseManager.read_sql(query, engine)
 
-# Função para obter dados de venda casada
+# Função para obter dados de venda casada (core.venda_casada, compartilhado com entrega_e_rota)
 def obter_venda_casada(loja_filtro, data_inicio, data_fim):
-    engine = criar_conexao()
-    
-    query = f"""
-    SELECT b.LOJA, DATE_FORMAT(b.cadastro, '%%Y-%%m') as MES_ANO, 
-           SUM(CASE WHEN a.COMPRA_PEDIDO IS NOT NULL THEN 1 ELSE 0 END) AS VENDA_CASADA
-    FROM romaneios_dbf b
-    LEFT JOIN compras_pedidos a ON a.romaneio_codigo = b.ROMANEIO 
-        AND a.ROMANEIO_LOJA = b.LOJA
-    JOIN movimentos_operacoes o ON b.OPERACAO_CODIGO = o.CODIGO
-    WHERE b.cadastro BETWEEN '{data_inicio}' AND '{data_fim}'
-    {f"AND b.LOJA IN ({','.join(map(str, loja_filtro))})" if loja_filtro else ""}
-    GROUP BY b.LOJA, DATE_FORMAT(b.cadastro, '%%Y-%%m')
-    """
-    
-    return pd.read_sql_query(query, engine)
+    df = fato_venda_casada(criar_conexao(), data_inicio, data_fim, lojas=loja_filtro)
+    return df[['LOJA', 'MES_ANO', 'VENDA_CASADA']]
 
 # Função para obter dados para gráfico comparativo (ATUALIZADA - TOTAL = CLIENTES + ROTA + VENDA_CASADA)
 def obter_dados_comparativo(loja_filtro, data_inicio, data_fim):
@@ -171,34 +152,15 @@ def obter_dados_comparativo(loja_filtro, data_inicio, data_fim):
     GROUP BY E.LOJA, DATE_FORMAT(E.CADASTRO, '%%Y-%%m')
     """
     
-    df_40 = pd.read_sql_query(query_40, engine)
-    df_clientes = pd.read_sql_query(query_clientes, engine)
-    df_rota = pd.read_sql_query(query_rota, engine)
+    df_40 = DatabaseManager.read_sql(query_40, engine)
+    df_clientes = DatabaseManager.read_sql(query_clientes, engine)
+    df_rota = DatabaseManager.read_sql(query_rota, engine)
 
     # Obter dados de venda casada
     df_venda_casada = obter_venda_casada(loja_filtro, data_inicio, data_fim)
 
-    # Calcular TOTAL como CLIENTES + ROTA + VENDA_CASADA
-    # Primeiro, criar um DataFrame com todas as combinações de LOJA e MES_ANO
-    all_combinations = set()
-    for df in [df_clientes, df_rota, df_venda_casada]:
-        if not df.empty:
-            for _, row in df.iterrows():
-                all_combinations.add((row['LOJA'], row['MES_ANO']))
-
-    # Criar DataFrame de totais
-    total_data = []
-    for loja, mes_ano in all_combinations:
-        clientes_val = df_clientes[(df_clientes['LOJA'] == loja) & (df_clientes['MES_ANO'] == mes_ano)]['CLIENTES'].sum()
-        rota_val = df_rota[(df_rota['LOJA'] == loja) & (df_rota['MES_ANO'] == mes_ano)]['ROTA'].sum()
-        venda_casada_val = df_venda_casada[(df_venda_casada['LOJA'] == loja) & (df_venda_casada['MES_ANO'] == mes_ano)]['VENDA_CASADA'].sum()
-
-        total = clientes_val + rota_val + venda_casada_val
-        total_data.append({'LOJA': loja, 'MES_ANO': mes_ano, 'TOTAL': total})
-
-    df_total = pd.DataFrame(total_data)
-
-    return df_total, df_40, df_clientes, df_rota, df_venda_casada
+    # Uma linha por (LOJA, MES_ANO) com todos os tipos; TOTAL = CLIENTES + ROTA + VENDA_CASADA
+    return combinar_tipos_entrega(df_40, df_clientes, df_rota, df_venda_casada)
 
 # Interface do usuário
 st.title("📊 Dashboard de Análise de Entregas")
@@ -311,44 +273,23 @@ if not df.empty:
     st.header("📊 Gráfico Comparativo por Loja")
     
     with st.spinner("Carregando dados comparativos..."):
-        df_total, df_40, df_clientes, df_rota, df_venda_casada = obter_dados_comparativo(lojas_selecionadas, data_inicio, data_fim)
+        df_tipos = obter_dados_comparativo(lojas_selecionadas, data_inicio, data_fim)
     
     # Seleção de loja para gráfico comparativo
-    lojas_para_grafico = sorted(df_total['LOJA'].unique())
+    lojas_para_grafico = sorted(df_tipos['LOJA'].unique())
     loja_selecionada = st.selectbox("Selecionar Loja para Gráfico Comparativo:", lojas_para_grafico)
     
     if loja_selecionada:
-        # Preparar dados para gráfico
-        total_entrega = df_total[df_total['LOJA'] == loja_selecionada].set_index('MES_ANO')['TOTAL']
-        entrega_40 = df_40[df_40['LOJA'] == loja_selecionada].set_index('MES_ANO')['ENTREGA_40']
-        clientes = df_clientes[df_clientes['LOJA'] == loja_selecionada].set_index('MES_ANO')['CLIENTES']
-        soma_total_rota = df_rota[df_rota['LOJA'] == loja_selecionada].set_index('MES_ANO')['ROTA']
-        soma_total_venda_casada = df_venda_casada[df_venda_casada['LOJA'] == loja_selecionada].set_index('MES_ANO')['VENDA_CASADA']
-        
-        # Criar DataFrame unificado
-        todos_meses = sorted(set(total_entrega.index) | set(entrega_40.index) | set(clientes.index) | 
-                           set(soma_total_rota.index) | set(soma_total_venda_casada.index))
+        # Meses da loja, já com todos os tipos (zerados onde não houve entrega)
+        dados_grafico = df_tipos[df_tipos['LOJA'] == loja_selecionada]
         
         fig = go.Figure()
         
-        if todos_meses:
-            # Reindexar para ter todos os meses
-            total_entrega = total_entrega.reindex(todos_meses, fill_value=0)
-            entrega_40 = entrega_40.reindex(todos_meses, fill_value=0)
-            clientes = clientes.reindex(todos_meses, fill_value=0)
-            soma_total_rota = soma_total_rota.reindex(todos_meses, fill_value=0)
-            soma_total_venda_casada = soma_total_venda_casada.reindex(todos_meses, fill_value=0)
-            
-            fig.add_trace(go.Bar(x=todos_meses, y=total_entrega.values, name='Total', 
-                               text=total_entrega.values, textposition='auto'))
-            fig.add_trace(go.Bar(x=todos_meses, y=entrega_40.values, name='Entrega 40', 
-                               text=entrega_40.values, textposition='auto'))
-            fig.add_trace(go.Bar(x=todos_meses, y=clientes.values, name='Clientes', 
-                               text=clientes.values, textposition='auto'))
-            fig.add_trace(go.Bar(x=todos_meses, y=soma_total_rota.values, name='Rota', 
-                               text=soma_total_rota.values, textposition='auto'))
-            fig.add_trace(go.Bar(x=todos_meses, y=soma_total_venda_casada.values, name='Venda Casada', 
-                               text=soma_total_venda_casada.values, textposition='auto'))
+        if not dados_grafico.empty:
+            for coluna, nome in [('TOTAL', 'Total'), ('ENTREGA_40', 'Entrega 40'), ('CLIENTES', 'Clientes'),
+                                 ('ROTA', 'Rota'), ('VENDA_CASADA', 'Venda Casada')]:
+                fig.add_trace(go.Bar(x=dados_grafico['MES_ANO'], y=dados_grafico[coluna], name=nome,
+                                   text=dados_grafico[coluna], textposition='auto'))
         else:
             st.warning("Não há dados suficientes para a loja selecionada.")
         
@@ -411,32 +352,18 @@ if not df.empty:
             '#3498DB'   # Azul céu
         ]
         
-        # Criar lista de cores baseada no número de lojas
-        num_lojas = len(dados_loja)
-        cores_barras = cores_neutras[:num_lojas]
-        if num_lojas > len(cores_neutras):
-            # Se há mais lojas que cores, repetir as cores
-            cores_barras = (cores_neutras * ((num_lojas // len(cores_neutras)) + 1))[:num_lojas]
-        
-        fig_loja = go.Figure()
-        
-        # Adicionar uma barra para cada loja com cor diferente e legenda
-        for i, (_, row) in enumerate(dados_loja.iterrows()):
-            fig_loja.add_trace(go.Bar(
-                x=[f'Loja {row["LOJA"]}'],
-                y=[row['ENTREGA']],
-                text=[row['ENTREGA']],
-                textposition='auto',
-                name=f'Loja {row["LOJA"]}',
-                marker=dict(color=cores_barras[i]),
-                showlegend=True
-            ))
+        # Uma barra (e uma entrada de legenda) por loja; as cores se repetem se houver mais lojas que cores
+        dados_loja['ROTULO'] = 'Loja ' + dados_loja['LOJA'].astype(str)
+        fig_loja = px.bar(dados_loja, x='ROTULO', y='ENTREGA', color='ROTULO', text='ENTREGA',
+                          color_discrete_sequence=cores_neutras)
+        fig_loja.update_traces(textposition='auto')
         
         fig_loja.update_layout(
             title=f'{tipo_analise} - Total por Loja (Todas as Lojas)',
             xaxis_title='Loja',
             yaxis_title='Total de Entregas',
             showlegend=True,
+            legend_title_text='Loja',
             legend=dict(
                 orientation="v",
                 yanchor="top",
@@ -1,5 +1,6 @@
 import streamlit as st
-import requests
+from core.cache import cache_data
+from core.metricas import requisicao_medida
 import pandas as pd
 from datetime import datetime
 
@@ -23,12 +24,12 @@ HEADERS = {
     "cobli-api-key": API_KEY
 }
 
-@st.cache_data(ttl=300)
+@cache_data(ttl=300)
 def get_api_data(endpoint):
     """Função para fazer requisições à API"""
     url = f"https://api.cobli.co/public/v1/{endpoint}?limit=2000&page=1"
     try:
-        response = requests.get(url, headers=HEADERS)
+        response = requisicao_medida("cobli", endpoint, "get", url, headers=HEADERS)
         if response.status_code == 200:
             return response.json()['data']
         else:
@@ -38,12 +39,12 @@ def get_api_data(endpoint):
         st.error(f"Erro na requisição {endpoint}: {e}")
         return []
 
-@st.cache_data(ttl=300)
+@cache_data(ttl=300)
 def get_device_details(device_id):
     """Busca detalhes específicos do dispositivo"""
     url = f"https://api.cobli.co/herbie-1.1/dash/device/{device_id}"
     try:
-        response = requests.get(url, headers=HEADERS)
+        response = requisicao_medida("cobli", "dash/device", "get", url, headers=HEADERS)
         if response.status_code == 200:
             return response.json()
         return {}
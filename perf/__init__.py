@@ -0,0 +1 @@
+"""Ferramentas de teste de desempenho dos painéis (base sintética, benchmarks e carga)."""
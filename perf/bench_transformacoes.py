@@ -0,0 +1,312 @@
+"""
+Micro-benchmarks das transformações das páginas (core.transformacoes), sem
+Streamlit e sem banco.
+
+Cada transformação recebe DataFrames sintéticos com as mesmas colunas e tipos que
+as consultas das páginas devolvem, em tamanhos crescentes (10k, 1M e 10M linhas).
+Para cada tamanho são medidos o tempo mediano, o custo por linha e a memória
+extra no pico; o expoente de escala entre tamanhos consecutivos mostra se o
+custo cresce de forma linear (~1,0) ou pior. O resultado é comparado com o
+baseline em perf/baselines/transformacoes.json e a execução termina com código 1
+se alguma transformação regredir além da tolerância.
+
+    python -m perf.bench_transformacoes
+    python -m perf.bench_transformacoes --tamanhos 10k 1M 10M --casos aggregate_data
+    python -m perf.bench_transformacoes --atualizar-baseline
+"""
+from datetime import date, timedelta
+import argparse
+import calendar
+import gc
+import math
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core import transformacoes as tf
+
+TAMANHOS = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+
+TOLERANCIAS = {"tempo_s": 0.30, "pico_mb": 0.25}
+# Diferenças absolutas abaixo destas são ruído de medição
+MINIMOS = {"tempo_s": 0.02, "pico_mb": 20}
+
+LOJAS = np.arange(1, 14)
+ANOS = 3
+
+
+# =======================
+# DADOS SINTÉTICOS
+# =======================
+def _datas(rng, n: int) -> np.ndarray:
+    """Instantes distribuídos nos últimos ANOS anos, em datetime64[s]"""
+    fim = np.datetime64(date.today(), "s")
+    segundos = rng.integers(0, ANOS * 365 * 86400, n)
+    return fim - segundos.astype("timedelta64[s]")
+
+
+def _amostra(rng, valores: list, n: int) -> np.ndarray:
+    """Array object com valores repetidos de uma lista pequena, como vem do read_sql"""
+    return np.array(valores, dtype=object)[rng.integers(0, len(valores), n)]
+
+
+def _lojas(rng, n: int) -> np.ndarray:
+    return rng.choice(LOJAS, n)
+
+
+def _anos_interesse() -> list:
+    ano = date.today().year
+    return list(range(ano - ANOS + 1, ano + 1))
+
+
+def dados_abastecimento(rng, n: int):
+    litros_1 = rng.uniform(5, 60, n).round(2)
+    litros_2 = np.where(rng.random(n) < 0.1, rng.uniform(5, 40, n).round(2), np.nan)
+    df = pd.DataFrame({
+        "CODIGO": np.arange(n),
+        "LOJA": _lojas(rng, n),
+        "CADASTRO": _datas(rng, n),
+        "VALOR_TOTAL": (litros_1 * 5.9).round(2),
+        "COMBUSTIVEL_1_LITROS": litros_1,
+        "COMBUSTIVEL_2_LITROS": litros_2,
+        "PLACA": _amostra(rng, [f"ABC{i:04d}" for i in range(104)], n),
+        "CRIADO_POR": _amostra(rng, ["FROTA", "ADMIN", "CAIXA"], n),
+        "ALTERADO": _datas(rng, n),
+        "ALTERADO_POR": _amostra(rng, ["FROTA", "ADMIN"], n),
+    })
+    return (df, _anos_interesse()), {}
+
+
+def dados_tabela_anual(rng, n: int):
+    df = pd.DataFrame({
+        "ANO": rng.choice(_anos_interesse(), n),
+        "MES": rng.integers(1, 13, n),
+        "VALOR_TOTAL": rng.uniform(1_000, 90_000, n).round(2),
+    })
+    return (df, _anos_interesse()), {}
+
+
+def dados_tabela_semanal(rng, n: int):
+    df = pd.DataFrame({
+        "ANO": rng.choice(_anos_interesse(), n),
+        "SEMANA": rng.integers(1, 6, n),
+        "TOTAL_COMBUSTIVEL": rng.uniform(10, 900, n).round(2),
+    })
+    return (df, "SEMANA", "TOTAL_COMBUSTIVEL"), {"total": "Total Mês"}
+
+
+def dados_entregas(rng, n: int):
+    hoje = date.today()
+    meses = [f"{hoje.year}-{m:02d}" for m in range(1, 4)]
+    df = pd.DataFrame({
+        "LOJA": _lojas(rng, n),
+        "MES": _amostra(rng, meses, n),
+        "ROTA_STATUS": _amostra(rng, ["ENTREGUE"] * 9 + ["CANCELADO"], n),
+        "MINUTOS_ENTREGA": rng.gamma(2.0, 18.0, n).round(),
+    })
+    return (df,), {}
+
+
+def dados_tipos_entrega(rng, n: int):
+    # n linhas por consulta; as chaves (LOJA, MES_ANO) se repetem dentro e entre as consultas
+    meses = [str(p) for p in pd.period_range(end=pd.Period(date.today(), "M"), periods=ANOS * 12, freq="M")]
+
+    def _consulta(coluna):
+        return pd.DataFrame({"LOJA": _lojas(rng, n), "MES_ANO": _amostra(rng, meses, n),
+                             coluna: rng.integers(0, 5_000, n)})
+
+    return tuple(_consulta(tipo) for tipo in tf.TIPOS_ENTREGA), {}
+
+
+def dados_custos_entrega(rng, n: int):
+    periodos = pd.period_range(end=pd.Period(date.today(), "M"), periods=ANOS * 12, freq="M")
+
+    def _periodos(k):
+        return periodos[rng.integers(0, len(periodos), k)]
+
+    custos = pd.DataFrame({"LOJA": _lojas(rng, n), "PERIODO": _periodos(n),
+                           "custo_entregadores": rng.uniform(50, 3_000, n).round(2)})
+    rate = pd.DataFrame({"LOJA": _lojas(rng, n), "PERIODO": _periodos(n),
+                         "VALOR_CUSTO_LOJA": rng.uniform(10, 800, n).round(2)})
+    romaneio = pd.MultiIndex.from_product([LOJAS, periodos], names=["LOJA", "PERIODO"]).to_frame(index=False)
+    romaneio["total_expedicoes"] = rng.integers(0, 4_000, len(romaneio))
+    inicio = periodos[0].start_time.date()
+    return (custos, rate, romaneio), {"data_inicio": inicio, "data_fim": date.today()}
+
+
+def dados_custo_frota(rng, n: int):
+    placas = [f"{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}C-{1000 + i}" for i in range(104)]
+    citadas = _amostra(rng, placas + [""] * 52, n)
+    obs = _amostra(rng, ["TROCA DE OLEO ", "PNEU ", "REVISAO ", "PASTILHA FREIO "], n) + citadas
+    nfes = pd.DataFrame({"LOJA": _lojas(rng, n), "EMISSAO": _datas(rng, n),
+                         "VALOR_TOTAL": rng.uniform(20, 2_500, n).round(2), "OBS": obs})
+    periodos = pd.period_range(end=pd.Period(date.today(), "M"), periods=ANOS * 12, freq="M")
+    pedidos = pd.MultiIndex.from_product([LOJAS, periodos], names=["LOJA", "EMISSAO"]).to_frame(index=False)
+    pedidos["VALOR_TOTAL"] = rng.uniform(0, 15_000, len(pedidos)).round(2)
+    return (nfes, pd.DataFrame({"PLACA": placas}), pedidos), {}
+
+
+def _dados_mapa_calor(rng, n: int, tipo_metrica: str):
+    df = pd.DataFrame({
+        "mes": _amostra(rng, list(tf.MESES_NOMES.values()), n),
+        "dia_semana": _amostra(rng, tf.DIAS_SEMANA, n),
+        "ROMANEIO": rng.integers(0, max(n // 3, 1), n),
+        "valor": rng.gamma(2.0, 15.0, n).round(),
+    })
+    return (df, tipo_metrica, False), {}
+
+
+def dados_mapa_calor_quantidade(rng, n: int):
+    return _dados_mapa_calor(rng, n, "Quantidade de ROMANEIO")
+
+
+def dados_mapa_calor_mediana(rng, n: int):
+    return _dados_mapa_calor(rng, n, "Mediana MINUTOS_DE_SEPARACAO")
+
+
+def dados_custos_lojas(rng, n: int):
+    # Colunas DATE chegam do MySQL como objetos datetime.date
+    hoje = date.today()
+    dias = [hoje - timedelta(days=d) for d in range(ANOS * 365)]
+    df = pd.DataFrame({
+        "CODIGO": rng.integers(1, 400, n),
+        "DATA": _amostra(rng, dias, n),
+        "LOJA": _lojas(rng, n),
+        "CENTRO_CUSTO_DESCRICAO": _amostra(rng, ["ALUGUEL", "ENERGIA", "AGUA", "TELEFONE", "MATERIAL ESCRITORIO",
+                                                 "MANUTENCAO PREDIAL", "LIMPEZA", "SEGURANCA"], n),
+        "VALOR": rng.uniform(10, 5_000, n).round(2),
+    })
+    return (df,), {}
+
+
+# =======================
+# REFERÊNCIAS
+# =======================
+def tabela_anual_lacos(df, anos_interesse):
+    """generate_yearly_value_table antes de comparativo_anual (pivot + laço por par de anos), para comparação"""
+    df_pivot = df.pivot_table(index='ANO', columns='MES', values='VALOR_TOTAL', aggfunc='sum').fillna(0)
+    meses_map = {i: calendar.month_name[i] for i in range(1, 13)}
+    df_pivot.rename(columns=meses_map, inplace=True)
+    df_pivot['Total Ano'] = df_pivot.sum(axis=1)
+    colunas_ytd = [meses_map[m] for m in range(1, df['MES'].max() + 1)]
+    df_pivot['YTD'] = df_pivot[[c for c in colunas_ytd if c in df_pivot.columns]].sum(axis=1)
+    ordem = list(meses_map.values()) + ['Total Ano', 'YTD']
+    df_final = df_pivot[[c for c in ordem if c in df_pivot.columns]].copy()
+    anos_existentes = sorted(df_final.index)
+    for i in range(1, len(anos_existentes)):
+        ano_atual, ano_ant = anos_existentes[i], anos_existentes[i - 1]
+        diff = df_final.loc[ano_atual] - df_final.loc[ano_ant]
+        df_final.loc[f"Var% {ano_atual}x{ano_ant}"] = (diff / df_final.loc[ano_ant].replace(0, np.nan)) * 100
+    df_final.index = df_final.index.map(str)
+    df_final.columns = df_final.columns.map(str)
+    return df_final.round(2)
+
+
+# Caso -> (função, gerador dos argumentos, maior tamanho medido)
+CASOS = {
+    "process_data_year_mode": (tf.process_data_year_mode, dados_abastecimento, None),
+    "generate_yearly_value_table": (tf.generate_yearly_value_table, dados_tabela_anual, None),
+    # Implementação anterior, para comparar com comparativo_anual nos mesmos dados
+    "tabela_anual[laços]": (tabela_anual_lacos, dados_tabela_anual, None),
+    "comparativo_anual[semanas]": (tf.comparativo_anual, dados_tabela_semanal, None),
+    "aggregate_data": (tf.aggregate_data, dados_entregas, None),
+    "consolidar_custos_entrega": (tf.consolidar_custos_entrega, dados_custos_entrega, None),
+    "combinar_tipos_entrega": (tf.combinar_tipos_entrega, dados_tipos_entrega, None),
+    # Casamento de placas em Python puro (placas x OBS); 10M linhas levaria horas
+    "agregar_custo_frota": (tf.agregar_custo_frota, dados_custo_frota, 1_000_000),
+    "criar_pivot[quantidade]": (tf.criar_pivot, dados_mapa_calor_quantidade, None),
+    "criar_pivot[mediana]": (tf.criar_pivot, dados_mapa_calor_mediana, None),
+    "resumir_custos": (tf.resumir_custos, dados_custos_lojas, None),
+}
+
+
+# =======================
+# MEDIÇÃO
+# =======================
+def medir(caso: str, linhas: int, repeticoes: int, semente: int) -> dict:
+    """Tempo mediano e memória extra no pico de uma transformação para um tamanho"""
+    from perf.comum import PicoMemoria
+
+    funcao, gerar, _ = CASOS[caso]
+    args, kwargs = gerar(np.random.default_rng(semente), linhas)
+    tempos, pico = [], 0
+    for _ in range(repeticoes):
+        gc.collect()
+        with PicoMemoria() as memoria:
+            inicio = time.perf_counter()
+            funcao(*args, **kwargs)
+            tempos.append(time.perf_counter() - inicio)
+        pico = max(pico, memoria.pico - memoria.inicial)
+    tempo = statistics.median(tempos)
+    return {
+        "linhas": linhas,
+        "tempo_s": round(tempo, 4),
+        "ns_por_linha": round(tempo / linhas * 1e9, 1),
+        "pico_mb": round(pico / 1024 ** 2, 1),
+    }
+
+
+def expoente_escala(a: dict, b: dict):
+    """Expoente k de tempo ~ linhas^k entre dois tamanhos (1,0 = linear)"""
+    if min(a["tempo_s"], b["tempo_s"]) <= 0 or a["linhas"] == b["linhas"]:
+        return None
+    return round(math.log(b["tempo_s"] / a["tempo_s"]) / math.log(b["linhas"] / a["linhas"]), 2)
+
+
+def _imprimir(caso: str, tamanho: str, r: dict, escala, regressoes: list):
+    situacao = "REGRESSÃO" if regressoes else "ok"
+    escala_txt = f"{escala:>5.2f}" if escala is not None else "    -"
+    print(f"{caso:<30} {tamanho:>4}  {r['tempo_s']:>9.3f}s  {r['ns_por_linha']:>9.1f} ns/linha  "
+          f"pico +{r['pico_mb']:>7.0f} MB  escala {escala_txt}  {situacao}")
+    for metrica, anterior, valor in regressoes:
+        print(f"    {metrica}: {anterior} -> {valor}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das transformações das páginas")
+    parser.add_argument("--tamanhos", nargs="*", default=["10k", "1M"], choices=list(TAMANHOS),
+                        help="Padrão: 10k e 1M (10M é opcional, exige alguns GB de memória)")
+    parser.add_argument("--casos", nargs="*", default=list(CASOS), help="Padrão: todos")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por tamanho (usa a mediana)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--atualizar-baseline", action="store_true")
+    args = parser.parse_args()
+
+    from perf.comum import carregar_baseline, salvar_baseline, comparar
+
+    baseline = carregar_baseline("transformacoes").get("resultados", {})
+    tamanhos = sorted(args.tamanhos, key=TAMANHOS.get)
+    resultados, falhou = {}, False
+    for caso in args.casos:
+        if caso not in CASOS:
+            print(f"{caso}: caso desconhecido")
+            continue
+        limite = CASOS[caso][2]
+        anterior = None
+        for tamanho in tamanhos:
+            if limite and TAMANHOS[tamanho] > limite:
+                print(f"{caso:<30} {tamanho:>4}  pulado (limite de {limite:,} linhas)")
+                continue
+            r = medir(caso, TAMANHOS[tamanho], args.repeticoes, args.semente)
+            escala = expoente_escala(anterior, r) if anterior else None
+            regressoes = comparar(r, baseline.get(caso, {}).get(tamanho, {}), TOLERANCIAS, MINIMOS)
+            falhou = falhou or bool(regressoes)
+            _imprimir(caso, tamanho, r, escala, regressoes)
+            resultados.setdefault(caso, {})[tamanho] = dict(r, escala=escala)
+            anterior = r
+
+    if args.atualizar_baseline:
+        # Mantém os tamanhos não medidos nesta execução
+        for caso, medidos in resultados.items():
+            baseline.setdefault(caso, {}).update(medidos)
+        salvar_baseline("transformacoes", baseline)
+        print("Baseline atualizado.")
+    elif falhou:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Utilitários compartilhados pelos benchmarks: manifesto da base sintética,
+memória de pico, secrets de teste e comparação com baselines em JSON.
+"""
+from datetime import date
+import json
+import os
+import threading
+
+from core.metricas import memoria_processo
+from perf.sintetico import CAMINHO_MANIFESTO, USUARIO_BENCHMARK
+
+DIR_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Usuário fictício das sessões de benchmark (também cadastrado no acessos_dbf da base sintética)
+USUARIO_TESTE = dict(zip(("name", "cargo", "email"), USUARIO_BENCHMARK))
+
+
+def ler_manifesto(caminho: str = CAMINHO_MANIFESTO) -> dict:
+    """Manifesto da última base sintética gerada (vazio se não houver)"""
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def data_referencia() -> date:
+    """Último dia da base sintética; os cenários escolhem períodos relativos a ele"""
+    fim = ler_manifesto().get("parametros", {}).get("fim")
+    return date.fromisoformat(fim) if fim else date.today()
+
+
+def secrets_mysql(url: str) -> dict:
+    """Bloco [connections.mysql] do secrets.toml equivalente à URL informada"""
+    from sqlalchemy.engine import make_url
+    u = make_url(url)
+    return {
+        "dialect": u.drivername,
+        "username": u.username or "",
+        "password": u.password or "",
+        "host": u.host or "localhost",
+        "port": u.port or 3306,
+        "database": u.database,
+    }
+
+
+class PicoMemoria:
+    """Amostra a memória residente do processo em background e guarda o pico"""
+
+    def __init__(self, intervalo: float = 0.01):
+        self.intervalo = intervalo
+        self.inicial = self.pico = 0
+        self._parar = threading.Event()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, memoria_processo())
+
+    def __enter__(self):
+        self.inicial = self.pico = memoria_processo()
+        self._thread = threading.Thread(target=self._amostrar, name="pico-memoria", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, memoria_processo())
+        return False
+
+
+def carregar_baseline(nome: str) -> dict:
+    try:
+        with open(os.path.join(DIR_BASELINES, f"{nome}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar_baseline(nome: str, resultados: dict):
+    """Grava os resultados como novo baseline, junto dos parâmetros da base usada"""
+    os.makedirs(DIR_BASELINES, exist_ok=True)
+    baseline = carregar_baseline(nome)
+    baseline.setdefault("resultados", {}).update(resultados)
+    baseline["base_sintetica"] = ler_manifesto().get("parametros", {})
+    with open(os.path.join(DIR_BASELINES, f"{nome}.json"), "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def comparar(atual: dict, base: dict, tolerancias: dict, minimos: dict) -> list:
+    """
+    Métricas que pioraram além da tolerância relativa e da diferença mínima absoluta.
+    Retorna [(metrica, valor_base, valor_atual)].
+    """
+    regressoes = []
+    for metrica, tolerancia in tolerancias.items():
+        if metrica not in base or atual.get(metrica) is None:
+            continue
+        anterior, valor = base[metrica], atual[metrica]
+        if valor > anterior * (1 + tolerancia) and valor - anterior > minimos.get(metrica, 0):
+            regressoes.append((metrica, anterior, valor))
+    return regressoes
+
+
+def avisar_base_diferente(baseline: dict):
+    """Alerta quando o baseline foi medido em outra base sintética"""
+    usada = baseline.get("base_sintetica")
+    atual = ler_manifesto().get("parametros", {})
+    if usada and atual and usada != atual:
+        print("⚠️  O baseline foi gerado com outra base sintética; as comparações podem não ser válidas.")